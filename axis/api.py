@@ -10,6 +10,7 @@ from typing import (
     KeysView,
     List,
     Optional,
+    Tuple,
     ValuesView,
 )
 
@@ -31,7 +32,13 @@ class Body:
 
 
 class APIItem:
-    """Base class for all end points using APIItems class."""
+    """Base class for all end points using APIItems class.
+
+    Items are slotted to keep a small memory footprint,
+    subclasses need to define __slots__ to not get a per-instance __dict__.
+    """
+
+    __slots__ = ("_id", "_raw", "_request", "_observers")
 
     def __init__(self, id: str, raw: dict, request: Callable) -> None:
         """Initialize API item."""
@@ -39,7 +46,7 @@ class APIItem:
         self._raw = raw
         self._request = request
 
-        self.observers: List[Callable] = []
+        self._observers: Optional[List[Callable]] = None
 
     @property
     def id(self) -> str:
@@ -51,21 +58,34 @@ class APIItem:
         """Read only raw data."""
         return self._raw
 
+    @property
+    def observers(self) -> Tuple[Callable, ...]:
+        """Read only snapshot of registered observers.
+
+        Use register_callback and remove_callback to change observers.
+        """
+        return tuple(self._observers) if self._observers else ()
+
     def update(self, raw: dict) -> None:
         """Update raw data and signal new data is available."""
         self._raw = raw
 
-        for observer in self.observers:
-            observer()
+        if self._observers:
+            for observer in self._observers:
+                observer()
 
     def register_callback(self, callback: Callable) -> None:
         """Register callback for state updates."""
-        self.observers.append(callback)
+        if self._observers is None:
+            self._observers = []
+        self._observers.append(callback)
 
     def remove_callback(self, observer: Callable) -> None:
         """Remove observer."""
-        if observer in self.observers:
-            self.observers.remove(observer)
+        if self._observers and observer in self._observers:
+            self._observers.remove(observer)
+            if not self._observers:
+                self._observers = None
 
 
 class APIItems:
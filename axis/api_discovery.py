@@ -57,6 +57,8 @@ class ApiDiscovery(APIItems):
 class Api(APIItem):
     """API Discovery item."""
 
+    __slots__ = ()
+
     @property
     def name(self):
         """Name of API."""
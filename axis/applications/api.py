@@ -10,6 +10,8 @@ from axis.api import APIItem, APIItems, Body
 class ApplicationAPIItem(APIItem):
     """Base class for application profiles."""
 
+    __slots__ = ()
+
     @property
     def camera(self) -> int:
         """Camera ID."""
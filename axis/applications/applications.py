@@ -60,6 +60,8 @@ class Applications(APIItems):
 class Application(APIItem):
     """Application item."""
 
+    __slots__ = ()
+
     @property
     def application_id(self) -> str:
         """Id of application."""
@@ -54,6 +54,8 @@ class ObjectAnalytics(ApplicationAPIItems):
 class ObjectAnalyticsScenario(ApplicationAPIItem):
     """Object Analytics Scenario."""
 
+    __slots__ = ()
+
     @property
     def camera(self) -> list:  # type: ignore[override]
         """Camera ID."""
@@ -0,0 +1,136 @@
+"""Digest access authentication for RTSP.
+
+RFC 7616, with RFC 2069 compatibility when device doesn't offer qop.
+"""
+
+import hashlib
+import logging
+import secrets
+from typing import Callable, Dict, List, Optional, Tuple
+
+_LOGGER = logging.getLogger(__name__)
+
+ALGORITHM_MD5 = "MD5"
+ALGORITHM_SHA256 = "SHA-256"
+SESSION_SUFFIX = "-SESS"
+
+HASHES: Dict[str, Callable] = {
+    ALGORITHM_MD5: hashlib.md5,
+    ALGORITHM_SHA256: hashlib.sha256,
+}
+PREFERENCE = [ALGORITHM_MD5, ALGORITHM_SHA256]  # Strongest last
+
+QOP_AUTH = "auth"
+
+
+def base_algorithm(algorithm: str) -> str:
+    """Hash algorithm without session variant suffix."""
+    base = algorithm.upper()
+    if base.endswith(SESSION_SUFFIX):
+        return base[: -len(SESSION_SUFFIX)]
+    return base
+
+
+def algorithm_rank(algorithm: str) -> int:
+    """Strength of algorithm, -1 if unsupported."""
+    base = base_algorithm(algorithm)
+    if base not in HASHES:
+        return -1
+    return PREFERENCE.index(base)
+
+
+class DigestAuth:
+    """Digest credentials of a user answering challenges from a device.
+
+    HA1 only depends on credentials, realm and algorithm so it is computed
+    once per realm. Nonce is reused for every request, with qop the nonce count
+    is increased per request so device doesn't have to challenge again.
+    """
+
+    def __init__(self, username: str, password: str) -> None:
+        """Initialize without a challenge."""
+        self.username = username
+        self.password = password
+        self.realm: Optional[str] = None
+        self.nonce: Optional[str] = None
+        self.opaque: Optional[str] = None
+        self.algorithm = ALGORITHM_MD5
+        self.qop: Optional[str] = None
+        self.nonce_count = 0
+        self.cnonce = ""
+        self._ha1: Dict[Tuple[str, str], str] = {}
+
+    def challenge_received(self, challenges: List[Dict[str, str]]) -> bool:
+        """Use strongest supported challenge, False if none is supported.
+
+        A new nonce starts nonce counting over.
+        """
+        supported = [
+            params
+            for params in challenges
+            if algorithm_rank(params.get("algorithm", ALGORITHM_MD5)) >= 0
+        ]
+        if not supported:
+            _LOGGER.warning("No supported digest algorithm offered by device")
+            return False
+
+        params = max(
+            supported,
+            key=lambda params: algorithm_rank(params.get("algorithm", ALGORITHM_MD5)),
+        )
+        nonce = params.get("nonce")
+        if nonce != self.nonce:
+            self.nonce_count = 0
+            self.cnonce = secrets.token_hex(8)
+
+        self.realm = params.get("realm")
+        self.nonce = nonce
+        self.opaque = params.get("opaque")
+        self.algorithm = params.get("algorithm", ALGORITHM_MD5)
+        qop_options = [
+            option.strip().lower() for option in params.get("qop", "").split(",")
+        ]
+        self.qop = QOP_AUTH if QOP_AUTH in qop_options else None
+        return True
+
+    def hash(self, data: str) -> str:
+        """Hash data with algorithm of challenge."""
+        hash_function = HASHES[base_algorithm(self.algorithm)]
+        return hash_function(data.encode("UTF-8")).hexdigest()  # type: ignore[no-any-return]
+
+    @property
+    def ha1(self) -> str:
+        """Hash of credentials, cached per realm and algorithm."""
+        key = (self.algorithm, self.realm or "")
+        if key not in self._ha1:
+            self._ha1[key] = self.hash(f"{self.username}:{self.realm}:{self.password}")
+        ha1 = self._ha1[key]
+        if self.algorithm.upper().endswith(SESSION_SUFFIX):
+            ha1 = self.hash(f"{ha1}:{self.nonce}:{self.cnonce}")
+        return ha1
+
+    def authorization(self, method: str, uri: str) -> str:
+        """Generate value of Authorization header for request."""
+        ha2 = self.hash(f"{method}:{uri}")
+
+        if self.qop:
+            self.nonce_count += 1
+            nonce_count = f"{self.nonce_count:08x}"
+            response = self.hash(
+                f"{self.ha1}:{self.nonce}:{nonce_count}:{self.cnonce}:{self.qop}:{ha2}"
+            )
+        else:
+            response = self.hash(f"{self.ha1}:{self.nonce}:{ha2}")
+
+        digest_auth = "Digest "
+        digest_auth += f'username="{self.username}", '
+        digest_auth += f'realm="{self.realm}", '
+        digest_auth += f'algorithm="{self.algorithm}", '
+        digest_auth += f'nonce="{self.nonce}", '
+        digest_auth += f'uri="{uri}", '
+        digest_auth += f'response="{response}"'
+        if self.opaque is not None:
+            digest_auth += f', opaque="{self.opaque}"'
+        if self.qop:
+            digest_auth += f', qop={self.qop}, nc={nonce_count}, cnonce="{self.cnonce}"'
+        return digest_auth
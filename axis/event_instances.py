@@ -1,9 +1,15 @@
 """Event service and action service APIs available in Axis network device."""
 
-from typing import Callable, List, Optional, Union
+from typing import Callable, Dict, Iterable, List, Optional, Set, Type, Union
 
 from .api import APIItem, APIItems
-from .event_stream import traverse
+from .event_stream import (
+    BLACK_LISTED_TOPICS,
+    AxisEvent,
+    as_list,
+    get_event_class,
+    traverse,
+)
 
 URL = "/vapix/services"
 
@@ -47,33 +53,102 @@ EVENT_INSTANCE = (
 def get_events(data: dict) -> List[dict]:
     """Get all events.
 
+    Walk topic structure depth first keeping the keys leading to current level.
     Ignore keys with "@" while traversing structure. Indicates an attribute in value.
-    When @topic is reached, return event data and build topic structure.
+    When @topic is reached, return event data and compose topic once from keys.
     """
     events = []
-    for key, value in data.items():
+    keys: List[str] = []
+    levels = [iter(data.items())]
+
+    while levels:
+        for key, value in levels[-1]:
 
-        if key.startswith("@"):  # Value is an attribute so skip
-            continue
+            if key.startswith("@") or not isinstance(value, dict):
+                continue  # Value is an attribute so skip
 
-        if "@topic" in value:  # Designates the end of the topic structure
-            events.append({"topic": key, "data": value})
-            continue
+            if "@topic" in value:  # Designates the end of the topic structure
+                events.append({"topic": "/".join(keys + [key]), "data": value})
+                continue
 
-        event_list = get_events(value)  # Recursive call
+            keys.append(key)
+            levels.append(iter(value.items()))
+            break
 
-        for event in event_list:
-            event["topic"] = f'{key}/{event["topic"]}'  # Compose the topic
-            events.append(event)
+        else:  # Level is done, continue with its parent
+            levels.pop()
+            if keys:
+                keys.pop()
 
     return events
 
 
+class EventInstanceIndex:
+    """Event instances indexed by event class, topic prefix, statefulness and source.
+
+    Topic prefixes end at a topic level, "tns1:Device" but not "tns1:Dev".
+    Blacklisted topics are not indexed.
+    """
+
+    def __init__(self, event_instances: Iterable["EventInstance"] = ()) -> None:
+        """Index event instances."""
+        self.classes: Dict[str, List[EventInstance]] = {}
+        self.event_classes: Dict[Type[AxisEvent], List[EventInstance]] = {}
+        self.source_indexes: Dict[Type[AxisEvent], Set[str]] = {}
+        self.prefixes: Dict[str, List[EventInstance]] = {}
+        self.sources: Dict[str, List[EventInstance]] = {}
+        self.stateful: List[EventInstance] = []
+        self.stateless: List[EventInstance] = []
+
+        for event_instance in event_instances:
+            self.add(event_instance)
+
+    def add(self, event_instance: "EventInstance") -> None:
+        """Add event instance to index."""
+        topic = event_instance.topic
+        if topic in BLACK_LISTED_TOPICS:
+            return
+
+        event_class = get_event_class(topic)
+        if event_class is not None:
+            self.classes.setdefault(event_class.CLASS, []).append(event_instance)
+            self.event_classes.setdefault(event_class, []).append(event_instance)
+            self.source_indexes.setdefault(event_class, set()).update(
+                value for _, value in event_instance.source_values
+            )
+
+        prefix = ""
+        for level in topic.split("/"):
+            prefix = f"{prefix}/{level}" if prefix else level
+            self.prefixes.setdefault(prefix, []).append(event_instance)
+
+        for name in event_instance.source_names:
+            self.sources.setdefault(name, []).append(event_instance)
+
+        if event_instance.stateful:
+            self.stateful.append(event_instance)
+        else:
+            self.stateless.append(event_instance)
+
+    def with_class(self, event_class: str) -> List["EventInstance"]:
+        """Event instances of event class, like "motion"."""
+        return self.classes.get(event_class, [])
+
+    def with_prefix(self, prefix: str) -> List["EventInstance"]:
+        """Event instances with topic at or below prefix."""
+        return self.prefixes.get(prefix.rstrip("/"), [])
+
+    def with_source(self, name: str) -> List["EventInstance"]:
+        """Event instances with a source of name, like "port"."""
+        return self.sources.get(name, [])
+
+
 class EventInstances(APIItems):
     """Initialize new events and update states of existing events."""
 
     def __init__(self, request: Callable[..., Optional[dict]]) -> None:
         """Initialize class."""
+        self.index = EventInstanceIndex()
         super().__init__({}, request, URL, EventInstance)
 
     async def update(self) -> None:
@@ -87,6 +162,12 @@ class EventInstances(APIItems):
         )
         self.process_raw(raw)
 
+    def process_raw(self, raw: dict) -> set:
+        """Process event instances and index them."""
+        new_items = super().process_raw(raw)
+        self.index = EventInstanceIndex(self.values())  # type: ignore[arg-type]
+        return new_items
+
     @staticmethod
     def pre_process_raw(raw: dict) -> dict:
         """Return a dictionary of events."""
@@ -107,6 +188,8 @@ class EventInstance(APIItem):
     and can also be stored together with video and audio data for later access.
     """
 
+    __slots__ = ()
+
     @property
     def topic(self) -> str:
         """Event topic.
@@ -167,6 +250,24 @@ class EventInstance(APIItem):
         message = self.raw["data"]["MessageInstance"]
         return message.get("SourceInstance", {}).get("SimpleItemInstance", {})
 
+    @property
+    def source_names(self) -> List[str]:
+        """Names of source items."""
+        return [item["@Name"] for item in as_list(self.source) if "@Name" in item]
+
+    @property
+    def source_values(self) -> List[tuple]:
+        """Name and value of every possible source.
+
+        Values with a nice name keep their value in "#text".
+        """
+        return [
+            (item["@Name"], value.get("#text") if isinstance(value, dict) else value)
+            for item in as_list(self.source)
+            if "@Name" in item
+            for value in as_list(item.get("Value"))
+        ]
+
     @property
     def data(self) -> Union[dict, list]:
         """Event data description."""
@@ -1,7 +1,12 @@
 """Python library to enable Axis devices to integrate with Home Assistant."""
 
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
 import logging
-from typing import Any, Callable, Union
+import sys
+from time import monotonic, time
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Type, Union
 
 import xmltodict  # type: ignore[import]
 
@@ -28,13 +33,15 @@ OPERATION_INITIALIZED = "Initialized"
 OPERATION_CHANGED = "Changed"
 OPERATION_DELETED = "Deleted"
 
-NOTIFICATION_MESSAGE = ("MetadataStream", "Event", "NotificationMessage")
-MESSAGE = NOTIFICATION_MESSAGE + ("Message", "Message")
-TOPIC = NOTIFICATION_MESSAGE + ("Topic", "#text")
-TIMESTAMP = MESSAGE + ("@UtcTime",)
-OPERATION = MESSAGE + ("@PropertyOperation",)
-SOURCE = MESSAGE + ("Source",)
-DATA = MESSAGE + ("Data",)
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+CLOCK_OFFSET_SAMPLES = 100
+
+# Relative to a single notification message
+NOTIFICATION_TOPIC = ("Topic", "#text")
+NOTIFICATION_TIMESTAMP = ("Message", "Message", "@UtcTime")
+NOTIFICATION_OPERATION = ("Message", "Message", "@PropertyOperation")
+NOTIFICATION_SOURCE = ("Message", "Message", "Source")
+NOTIFICATION_DATA = ("Message", "Message", "Data")
 
 NAMESPACES = {
     "http://www.onvif.org/ver10/schema": None,
@@ -48,6 +55,26 @@ def traverse(data: dict, keys: Union[tuple, list]) -> dict:
     return traverse(data.get(head, {}), tail) if tail else data.get(head, {})
 
 
+def parse_timestamp(timestamp: str) -> Optional[datetime]:
+    """Parse UTC timestamp of notification, "2019-03-12T23:48:26.371215Z"."""
+    try:
+        return datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return None
+
+
+def intern_str(value: Any) -> Any:
+    """Intern value if it is a string."""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def as_list(data: Any) -> list:
+    """Return data as a list, xmltodict only creates lists for repeated elements."""
+    if data is None:
+        return []
+    return data if isinstance(data, list) else [data]
+
+
 def extract_name_value(data: dict) -> tuple:
     """Extract name and value from a simple item, take first dictionary if it is a list."""
     item = data.get("SimpleItem", {})
@@ -56,15 +83,142 @@ def extract_name_value(data: dict) -> tuple:
     return (item.get("@Name", ""), item.get("@Value", ""))
 
 
+def parse_notification(notification: dict) -> dict:
+    """Convert a notification message to event format.
+
+    Topic, source and type strings are repeated across events so they are interned.
+    """
+    event = {}
+
+    event[EVENT_TOPIC] = intern_str(traverse(notification, NOTIFICATION_TOPIC))
+    event[EVENT_OPERATION] = traverse(notification, NOTIFICATION_OPERATION)
+
+    source = traverse(notification, NOTIFICATION_SOURCE)
+    if source:
+        event[EVENT_SOURCE], event[EVENT_SOURCE_IDX] = extract_name_value(source)  # type: ignore[arg-type]
+        event[EVENT_SOURCE] = intern_str(event[EVENT_SOURCE])
+
+    data = traverse(notification, NOTIFICATION_DATA)
+    if data:
+        event[EVENT_TYPE], event[EVENT_VALUE] = extract_name_value(data)  # type: ignore[arg-type]
+        event[EVENT_TYPE] = intern_str(event[EVENT_TYPE])
+
+    timestamp = traverse(notification, NOTIFICATION_TIMESTAMP)
+    if timestamp:
+        event[EVENT_TIMESTAMP] = timestamp
+
+    return event
+
+
+class LatencyHistogram:
+    """Delay from device timestamp of event until it is dispatched.
+
+    Delay is measured against the local clock so it includes the clock offset
+    between device and host. The smallest delay of recent samples is the closest
+    to pure clock offset and is reported as estimate of it in clock_offset.
+    Histogram, minimum, maximum and mean hold delays as measured,
+    with correct_clock_offset they hold delays corrected by the estimate.
+    Correction also hides delay that lasts, like a backlog in the event loop
+    or network, so only use it when device and host clocks are known to differ.
+    """
+
+    def __init__(
+        self, buckets: tuple = LATENCY_BUCKETS, correct_clock_offset: bool = False
+    ) -> None:
+        """Initialize histogram with upper bounds of buckets in seconds."""
+        self.buckets = buckets
+        self.correct_clock_offset = correct_clock_offset
+        self.counts = [0] * (len(buckets) + 1)  # Last bucket is overflow
+        self.count = 0
+        self.total = 0.0
+        self.raw_total = 0.0
+        self.minimum: Optional[float] = None
+        self.maximum: Optional[float] = None
+        self._recent: Deque[float] = deque(maxlen=CLOCK_OFFSET_SAMPLES)
+
+    def record(self, raw_delay: float) -> None:
+        """Record delay in seconds as measured against local clock."""
+        self._recent.append(raw_delay)
+        self.raw_total += raw_delay
+        delay = raw_delay
+        if self.correct_clock_offset:
+            delay += self.clock_offset  # type: ignore[operator]
+
+        self.counts[bisect_left(self.buckets, delay)] += 1
+        self.count += 1
+        self.total += delay
+        if self.minimum is None or delay < self.minimum:
+            self.minimum = delay
+        if self.maximum is None or delay > self.maximum:
+            self.maximum = delay
+
+    @property
+    def mean(self) -> Optional[float]:
+        """Mean delay, offset-corrected if correction is enabled."""
+        return self.total / self.count if self.count else None
+
+    @property
+    def raw_mean(self) -> Optional[float]:
+        """Mean delay as measured against local clock."""
+        return self.raw_total / self.count if self.count else None
+
+    @property
+    def clock_offset(self) -> Optional[float]:
+        """Estimated amount of seconds device clock is ahead of local clock."""
+        return -min(self._recent) if self._recent else None
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Upper bound of bucket holding percentile, None if in overflow bucket."""
+        if not self.count:
+            return None
+        target = self.count * percent / 100
+        accumulated = 0
+        for bound, count in zip(self.buckets, self.counts):
+            accumulated += count
+            if accumulated >= target:
+                return bound
+        return None
+
+    def reset(self) -> None:
+        """Clear recorded samples."""
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.raw_total = 0.0
+        self.minimum = None
+        self.maximum = None
+        self._recent.clear()
+
+
 class EventManager(APIItems):
-    """Initialize new events and update states of existing events."""
+    """Initialize new events and update states of existing events.
 
-    def __init__(self, signal: Callable) -> None:
+    max_events - upper bound of stored events, least recently seen are evicted first.
+    event_ttl - seconds an event may go unseen before it is evicted.
+    store_unsupported - keep events that have no matching event class.
+    Evicted events that have been signalled as initialized are signalled as deleted.
+    Delay between device timestamp and dispatch of changed events is stored in latency.
+    """
+
+    def __init__(
+        self,
+        signal: Callable,
+        max_events: Optional[int] = None,
+        event_ttl: Optional[float] = None,
+        store_unsupported: bool = True,
+    ) -> None:
         """Ready information about events."""
-        super().__init__({}, None, "", create_event)
         self.signal = signal
+        self.max_events = max_events
+        self.event_ttl = event_ttl
+        self.store_unsupported = store_unsupported
+        self._last_seen: Dict[str, float] = {}
+        self.latency = LatencyHistogram()
+        super().__init__({}, None, "", create_event)
 
-    def update(self, raw: Union[bytes, list]) -> None:  # type: ignore[override]
+    def update(  # type: ignore[override]
+        self, raw: Union[bytes, memoryview, list]
+    ) -> None:
         """Prepare event."""
         new_events = self.process_raw(raw)
 
@@ -73,16 +227,100 @@ class EventManager(APIItems):
             if self[new_event].TOPIC:  # type: ignore[attr-defined]
                 self.signal(OPERATION_INITIALIZED, new_event)
 
+        if self.bounded:
+            self.evict()
+
+    @property
+    def bounded(self) -> bool:
+        """Events are bounded by size or age."""
+        return self.max_events is not None or self.event_ttl is not None
+
+    def process_raw(self, raw: Any) -> set:
+        """Process raw and return a set of new event IDs.
+
+        When bounded by max_events or event_ttl items are kept in order
+        of when they were last seen, which makes the first item the least recently seen.
+        """
+        new_events = set()
+        bounded = self.bounded
+        now = monotonic()
+
+        for id, raw_event in self.pre_process_raw(raw):
+            event = self._items.pop(id, None) if bounded else self._items.get(id)
+
+            if event is not None:
+                event.update(raw_event)
+
+            else:
+                event = self._item_cls(id, raw_event, self._request)
+                if not event.TOPIC and not self.store_unsupported:
+                    continue
+                new_events.add(id)
+
+            if bounded:
+                self._items[id] = event
+                self._last_seen[id] = now
+            elif id in new_events:
+                self._items[id] = event
+
+            if raw_event[EVENT_OPERATION] == OPERATION_CHANGED:
+                self.record_latency(raw_event)
+
+        return new_events
+
+    def record_latency(self, raw_event: dict) -> None:
+        """Record delay from device timestamp until event has been dispatched."""
+        timestamp = parse_timestamp(raw_event.get(EVENT_TIMESTAMP, ""))
+        if timestamp is not None:
+            self.latency.record(time() - timestamp.timestamp())
+
+    def evict(self) -> None:
+        """Evict stale events and events exceeding the maximum size.
+
+        Unsupported events are evicted before supported events.
+        Runs after each update, call it to expire events while the stream is idle.
+        """
+        if self.event_ttl is not None:
+            deadline = monotonic() - self.event_ttl
+            for id in list(self._items):
+                if self._last_seen.get(id, 0.0) > deadline:
+                    break
+                self.remove(id)
+
+        if self.max_events is None or len(self._items) <= self.max_events:
+            return
+
+        excess = len(self._items) - self.max_events
+        unsupported = [id for id, event in self._items.items() if not event.TOPIC]
+        for id in unsupported[:excess]:
+            self.remove(id)
+
+        for id in list(self._items)[: len(self._items) - self.max_events]:
+            self.remove(id)
+
+    def remove(self, event_id: str) -> None:
+        """Remove event and signal it as deleted if it has been signalled before."""
+        event = self._items.pop(event_id)
+        self._last_seen.pop(event_id, None)
+
+        if event.TOPIC:
+            self.signal(OPERATION_DELETED, event_id)
+
     @staticmethod
-    def pre_process_raw(raw: Union[bytes, list]) -> dict:  # type: ignore[override]
-        """Return a dictionary of initialized or changed events."""
+    def pre_process_raw(  # type: ignore[override]
+        raw: Union[bytes, memoryview, list]
+    ) -> List[Tuple[str, dict]]:
+        """Return initialized or changed events with their ID in order received.
+
+        Notifications for the same ID are all kept so short pulses are not lost.
+        """
         if not raw:
-            return {}
+            return []
 
-        if isinstance(raw, bytes):
-            raw = [EventManager.parse_event_xml(raw)]
+        if not isinstance(raw, list):
+            raw = EventManager.parse_events_xml(raw)
 
-        events = {}
+        events = []
         for event in raw:
             if not event:
                 continue
@@ -92,35 +330,33 @@ class EventManager(APIItems):
                 continue
 
             id = f'{event[EVENT_TOPIC]}_{event.get(EVENT_SOURCE_IDX, "")}'
-            events[id] = event
+            events.append((id, event))
 
         return events
 
     @staticmethod
     def parse_event_xml(raw_bytes: bytes) -> dict:
-        """Parse metadata xml."""
+        """Parse metadata xml and return first notification."""
+        events = EventManager.parse_events_xml(raw_bytes)
+        return events[0] if events else {}
+
+    @staticmethod
+    def parse_events_xml(raw_bytes: Union[bytes, memoryview]) -> List[dict]:
+        """Parse metadata xml and return all notifications in order."""
         raw = xmltodict.parse(raw_bytes, process_namespaces=True, namespaces=NAMESPACES)
 
         if not raw.get("MetadataStream"):
-            return {}
-
-        event = {}
-
-        event[EVENT_TOPIC] = traverse(raw, TOPIC)
-        # event[EVENT_TIMESTAMP] = traverse(raw, TIMESTAMP)
-        event[EVENT_OPERATION] = traverse(raw, OPERATION)
+            return []
 
-        source = traverse(raw, SOURCE)
-        if source:
-            event[EVENT_SOURCE], event[EVENT_SOURCE_IDX] = extract_name_value(source)  # type: ignore[arg-type]
+        events = []
 
-        data = traverse(raw, DATA)
-        if data:
-            event[EVENT_TYPE], event[EVENT_VALUE] = extract_name_value(data)  # type: ignore[arg-type]
+        for event in as_list(raw["MetadataStream"].get("Event")):
+            for notification in as_list((event or {}).get("NotificationMessage")):
+                events.append(parse_notification(notification))
 
-        LOGGER.debug(event)
+        LOGGER.debug(events)
 
-        return event
+        return events
 
 
 class AxisEvent(APIItem):
@@ -131,6 +367,8 @@ class AxisEvent(APIItem):
     TYPE - a more human readable string of event.
     """
 
+    __slots__ = ()
+
     BINARY = False
     TOPIC = ""
     CLASS = ""
@@ -160,10 +398,17 @@ class AxisEvent(APIItem):
         """State of the event."""
         return self.raw[EVENT_VALUE]
 
+    @property
+    def timestamp(self) -> Optional[datetime]:
+        """Device timestamp of the event."""
+        return parse_timestamp(self.raw.get(EVENT_TIMESTAMP, ""))
+
 
 class AxisBinaryEvent(AxisEvent):
     """Axis binary event."""
 
+    __slots__ = ()
+
     BINARY = True
 
     @property
@@ -175,6 +420,8 @@ class AxisBinaryEvent(AxisEvent):
 class Audio(AxisBinaryEvent):
     """Audio trigger event."""
 
+    __slots__ = ()
+
     TOPIC = "tns1:AudioSource/tnsaxis:TriggerLevel"
     CLASS = CLASS_SOUND
     TYPE = "Sound"
@@ -183,6 +430,8 @@ class Audio(AxisBinaryEvent):
 class DayNight(AxisBinaryEvent):
     """Day/Night vision trigger event."""
 
+    __slots__ = ()
+
     TOPIC = "tns1:VideoSource/tnsaxis:DayNightVision"
     CLASS = CLASS_LIGHT
     TYPE = "DayNight"
@@ -191,6 +440,8 @@ class DayNight(AxisBinaryEvent):
 class FenceGuard(AxisBinaryEvent):
     """Fence Guard trigger event."""
 
+    __slots__ = ()
+
     TOPIC = "tnsaxis:CameraApplicationPlatform/FenceGuard"
     CLASS = CLASS_MOTION
     TYPE = "Fence Guard"
@@ -204,6 +455,8 @@ class FenceGuard(AxisBinaryEvent):
 class Input(AxisBinaryEvent):
     """Digital input event."""
 
+    __slots__ = ()
+
     TOPIC = "tns1:Device/tnsaxis:IO/Port"
     CLASS = CLASS_INPUT
     TYPE = "Input"
@@ -212,6 +465,8 @@ class Input(AxisBinaryEvent):
 class Light(AxisBinaryEvent):
     """Light status event."""
 
+    __slots__ = ()
+
     TOPIC = "tns1:Device/tnsaxis:Light/Status"
     CLASS = CLASS_LIGHT
     TYPE = "Light"
@@ -225,6 +480,8 @@ class Light(AxisBinaryEvent):
 class LoiteringGuard(AxisBinaryEvent):
     """Loitering Guard trigger event."""
 
+    __slots__ = ()
+
     TOPIC = "tnsaxis:CameraApplicationPlatform/LoiteringGuard"
     CLASS = CLASS_MOTION
     TYPE = "Loitering Guard"
@@ -238,6 +495,8 @@ class LoiteringGuard(AxisBinaryEvent):
 class Motion(AxisBinaryEvent):
     """Motion detection event."""
 
+    __slots__ = ()
+
     TOPIC = "tns1:VideoAnalytics/tnsaxis:MotionDetection"
     CLASS = CLASS_MOTION
     TYPE = "Motion"
@@ -246,6 +505,8 @@ class Motion(AxisBinaryEvent):
 class MotionGuard(AxisBinaryEvent):
     """Motion Guard trigger event."""
 
+    __slots__ = ()
+
     TOPIC = "tnsaxis:CameraApplicationPlatform/MotionGuard"
     CLASS = CLASS_MOTION
     TYPE = "Motion Guard"
@@ -259,6 +520,8 @@ class MotionGuard(AxisBinaryEvent):
 class ObjectAnalytics(AxisBinaryEvent):
     """Object Analytics trigger event."""
 
+    __slots__ = ()
+
     TOPIC = "tnsaxis:CameraApplicationPlatform/ObjectAnalytics/"
     CLASS = CLASS_MOTION
     TYPE = "Object Analytics"
@@ -272,6 +535,8 @@ class ObjectAnalytics(AxisBinaryEvent):
 class Pir(AxisBinaryEvent):
     """Passive IR event."""
 
+    __slots__ = ()
+
     TOPIC = "tns1:Device/tnsaxis:Sensor/PIR"
     CLASS = CLASS_MOTION
     TYPE = "PIR"
@@ -280,6 +545,8 @@ class Pir(AxisBinaryEvent):
 class PtzMove(AxisBinaryEvent):
     """PTZ Move event."""
 
+    __slots__ = ()
+
     TOPIC = "tns1:PTZController/tnsaxis:Move"
     CLASS = CLASS_PTZ
     TYPE = "is_moving"
@@ -288,6 +555,8 @@ class PtzMove(AxisBinaryEvent):
 class PtzPreset(AxisBinaryEvent):
     """PTZ Move event."""
 
+    __slots__ = ()
+
     TOPIC = "tns1:PTZController/tnsaxis:PTZPresets"
     CLASS = CLASS_PTZ
     TYPE = "on_preset"
@@ -296,6 +565,8 @@ class PtzPreset(AxisBinaryEvent):
 class Relay(AxisBinaryEvent):
     """Relay event."""
 
+    __slots__ = ()
+
     TOPIC = "tns1:Device/Trigger/Relay"
     CLASS = CLASS_OUTPUT
     TYPE = "Relay"
@@ -309,6 +580,8 @@ class Relay(AxisBinaryEvent):
 class SupervisedInput(AxisBinaryEvent):
     """Supervised input event."""
 
+    __slots__ = ()
+
     TOPIC = "tns1:Device/tnsaxis:IO/SupervisedPort"
     CLASS = CLASS_INPUT
     TYPE = "Supervised Input"
@@ -317,6 +590,8 @@ class SupervisedInput(AxisBinaryEvent):
 class Vmd3(AxisBinaryEvent):
     """Visual Motion Detection 3."""
 
+    __slots__ = ()
+
     TOPIC = "tns1:RuleEngine/tnsaxis:VMD3/vmd3_video_1"
     CLASS = CLASS_MOTION
     TYPE = "VMD3"
@@ -325,6 +600,8 @@ class Vmd3(AxisBinaryEvent):
 class Vmd4(AxisBinaryEvent):
     """Visual Motion Detection 4."""
 
+    __slots__ = ()
+
     TOPIC = "tnsaxis:CameraApplicationPlatform/VMD"
     CLASS = CLASS_MOTION
     TYPE = "VMD4"
@@ -357,13 +634,21 @@ EVENT_CLASSES = (
 BLACK_LISTED_TOPICS = ["tnsaxis:CameraApplicationPlatform/VMD/xinternal_data"]
 
 
+def get_event_class(topic: str) -> Optional[Type[AxisEvent]]:
+    """Event class handling topic, None if topic is unsupported."""
+    if topic in BLACK_LISTED_TOPICS:
+        return None
+    for event_class in EVENT_CLASSES:
+        if event_class.TOPIC in topic:
+            return event_class
+    return None
+
+
 def create_event(event_id: str, event: dict, request: Callable[..., Any]) -> AxisEvent:
     """Simplify creating event by not needing to know type."""
-    for event_class in EVENT_CLASSES:
-        if event[EVENT_TOPIC] in BLACK_LISTED_TOPICS:
-            break
-        if event_class.TOPIC in event[EVENT_TOPIC]:
-            return event_class(event_id, event, request)
+    event_class = get_event_class(event[EVENT_TOPIC])
+    if event_class is not None:
+        return event_class(event_id, event, request)
 
     LOGGER.debug("Unsupported event %s", event[EVENT_TOPIC])
     return AxisEvent(event_id, event, request)
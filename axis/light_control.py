@@ -324,6 +324,8 @@ class LightControl(APIItems):
 class Light(APIItem):
     """API Discovery item."""
 
+    __slots__ = ()
+
     @property
     def light_id(self) -> str:
         """Id of light."""
@@ -1,11 +1,33 @@
 """MQTT Client api."""
 
+from functools import lru_cache
 import json
+import logging
+from typing import Any, Callable, Collection, Dict, Iterable, List, Tuple, Union
 
 import attr
 
 from .api import APIItem, APIItems, Body
-from .event_stream import OPERATION_CHANGED
+from .event_instances import EventInstances
+from .event_stream import (
+    EVENT_OPERATION,
+    EVENT_SOURCE,
+    EVENT_SOURCE_IDX,
+    EVENT_TOPIC,
+    EVENT_TYPE,
+    EVENT_VALUE,
+    OPERATION_CHANGED,
+    intern_str,
+)
+
+try:
+    import orjson
+
+    json_loads: Callable[[Union[bytes, str]], Any] = orjson.loads
+except ImportError:  # pragma: no cover
+    json_loads = json.loads
+
+LOGGER = logging.getLogger(__name__)
 
 URL = "/axis-cgi/mqtt"
 URL_CLIENT = f"{URL}/client.cgi"
@@ -16,6 +38,13 @@ API_VERSION = "1.0"
 
 DEFAULT_TOPICS = ["//."]
 
+EVENT_SERIAL = "serial"
+EVENT_TOPIC_SEPARATOR = "/event/"
+
+# Namespace prefixes of MQTT topics and their counterpart in the event stream
+TOPIC_NAMESPACES = {"onvif": "tns1", "axis": "tnsaxis"}
+TOPIC_CACHE_SIZE = 1024
+
 
 @attr.s
 class Server:
@@ -63,29 +92,118 @@ class ClientConfig:
     autoReconnect: bool = attr.ib(default=True)
 
 
-def mqtt_json_to_event(msg: str) -> dict:
-    """Convert JSON message from MQTT to event format."""
-    message = json.loads(msg)
-    topic = message["topic"].replace("onvif", "tns1").replace("axis", "tnsaxis")
+@lru_cache(maxsize=TOPIC_CACHE_SIZE)
+def translate_topic(topic: str) -> str:
+    """Translate namespace prefixes of MQTT topic to those of the event stream.
+
+    "onvif:Device/axis:Sensor/PIR" becomes "tns1:Device/tnsaxis:Sensor/PIR",
+    names containing "onvif" or "axis" are left as they are.
+    """
+    segments = []
+    for segment in topic.split("/"):
+        prefix, separator, name = segment.partition(":")
+        if separator and prefix in TOPIC_NAMESPACES:
+            segment = f"{TOPIC_NAMESPACES[prefix]}:{name}"
+        segments.append(segment)
+    return intern_str("/".join(segments))  # type: ignore[no-any-return]
+
+
+def mqtt_topic_serial(mqtt_topic: str) -> str:
+    """Return serial number of device publishing on MQTT topic.
+
+    "axis/ACCC8E012345/event/onvif:Device/axis:Sensor/PIR" gives "ACCC8E012345",
+    the last level of the topic prefix before "/event/".
+    """
+    prefix, _, _ = mqtt_topic.partition(EVENT_TOPIC_SEPARATOR)
+    return intern_str(prefix.rpartition("/")[2])  # type: ignore[no-any-return]
+
+
+def mqtt_message_to_event(message: dict, serial: str = "") -> dict:
+    """Convert decoded MQTT message to event format.
+
+    Serial number of device in message is preferred over serial.
+    """
+    content = message["message"]
 
     source = source_idx = ""
-    if message["message"]["source"]:
-        source, source_idx = next(iter(message["message"]["source"].items()))
+    if content["source"]:
+        source, source_idx = next(iter(content["source"].items()))
 
     data_type = data_value = ""
-    if message["message"]["data"]:
-        data_type, data_value = next(iter(message["message"]["data"].items()))
+    if content["data"]:
+        data_type, data_value = next(iter(content["data"].items()))
 
     return {
-        "operation": OPERATION_CHANGED,
-        "topic": topic,
-        "source": source,
-        "source_idx": source_idx,
-        "type": data_type,
-        "value": data_value,
+        EVENT_OPERATION: OPERATION_CHANGED,
+        EVENT_TOPIC: translate_topic(message["topic"]),
+        EVENT_SOURCE: intern_str(source),
+        EVENT_SOURCE_IDX: source_idx,
+        EVENT_TYPE: intern_str(data_type),
+        EVENT_VALUE: data_value,
+        EVENT_SERIAL: intern_str(message.get("serial") or serial),
     }
 
 
+def mqtt_json_to_event(msg: Union[bytes, str]) -> dict:
+    """Convert JSON message from MQTT to event format."""
+    return mqtt_message_to_event(json_loads(msg))
+
+
+def mqtt_json_to_events(payloads: Iterable[Union[bytes, str]]) -> List[dict]:
+    """Convert JSON messages from MQTT to events for EventManager.update.
+
+    Messages that can't be converted are skipped.
+    """
+    events = []
+    for payload in payloads:
+        try:
+            events.append(mqtt_message_to_event(json_loads(payload)))
+        except (AttributeError, KeyError, TypeError, ValueError):
+            LOGGER.debug("Ignoring MQTT message %s", payload)
+    return events
+
+
+def mqtt_json_to_device_events(
+    messages: Iterable[Tuple[str, Union[bytes, str]]]
+) -> Dict[str, List[dict]]:
+    """Convert JSON messages from MQTT to events per device serial number.
+
+    Messages are pairs of MQTT topic and payload from any number of devices,
+    events of one device keep the order they were published in.
+    Messages that can't be converted are skipped.
+    """
+    devices: Dict[str, List[dict]] = {}
+    for mqtt_topic, payload in messages:
+        try:
+            event = mqtt_message_to_event(
+                json_loads(payload), mqtt_topic_serial(mqtt_topic)
+            )
+        except (AttributeError, KeyError, TypeError, ValueError):
+            LOGGER.debug("Ignoring MQTT message %s", payload)
+            continue
+        devices.setdefault(event[EVENT_SERIAL], []).append(event)
+    return devices
+
+
+def event_filter_topics(
+    event_instances: EventInstances, subscriptions: Collection[str]
+) -> List[str]:
+    """Topic filters of events the device has matching subscriptions.
+
+    Subscriptions are event classes, like "motion",
+    or topics in event stream format, like "tns1:Device/tnsaxis:IO".
+    """
+    topics = [
+        event_instance.topic_filter
+        for subscription in subscriptions
+        for event_instance in (
+            event_instances.index.with_class(subscription)
+            or event_instances.index.with_prefix(subscription)
+        )
+    ]
+    return list(dict.fromkeys(topics))
+
+
 class MqttClient(APIItems):
     """MQTT Client for Axis devices."""
 
@@ -153,6 +271,39 @@ class MqttClient(APIItems):
             ),
         )
 
+    async def update_event_publication(
+        self, event_instances: EventInstances, subscriptions: Collection[str]
+    ) -> bool:
+        """Publish only events matching subscriptions.
+
+        Configuration is only changed if device publishes other topics.
+        Without any matching topic, for example before event instances
+        are loaded, configuration is kept so publication isn't turned off.
+        Return True if configuration was changed.
+        """
+        topics = event_filter_topics(event_instances, subscriptions)
+        if not topics:
+            LOGGER.warning(
+                "No events match subscriptions %s, keeping event publication",
+                list(subscriptions),
+            )
+            return False
+
+        config = await self.get_event_publication_config()
+        event_filters = (
+            config.get("data", {})
+            .get("eventPublicationConfig", {})
+            .get("eventFilterList", [])
+        )
+        current = {event_filter.get("topicFilter") for event_filter in event_filters}
+        if current == set(topics):
+            return False
+
+        await self.configure_event_publication(topics)
+        return True
+
 
 class Client(APIItem):
     """MQTT client."""
+
+    __slots__ = ()
@@ -0,0 +1,321 @@
+"""Subscribe to events devices publish to an MQTT broker.
+
+MQTT 3.1.1 client subscribing with QoS 0 or 1.
+One broker connection can carry the events of many devices,
+events are passed on per device serial number.
+"""
+
+import asyncio
+import logging
+from typing import Callable, List, Optional, Tuple
+
+from .mqtt import mqtt_json_to_device_events
+from .rtsp import SIGNAL_FAILED, SIGNAL_PLAYING
+from .streammanager import ReconnectPolicy
+
+_LOGGER = logging.getLogger(__name__)
+
+MQTT_PORT = 1883
+PROTOCOL_NAME = "MQTT"
+PROTOCOL_LEVEL = 4  # MQTT 3.1.1
+
+CONNECT = 0x10
+CONNACK = 0x20
+PUBLISH = 0x30
+PUBACK = 0x40
+SUBSCRIBE = 0x80
+SUBACK = 0x90
+PINGREQ = 0xC0
+PINGRESP = 0xD0
+DISCONNECT = 0xE0
+
+CONNECT_CLEAN_SESSION = 0x02
+CONNECT_PASSWORD = 0x40
+CONNECT_USERNAME = 0x80
+SUBSCRIBE_FLAGS = 0x02
+SUBACK_FAILURE = 0x80
+
+Packet = Tuple[int, int, memoryview]  # Type, flags, body
+
+
+def encode_length(length: int) -> bytes:
+    """Encode remaining length of packet."""
+    encoded = bytearray()
+    while True:
+        length, digit = divmod(length, 128)
+        encoded.append(digit | (0x80 if length else 0))
+        if not length:
+            return bytes(encoded)
+
+
+def encode_string(value: str) -> bytes:
+    """Encode length prefixed UTF-8 string."""
+    data = value.encode("UTF-8")
+    return len(data).to_bytes(2, "big") + data
+
+
+def packet(packet_type: int, body: bytes = b"") -> bytes:
+    """Add fixed header to body of packet."""
+    return bytes((packet_type,)) + encode_length(len(body)) + body
+
+
+def connect_packet(
+    client_id: str,
+    username: Optional[str],
+    password: Optional[str],
+    keep_alive: int,
+) -> bytes:
+    """Connect with a clean session."""
+    flags = CONNECT_CLEAN_SESSION
+    payload = encode_string(client_id)
+    if username is not None:
+        flags |= CONNECT_USERNAME
+        payload += encode_string(username)
+        if password is not None:
+            flags |= CONNECT_PASSWORD
+            payload += encode_string(password)
+
+    body = encode_string(PROTOCOL_NAME) + bytes((PROTOCOL_LEVEL, flags))
+    body += keep_alive.to_bytes(2, "big")
+    return packet(CONNECT, body + payload)
+
+
+def subscribe_packet(packet_id: int, topics: List[str], qos: int) -> bytes:
+    """Subscribe to topic filters with QoS."""
+    body = packet_id.to_bytes(2, "big")
+    for topic in topics:
+        body += encode_string(topic) + bytes((qos,))
+    return packet(SUBSCRIBE | SUBSCRIBE_FLAGS, body)
+
+
+def parse_packets(buffer: bytearray) -> Tuple[List[Packet], int]:
+    """Return complete packets in buffer and number of bytes they use.
+
+    Packet bodies are views of buffer, consume them before changing buffer.
+    """
+    packets = []
+    view = memoryview(buffer)
+    offset = 0
+
+    while offset + 2 <= len(buffer):
+        length = 0
+        multiplier = 1
+        position = offset + 1
+        while position < len(buffer):
+            digit = buffer[position]
+            length += (digit & 0x7F) * multiplier
+            multiplier *= 128
+            position += 1
+            if not digit & 0x80:
+                break
+        else:
+            break  # Remaining length is incomplete
+
+        if position + length > len(buffer):
+            break
+
+        header = buffer[offset]
+        packets.append(
+            (header & 0xF0, header & 0x0F, view[position : position + length])
+        )
+        offset = position + length
+
+    return packets, offset
+
+
+class MqttSubscriber(asyncio.Protocol):
+    """Receive events from MQTT broker and pass them on in batches.
+
+    Events published while a batch is collected are converted and passed
+    to callback with serial number of device, one list per device.
+    Callback would for example update the EventManager of that device.
+    Batch interval 0 passes on what arrived in one read from the broker.
+    Connection is retried per reconnect policy when it fails or is lost.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        topics: List[str],
+        callback: Callable[[str, List[dict]], None],
+        port: int = MQTT_PORT,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        client_id: str = "",
+        keep_alive: int = 60,
+        qos: int = 0,
+        batch_interval: float = 0,
+        reconnect_policy: Optional[ReconnectPolicy] = None,
+    ) -> None:
+        """Initialize subscriber."""
+        self.host = host
+        self.port = port
+        self.topics = topics
+        self.callback = callback
+        self.username = username
+        self.password = password
+        self.client_id = client_id
+        self.keep_alive = keep_alive
+        self.qos = qos
+        self.batch_interval = batch_interval
+        self.reconnect_policy = reconnect_policy or ReconnectPolicy()
+        self.reconnect_attempt = 0
+
+        self.transport: Optional[asyncio.Transport] = None
+        self.buffer = bytearray()
+        self.packet_id = 0
+        self.subscribed = False
+        self.stopped = False
+        self.awaiting_ping = False
+        self.pending: List[Tuple[str, bytes]] = []
+        self.flush_handle: Optional[asyncio.Handle] = None
+        self.ping_handle: Optional[asyncio.TimerHandle] = None
+        self.retry_handle: Optional[asyncio.TimerHandle] = None
+
+        self.connection_status_callback: List[Callable] = []
+
+    async def start(self) -> None:
+        """Connect to broker."""
+        self.stopped = False
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.create_connection(lambda: self, self.host, self.port)
+        except OSError as err:
+            _LOGGER.debug("MQTT broker %s unavailable %s", self.host, err)
+            self.failed()
+
+    def stop(self) -> None:
+        """Disconnect from broker and stop retrying."""
+        self.stopped = True
+        for handle in (self.ping_handle, self.retry_handle, self.flush_handle):
+            if handle is not None:
+                handle.cancel()
+        self.flush()
+        if self.transport:
+            self.transport.write(packet(DISCONNECT))
+            self.transport.close()
+            self.transport = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        """Send connect to broker."""
+        self.transport = transport  # type: ignore[assignment]
+        self.buffer.clear()
+        self.subscribed = False
+        self.awaiting_ping = False
+        self.transport.write(  # type: ignore[union-attr]
+            connect_packet(
+                self.client_id, self.username, self.password, self.keep_alive
+            )
+        )
+
+    def data_received(self, data: bytes) -> None:
+        """Handle complete packets from broker."""
+        self.buffer += data
+        packets, consumed = parse_packets(self.buffer)
+
+        for packet_type, flags, body in packets:
+            with body:
+                self.packet_received(packet_type, flags, body)
+
+        del self.buffer[:consumed]
+
+        if self.pending and self.flush_handle is None:
+            loop = asyncio.get_running_loop()
+            if self.batch_interval:
+                self.flush_handle = loop.call_later(self.batch_interval, self.flush)
+            else:
+                self.flush_handle = loop.call_soon(self.flush)
+
+    def packet_received(self, packet_type: int, flags: int, body: memoryview) -> None:
+        """Handle packet from broker."""
+        if packet_type == PUBLISH:
+            self.publish_received(flags, body)
+
+        elif packet_type == CONNACK:
+            if len(body) < 2 or body[1] != 0:
+                _LOGGER.warning(
+                    "MQTT broker %s refused connection %s", self.host, bytes(body)
+                )
+                self.transport.close()  # type: ignore[union-attr]
+                return
+            self.packet_id = self.packet_id % 0xFFFF + 1
+            self.transport.write(  # type: ignore[union-attr]
+                subscribe_packet(self.packet_id, self.topics, self.qos)
+            )
+
+        elif packet_type == SUBACK:
+            if SUBACK_FAILURE in body[2:]:
+                _LOGGER.warning("MQTT broker %s refused subscription", self.host)
+            self.subscribed = True
+            self.reconnect_attempt = 0
+            self.schedule_ping()
+            for callback in self.connection_status_callback:
+                callback(SIGNAL_PLAYING)
+
+        elif packet_type == PINGRESP:
+            self.awaiting_ping = False
+
+    def publish_received(self, flags: int, body: memoryview) -> None:
+        """Keep topic and payload of published message until batch is passed on."""
+        qos = (flags >> 1) & 0x03
+        topic_length = int.from_bytes(body[:2], "big")
+        offset = 2 + topic_length
+        topic = str(body[2:offset], "UTF-8")
+
+        if qos:
+            packet_id = body[offset : offset + 2]
+            offset += 2
+            self.transport.write(packet(PUBACK, bytes(packet_id)))  # type: ignore[union-attr]
+
+        self.pending.append((topic, bytes(body[offset:])))
+
+    def flush(self) -> None:
+        """Convert collected messages to events and pass them on per device."""
+        self.flush_handle = None
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, []
+
+        for serial, events in mqtt_json_to_device_events(pending).items():
+            self.callback(serial, events)
+
+    def schedule_ping(self) -> None:
+        """Ping broker within keep alive interval."""
+        if self.keep_alive:
+            loop = asyncio.get_running_loop()
+            self.ping_handle = loop.call_later(self.keep_alive, self.ping)
+
+    def ping(self) -> None:
+        """Ping broker, close connection if previous ping was not answered."""
+        if self.awaiting_ping:
+            _LOGGER.warning("MQTT broker %s stopped responding", self.host)
+            self.transport.close()  # type: ignore[union-attr]
+            return
+        self.awaiting_ping = True
+        self.transport.write(packet(PINGREQ))  # type: ignore[union-attr]
+        self.schedule_ping()
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        """Retry unless stopped when connection to broker is closed."""
+        _LOGGER.debug("MQTT connection to %s lost %s", self.host, exc)
+        if self.ping_handle is not None:
+            self.ping_handle.cancel()
+        self.transport = None
+        if not self.stopped:
+            self.failed()
+
+    def failed(self) -> None:
+        """Signal failure and retry connection per reconnect policy."""
+        for callback in self.connection_status_callback:
+            callback(SIGNAL_FAILED)
+        if self.stopped:
+            return
+        delay = self.reconnect_policy.delay(self.reconnect_attempt)
+        self.reconnect_attempt += 1
+        loop = asyncio.get_running_loop()
+        self.retry_handle = loop.call_later(
+            delay, lambda: loop.create_task(self.start())
+        )
+        _LOGGER.debug(
+            "Reconnecting to MQTT broker %s in %.1f seconds", self.host, delay
+        )
@@ -547,6 +547,8 @@ class Params(APIItems):
 class Param(APIItem):
     """Parameter group."""
 
+    __slots__ = ()
+
     def __contains__(self, obj_id: str) -> bool:
         """Evaluate object membership to parameter group."""
         return obj_id in self.raw
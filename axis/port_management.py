@@ -118,6 +118,8 @@ class IoPortManagement(APIItems):
 class Port(APIItem):
     """I/O port management port."""
 
+    __slots__ = ()
+
     @property
     def configurable(self) -> bool:
         """Is port configurable."""
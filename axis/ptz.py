@@ -5,7 +5,19 @@ The PTZ control is device-dependent. For information about supported parameters
 and actual parameter values, check the specification of the Axis PTZ driver used.
 """
 
-from typing import Callable, Dict, Optional, Union
+import asyncio
+from collections import deque
+from functools import partial
+import logging
+from typing import Any, Callable, Deque, Dict, Optional, Set, Tuple, Union
+
+import attr
+
+from .errors import AxisException
+from .event_stream import AxisEvent, PtzMove, PtzPreset
+from .param_cgi import PTZ, Params
+
+_LOGGER = logging.getLogger(__name__)
 
 URL = "/axis-cgi/com/ptz.cgi"
 
@@ -54,6 +66,58 @@ SUPPORTED_QUERIES = (
 )
 
 
+POSITION_POLL_INTERVAL = 0.5
+
+CONTINUOUS_COMMANDS = (
+    "continuouspantiltmove",
+    "continuouszoommove",
+    "continuousfocusmove",
+    "continuousirismove",
+    "continuousbrightnessmove",
+)
+
+
+# Argument: capability in PTZ.Support and feature in PTZ.Various it requires
+REQUIREMENTS = {
+    "pan": ("AbsolutePan", "PanEnabled"),
+    "tilt": ("AbsoluteTilt", "TiltEnabled"),
+    "zoom": ("AbsoluteZoom", "ZoomEnabled"),
+    "focus": ("AbsoluteFocus", "FocusEnabled"),
+    "iris": ("AbsoluteIris", "IrisEnabled"),
+    "brightness": ("AbsoluteBrightness", "BrightnessEnabled"),
+    "rpan": ("RelativePan", "PanEnabled"),
+    "rtilt": ("RelativeTilt", "TiltEnabled"),
+    "rzoom": ("RelativeZoom", "ZoomEnabled"),
+    "rfocus": ("RelativeFocus", "FocusEnabled"),
+    "riris": ("RelativeIris", "IrisEnabled"),
+    "rbrightness": ("RelativeBrightness", "BrightnessEnabled"),
+    "continuouszoommove": ("ContinuousZoom", "ZoomEnabled"),
+    "continuousfocusmove": ("ContinuousFocus", "FocusEnabled"),
+    "continuousirismove": ("ContinuousIris", "IrisEnabled"),
+    "continuousbrightnessmove": ("ContinuousBrightness", "BrightnessEnabled"),
+    "areazoom": ("AreaZoom", "ZoomEnabled"),
+    "autofocus": ("AutoFocus", "FocusEnabled"),
+    "autoiris": ("AutoIris", "IrisEnabled"),
+    "backlight": ("BackLight", "BackLightEnabled"),
+    "ircutfilter": ("IrCutFilter", "IrCutFilterEnabled"),
+    "auxiliary": ("Auxiliary", ""),
+    "gotoserverpresetname": ("ServerPreset", ""),
+    "gotoserverpresetno": ("ServerPreset", ""),
+    "gotodevicepreset": ("DevicePreset", ""),
+    "speed": ("SpeedCtl", "SpeedCtlEnabled"),
+}
+
+# Absolute argument: limits in PTZ.Limit
+ARGUMENT_LIMITS = {
+    "pan": ("MinPan", "MaxPan"),
+    "tilt": ("MinTilt", "MaxTilt"),
+    "zoom": ("MinZoom", "MaxZoom"),
+    "focus": ("MinFocus", "MaxFocus"),
+    "iris": ("MinIris", "MaxIris"),
+    "brightness": ("MinBrightness", "MaxBrightness"),
+}
+
+
 def limit(
     num: Union[int, float], minimum: Union[int, float], maximum: Union[int, float]
 ) -> Union[int, float]:
@@ -61,12 +125,350 @@ def limit(
     return max(min(num, maximum), minimum)
 
 
+def to_number(value: Union[int, float, str]) -> Union[int, float]:
+    """Convert parameter value to number, numbers are kept as they are."""
+    if isinstance(value, (int, float)):
+        return value
+    return float(value)
+
+
+def parse_key_values(raw: str) -> Dict[str, str]:
+    """Parse lines of key=value, lines without a value are skipped."""
+    values = {}
+    for line in raw.splitlines():
+        key, separator, value = line.partition("=")
+        if separator:
+            values[key.strip()] = value.strip()
+    return values
+
+
+@attr.s
+class PtzLimits:
+    """PTZ limits of a camera, None if the driver doesn't report a limit."""
+
+    min_pan: Optional[float] = attr.ib(default=None)
+    max_pan: Optional[float] = attr.ib(default=None)
+    min_tilt: Optional[float] = attr.ib(default=None)
+    max_tilt: Optional[float] = attr.ib(default=None)
+    min_zoom: Optional[int] = attr.ib(default=None)
+    max_zoom: Optional[int] = attr.ib(default=None)
+    min_iris: Optional[int] = attr.ib(default=None)
+    max_iris: Optional[int] = attr.ib(default=None)
+    min_focus: Optional[int] = attr.ib(default=None)
+    max_focus: Optional[int] = attr.ib(default=None)
+    min_field_angle: Optional[int] = attr.ib(default=None)
+    max_field_angle: Optional[int] = attr.ib(default=None)
+    min_brightness: Optional[int] = attr.ib(default=None)
+    max_brightness: Optional[int] = attr.ib(default=None)
+
+
+@attr.s
+class PresetPosition:
+    """Preset position with position data measured in degrees."""
+
+    name: str = attr.ib()
+    pan: Optional[float] = attr.ib(default=None)
+    tilt: Optional[float] = attr.ib(default=None)
+    zoom: Optional[int] = attr.ib(default=None)
+
+
+LIMITS = {
+    "MinPan": ("min_pan", float),
+    "MaxPan": ("max_pan", float),
+    "MinTilt": ("min_tilt", float),
+    "MaxTilt": ("max_tilt", float),
+    "MinZoom": ("min_zoom", int),
+    "MaxZoom": ("max_zoom", int),
+    "MinIris": ("min_iris", int),
+    "MaxIris": ("max_iris", int),
+    "MinFocus": ("min_focus", int),
+    "MaxFocus": ("max_focus", int),
+    "MinFieldAngle": ("min_field_angle", int),
+    "MaxFieldAngle": ("max_field_angle", int),
+    "MinBrightness": ("min_brightness", int),
+    "MaxBrightness": ("max_brightness", int),
+}
+
+PRESET_HEADER = "Preset Positions for camera"
+PRESET_KEY = "presetposno"
+
+
+def parse_limits(raw: str) -> PtzLimits:
+    """Parse response to limits query."""
+    limits = PtzLimits()
+    for key, value in parse_key_values(raw).items():
+        if key in LIMITS:
+            attribute, convert = LIMITS[key]
+            setattr(limits, attribute, convert(value))
+    return limits
+
+
+def parse_presets_of_cameras(raw: str) -> Dict[int, Dict[int, str]]:
+    """Parse preset names per camera of presetposall and presetposcam queries.
+
+    Presets of a camera follow a "Preset Positions for camera 1" line,
+    presets before any such line belong to camera 1.
+    """
+    cameras: Dict[int, Dict[int, str]] = {}
+    presets = cameras.setdefault(1, {})
+    for line in raw.splitlines():
+        line = line.strip()
+        if line.startswith(PRESET_HEADER):
+            camera = line[len(PRESET_HEADER) :].strip()
+            presets = cameras.setdefault(int(camera) if camera.isdigit() else 1, {})
+            continue
+        key, _, value = line.partition("=")
+        number = key[len(PRESET_KEY) :]
+        if key.startswith(PRESET_KEY) and number.isdigit():
+            presets[int(number)] = value
+    return {camera: presets for camera, presets in cameras.items() if presets}
+
+
+def parse_presets(raw: str) -> Dict[int, str]:
+    """Parse preset names of presetposcam query."""
+    cameras = parse_presets_of_cameras(raw)
+    return next(iter(cameras.values())) if cameras else {}
+
+
+def parse_preset_positions(raw: str) -> Dict[int, PresetPosition]:
+    """Parse presets of presetposcamdata query.
+
+    Values are a name or colon separated position data,
+    like "pan=1.5:tilt=-20.0:zoom=1:name=Gate".
+    """
+    positions = {}
+    for number, value in parse_presets(raw).items():
+        position = PresetPosition(name="")
+        for part in value.split(":"):
+            key, separator, data = part.partition("=")
+            if not separator or key == "name":
+                position.name = data if separator else part
+            elif key in ("pan", "tilt"):
+                setattr(position, key, float(data))
+            elif key == "zoom":
+                position.zoom = int(data)
+        positions[number] = position
+    return positions
+
+
+def parse_speed(raw: str) -> Optional[int]:
+    """Parse response to speed query."""
+    speed = parse_key_values(raw).get("speed")
+    return int(speed) if speed is not None else None
+
+
+def camera_of(event: AxisEvent) -> int:
+    """Video channel of PTZ event topic, like tns1:PTZController/tnsaxis:Move/Channel_1."""
+    channel = event.topic.rpartition("Channel_")[2]
+    return int(channel) if channel.isdigit() else 1
+
+
+@attr.s
+class PtzState:
+    """Position, preset and movement of a camera, None until known."""
+
+    pan: Optional[float] = attr.ib(default=None)
+    tilt: Optional[float] = attr.ib(default=None)
+    zoom: Optional[int] = attr.ib(default=None)
+    focus: Optional[int] = attr.ib(default=None)
+    iris: Optional[int] = attr.ib(default=None)
+    preset: Optional[int] = attr.ib(default=None)
+    moving: bool = attr.ib(default=False)
+
+    def update_position(self, position: Dict[str, str]) -> None:
+        """Update from response to position query."""
+        for key, convert in (
+            ("pan", float),
+            ("tilt", float),
+            ("zoom", int),
+            ("focus", int),
+            ("iris", int),
+        ):
+            if key in position:
+                setattr(self, key, convert(position[key]))
+
+
+@attr.s
+class PtzCapabilities:
+    """Limits, supported capabilities and enabled features of a camera.
+
+    From PTZ.Limit, PTZ.Support and PTZ.Various parameters of the camera.
+    Capabilities and features without a parameter are assumed to be supported.
+    """
+
+    limits: dict = attr.ib(factory=dict)
+    support: dict = attr.ib(factory=dict)
+    various: dict = attr.ib(factory=dict)
+
+    def supports(self, argument: str, value: Any = None) -> bool:
+        """Camera can handle argument of PTZ control."""
+        if argument == "continuouspantiltmove":
+            return self.supports_axis("Pan") or self.supports_axis("Tilt")
+        if argument == "ircutfilter" and value == AUTO:
+            if not self.support.get("AutoIrCutFilter", True):
+                return False
+        if argument not in REQUIREMENTS:
+            return True
+        capability, feature = REQUIREMENTS[argument]
+        return self.support.get(capability, True) is not False and (
+            not feature or self.various.get(feature, True) is not False
+        )
+
+    def supports_axis(self, axis: str) -> bool:
+        """Camera can move continuously along Pan or Tilt axis."""
+        return (
+            self.support.get(f"Continuous{axis}", True) is not False
+            and self.various.get(f"{axis}Enabled", True) is not False
+        )
+
+    def validate(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Clamp arguments to limits and drop arguments camera can't handle."""
+        valid = {}
+        for key, value in data.items():
+            if not self.supports(key, value):
+                continue
+
+            if key in ARGUMENT_LIMITS:
+                minimum, maximum = (
+                    self.limits.get(name) for name in ARGUMENT_LIMITS[key]
+                )
+                if minimum is not None and maximum is not None:
+                    value = limit(value, to_number(minimum), to_number(maximum))
+
+            elif key == "continuouspantiltmove":
+                pan_speed, tilt_speed = value.split(",")
+                if not self.supports_axis("Pan"):
+                    pan_speed = "0"
+                if not self.supports_axis("Tilt"):
+                    tilt_speed = "0"
+                value = f"{pan_speed},{tilt_speed}"
+
+            valid[key] = value
+
+        if "center" not in valid and "areazoom" not in valid:
+            valid.pop("imagewidth", None)
+            valid.pop("imageheight", None)
+
+        return valid
+
+
+def is_stop(key: str, value: Any) -> bool:
+    """Argument stops a movement."""
+    if key == "move":
+        return value == MOVE_STOP
+    if key == "continuouspantiltmove":
+        return tuple(value) == (0, 0)
+    return key in CONTINUOUS_COMMANDS and value == 0
+
+
+class PtzCommandChannel:
+    """Send PTZ commands to a camera with at most one request in flight.
+
+    Commands are sent in order. Continuous moves queued after each other
+    are merged so only the latest speed of each movement is sent.
+    Stops are sent immediately, replace pending moves they stop
+    and are sent again after a request that was in flight.
+    """
+
+    def __init__(self, control: Callable, camera: Optional[int] = None) -> None:
+        """Initialize channel sending commands with control."""
+        self._control = control
+        self.camera = camera
+        self.pending: Deque[Dict[str, Any]] = deque()
+        self.task: Optional[asyncio.Task] = None
+        self.stop_tasks: Set[asyncio.Task] = set()
+        self.requests = 0
+        self.coalesced = 0
+
+    def send(self, **command: Any) -> None:
+        """Queue command with arguments of PtzControl.control."""
+        stops = {key: value for key, value in command.items() if is_stop(key, value)}
+        if stops:
+            self.discard_stopped(stops)
+            stop_task = asyncio.get_running_loop().create_task(self.request(stops))
+            self.stop_tasks.add(stop_task)
+            stop_task.add_done_callback(self.stop_tasks.discard)
+            if self.task is None:
+                command = {
+                    key: value for key, value in command.items() if key not in stops
+                }
+        if not command:
+            return
+
+        last = self.pending[-1] if self.pending else None
+        if (
+            last is not None
+            and all(key in CONTINUOUS_COMMANDS for key in last)
+            and all(key in CONTINUOUS_COMMANDS for key in command)
+        ):
+            self.coalesced += len(last.keys() & command.keys())
+            last.update(command)
+        else:
+            self.pending.append(command)
+
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    def discard_stopped(self, stops: Dict[str, Any]) -> None:
+        """Remove pending moves of movements being stopped."""
+        stopped = set(stops)
+        if "move" in stopped:
+            stopped.add("continuouspantiltmove")
+        for command in list(self.pending):
+            if all(key in CONTINUOUS_COMMANDS for key in command):
+                for key in stopped & command.keys():
+                    del command[key]
+                if not command:
+                    self.pending.remove(command)
+
+    async def run(self) -> None:
+        """Send pending commands one at a time."""
+        try:
+            while self.pending:
+                await self.request(self.pending.popleft())
+        finally:
+            self.task = None
+
+    async def request(self, command: Dict[str, Any]) -> None:
+        """Send command, errors are logged since nobody awaits the command."""
+        self.requests += 1
+        try:
+            await self._control(camera=self.camera, **command)
+        except AxisException as err:
+            _LOGGER.warning("PTZ command %s failed: %s", command, err)
+
+    async def join(self) -> None:
+        """Wait until pending commands and stops are sent."""
+        while self.task is not None or self.stop_tasks:
+            tasks = set(self.stop_tasks)
+            if self.task is not None:
+                tasks.add(self.task)
+            await asyncio.wait(tasks)
+
+
 class PtzControl:
     """Configure and control the PTZ functionality."""
 
-    def __init__(self, request: Callable) -> None:
-        """Initialize PTZ control."""
+    def __init__(self, request: Callable, params: Optional[Params] = None) -> None:
+        """Initialize PTZ control.
+
+        With PTZ parameters commands are validated against capabilities of camera.
+        """
         self._request = request
+        self.params = params
+        self.capabilities: Dict[int, PtzCapabilities] = {}
+        self.channels: Dict[Optional[int], PtzCommandChannel] = {}
+        self.states: Dict[int, PtzState] = {}
+        self.poll_tasks: Dict[int, asyncio.Task] = {}
+        self.observed: Dict[int, Tuple[AxisEvent, Callable]] = {}
+        self.poll_interval = POSITION_POLL_INTERVAL
+        self.cache: Dict[Tuple[str, Optional[int]], Any] = {}
+
+    def channel(self, camera: Optional[int] = None) -> PtzCommandChannel:
+        """Command channel of camera, for joysticks and other frequent commands."""
+        if camera not in self.channels:
+            self.channels[camera] = PtzCommandChannel(self.control, camera)
+        return self.channels[camera]
 
     async def control(
         self,
@@ -230,11 +632,47 @@ class PtzControl:
         if gotodevicepreset:
             data["gotodevicepreset"] = gotodevicepreset
 
+        capabilities = self.camera_capabilities(camera or 1)
+        if capabilities is not None:
+            valid = capabilities.validate(data)
+            if valid.keys() != data.keys():
+                _LOGGER.debug(
+                    "Camera %s can't handle PTZ arguments %s",
+                    camera or 1,
+                    data.keys() - valid.keys(),
+                )
+            data = valid
+
         if len(data) == 0 or (len(data) == 1 and "camera" in data):
             return None
 
+        if "speed" in data:
+            self.cache.pop((QUERY_SPEED, camera or 1), None)
+
         return await self._request("post", URL, data=data)
 
+    def camera_capabilities(self, camera: int = 1) -> Optional[PtzCapabilities]:
+        """Capabilities of camera, None without PTZ parameters.
+
+        Capabilities are cached until PTZ parameters are updated.
+        """
+        if self.params is None or PTZ not in self.params:
+            return None
+        if camera not in self.capabilities:
+            ptz_params = self.params[PTZ]
+            if self.params_updated not in ptz_params.observers:
+                ptz_params.register_callback(self.params_updated)
+            self.capabilities[camera] = PtzCapabilities(
+                self.params.ptz_limits.get(camera, {}),
+                self.params.ptz_support.get(camera, {}),
+                self.params.ptz_various.get(camera, {}),
+            )
+        return self.capabilities[camera]
+
+    def params_updated(self) -> None:
+        """Drop cached capabilities when PTZ parameters are updated."""
+        self.capabilities.clear()
+
     async def query(self, query: str) -> str:
         """Retrieve current status.
 
@@ -250,6 +688,131 @@ class PtzControl:
             return ""
         return await self._request("post", URL, data={"query": query})
 
+    async def cached_query(
+        self, query: str, parse: Callable[[str], Any], camera: Optional[int] = None
+    ) -> Any:
+        """Query camera once and keep parsed response until invalidated."""
+        key = (query, camera)
+        if key not in self.cache:
+            data: Dict[str, Union[int, str]] = {"query": query}
+            if camera is not None:
+                data["camera"] = camera
+            self.cache[key] = parse(await self._request("post", URL, data=data))
+        return self.cache[key]
+
+    def invalidate_presets(self, camera: Optional[int] = None) -> None:
+        """Forget cached presets of camera, or of all cameras."""
+        for query, cached_camera in list(self.cache):
+            if query in (
+                QUERY_PRESETPOSALL,
+                QUERY_PRESETPOSCAM,
+                QUERY_PRESETPOSCAMDATA,
+            ) and (camera is None or cached_camera in (camera, None)):
+                del self.cache[(query, cached_camera)]
+
+    async def limits(self, camera: int = 1) -> PtzLimits:
+        """PTZ limits of camera."""
+        return await self.cached_query(QUERY_LIMITS, parse_limits, camera)
+
+    async def presets(self, camera: int = 1) -> Dict[int, str]:
+        """Preset names of camera by preset number."""
+        return await self.cached_query(QUERY_PRESETPOSCAM, parse_presets, camera)
+
+    async def presets_of_cameras(self) -> Dict[int, Dict[int, str]]:
+        """Preset names by preset number of every camera."""
+        return await self.cached_query(QUERY_PRESETPOSALL, parse_presets_of_cameras)
+
+    async def preset_positions(self, camera: int = 1) -> Dict[int, PresetPosition]:
+        """Presets of camera with position data by preset number."""
+        return await self.cached_query(
+            QUERY_PRESETPOSCAMDATA, parse_preset_positions, camera
+        )
+
+    async def speed(self, camera: int = 1) -> Optional[int]:
+        """Pan and tilt speed of camera."""
+        return await self.cached_query(QUERY_SPEED, parse_speed, camera)
+
+    def state(self, camera: int = 1) -> PtzState:
+        """Return cached state of camera."""
+        if camera not in self.states:
+            self.states[camera] = PtzState()
+        return self.states[camera]
+
+    async def update_position(self, camera: int = 1) -> PtzState:
+        """Refresh position of camera."""
+        raw = await self._request(
+            "post", URL, data={"query": QUERY_POSITION, "camera": camera}
+        )
+        state = self.state(camera)
+        state.update_position(parse_key_values(raw))
+        return state
+
+    def observe(self, event: AxisEvent) -> None:
+        """Keep state of camera updated from PTZ move and preset events.
+
+        Call with new events, other events are ignored.
+        Observing an event again has no effect.
+        """
+        if id(event) in self.observed:
+            return
+
+        if isinstance(event, (PtzMove, PtzPreset)):
+            callback = partial(self.event_updated, event)
+            event.register_callback(callback)
+            self.observed[id(event)] = (event, callback)
+            self.event_updated(event)
+
+        if isinstance(event, PtzPreset):  # New preset
+            self.invalidate_presets(camera_of(event))
+
+    def event_updated(self, event: AxisEvent) -> None:
+        """Update state from PTZ move or preset event."""
+        camera = camera_of(event)
+        state = self.state(camera)
+
+        if isinstance(event, PtzPreset):
+            preset = int(event.id) if event.id.isdigit() else None
+            if event.is_tripped:
+                state.preset = preset
+            elif state.preset == preset:
+                state.preset = None
+            return
+
+        state.moving = event.is_tripped  # type: ignore[attr-defined]
+        if state.moving:
+            state.preset = None
+            if camera not in self.poll_tasks:
+                self.poll_tasks[camera] = asyncio.get_running_loop().create_task(
+                    self.poll_position(camera)
+                )
+
+    async def poll_position(self, camera: int) -> None:
+        """Poll position while camera moves and once when it stops."""
+        state = self.state(camera)
+        try:
+            while True:
+                moving = state.moving
+                try:
+                    await self.update_position(camera)
+                except AxisException as err:
+                    _LOGGER.debug("Failed to poll PTZ position: %s", err)
+                if not moving:
+                    break
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            self.poll_tasks.pop(camera, None)
+
+    def close(self) -> None:
+        """Stop polling positions and observing events and parameters."""
+        for task in self.poll_tasks.values():
+            task.cancel()
+        self.poll_tasks.clear()
+        for event, callback in self.observed.values():
+            event.remove_callback(callback)
+        self.observed.clear()
+        if self.params is not None and PTZ in self.params:
+            self.params[PTZ].remove_callback(self.params_updated)
+
     async def configured_device_driver(self) -> str:
         """Name of the system-configured device driver."""
         return await self._request("post", URL, data={"whoami": 1})
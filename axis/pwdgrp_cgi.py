@@ -122,6 +122,8 @@ class Users(APIItems):
 class User(APIItem):
     """Represents a user."""
 
+    __slots__ = ()
+
     @property
     def name(self) -> str:
         """User name."""
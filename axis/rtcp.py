@@ -0,0 +1,228 @@
+"""RTCP sender report parsing, receiver reports and RTP stream statistics.
+
+RFC 3550.
+"""
+
+import logging
+import socket
+import struct
+from time import time
+from typing import List, Optional, Union
+
+import attr
+
+_LOGGER = logging.getLogger(__name__)
+
+RTCP_SENDER_REPORT = 200
+RTCP_RECEIVER_REPORT = 201
+RTCP_SOURCE_DESCRIPTION = 202
+
+RTCP_HEADER = struct.Struct("!BBHI")  # Flags, packet type, length, SSRC
+RTCP_SENDER_INFO = struct.Struct("!IIIII")  # NTP sec, NTP frac, RTP ts, packets, octets
+RTCP_REPORT_BLOCK = struct.Struct("!IIIIII")
+RTP_HEADER = struct.Struct("!BBHII")  # Flags, payload type, sequence, timestamp, SSRC
+
+RTCP_VERSION = 0x80
+RTCP_INTERVAL = 5  # Seconds between receiver reports
+SDES_CNAME = 1
+
+DEFAULT_CLOCK_RATE = 90000
+NTP_EPOCH_OFFSET = 2208988800  # Seconds from 1900 to 1970
+RTP_SEQ_MOD = 1 << 16
+MAX_DROPOUT = 3000
+MAX_MISORDER = 100
+
+
+@attr.s(slots=True)
+class SenderReport:
+    """RTCP sender report relating RTP timestamp to wall clock of device."""
+
+    ssrc: int = attr.ib()
+    wall_clock: float = attr.ib()  # Seconds since epoch
+    rtp_timestamp: int = attr.ib()
+    packet_count: int = attr.ib()
+    octet_count: int = attr.ib()
+    ntp_middle: int = attr.ib()  # Middle 32 bits of NTP timestamp, echoed as LSR
+    received: float = attr.ib()  # Local time report was received
+
+
+def parse_rtcp(packet: Union[bytes, memoryview], received: float) -> List[SenderReport]:
+    """Return sender reports of a compound RTCP packet."""
+    reports = []
+    offset = 0
+
+    while offset + RTCP_HEADER.size <= len(packet):
+        flags, packet_type, length, ssrc = RTCP_HEADER.unpack_from(packet, offset)
+        end = offset + (length + 1) * 4
+
+        if flags & 0xC0 != RTCP_VERSION or end > len(packet):
+            _LOGGER.debug("Invalid RTCP packet")
+            break
+
+        if packet_type == RTCP_SENDER_REPORT:
+            (
+                seconds,
+                fraction,
+                rtp_timestamp,
+                packets,
+                octets,
+            ) = RTCP_SENDER_INFO.unpack_from(packet, offset + RTCP_HEADER.size)
+            reports.append(
+                SenderReport(
+                    ssrc=ssrc,
+                    wall_clock=seconds - NTP_EPOCH_OFFSET + fraction / (1 << 32),
+                    rtp_timestamp=rtp_timestamp,
+                    packet_count=packets,
+                    octet_count=octets,
+                    ntp_middle=((seconds & 0xFFFF) << 16) | (fraction >> 16),
+                    received=received,
+                )
+            )
+
+        offset = end
+
+    return reports
+
+
+class RTPStatistics:
+    """Reception statistics of one RTP stream.
+
+    Tracks sequence numbers for packet loss and arrival times for
+    interarrival jitter. Sender reports map RTP timestamps to wall clock.
+    """
+
+    def __init__(self, clock_rate: int = DEFAULT_CLOCK_RATE) -> None:
+        """Initialize statistics of a stream sampled with clock_rate."""
+        self.clock_rate = clock_rate
+        self.ssrc: Optional[int] = None
+        self.base_sequence = 0
+        self.max_sequence = 0
+        self.cycles = 0
+        self.received = 0
+        self._expected_prior = 0
+        self._received_prior = 0
+        self._transit: Optional[float] = None
+        self._jitter = 0.0
+        self.sender_report: Optional[SenderReport] = None
+
+    def packet_received(
+        self, header: Union[bytes, memoryview], arrival: Optional[float] = None
+    ) -> None:
+        """Update statistics with header of received RTP packet."""
+        if len(header) < RTP_HEADER.size:
+            return
+        _, _, sequence, timestamp, ssrc = RTP_HEADER.unpack_from(header)
+        arrival = time() if arrival is None else arrival
+
+        if ssrc != self.ssrc:
+            self.restart(ssrc, sequence)
+
+        delta = (sequence - self.max_sequence) % RTP_SEQ_MOD
+        if 0 < delta < MAX_DROPOUT:
+            if sequence < self.max_sequence:
+                self.cycles += RTP_SEQ_MOD
+            self.max_sequence = sequence
+        elif MAX_DROPOUT <= delta <= RTP_SEQ_MOD - MAX_MISORDER:
+            self.restart(ssrc, sequence)  # Source restarted with new sequence
+        self.received += 1
+
+        transit = arrival * self.clock_rate - timestamp
+        if self._transit is not None:
+            self._jitter += (abs(transit - self._transit) - self._jitter) / 16
+        self._transit = transit
+
+    def restart(self, ssrc: int, sequence: int) -> None:
+        """Start over tracking source from sequence."""
+        self.ssrc = ssrc
+        self.base_sequence = self.max_sequence = sequence
+        self.cycles = 0
+        self.received = self._expected_prior = self._received_prior = 0
+        self._transit = None
+        self._jitter = 0.0
+
+    def sender_report_received(self, report: SenderReport) -> None:
+        """Store latest sender report of tracked source."""
+        if self.ssrc is None or report.ssrc == self.ssrc:
+            self.sender_report = report
+
+    @property
+    def extended_max_sequence(self) -> int:
+        """Highest sequence number received extended with wrap arounds."""
+        return self.cycles + self.max_sequence
+
+    @property
+    def expected(self) -> int:
+        """Number of packets expected from sequence numbers."""
+        if self.ssrc is None:
+            return 0
+        return self.extended_max_sequence - self.base_sequence + 1
+
+    @property
+    def lost(self) -> int:
+        """Cumulative number of packets lost, negative if duplicates arrived."""
+        return self.expected - self.received
+
+    @property
+    def jitter(self) -> float:
+        """Interarrival jitter in seconds."""
+        return self._jitter / self.clock_rate
+
+    def wall_clock(self, rtp_timestamp: int) -> Optional[float]:
+        """Map RTP timestamp to device wall clock, None until a sender report."""
+        report = self.sender_report
+        if not report:
+            return None
+        delta = (rtp_timestamp - report.rtp_timestamp) & 0xFFFFFFFF
+        if delta & 0x80000000:
+            delta -= 1 << 32
+        return report.wall_clock + delta / self.clock_rate
+
+    def fraction_lost(self) -> int:
+        """Fraction lost since last call in units of 1/256."""
+        expected = self.expected
+        expected_interval = expected - self._expected_prior
+        received_interval = self.received - self._received_prior
+        self._expected_prior = expected
+        self._received_prior = self.received
+
+        lost_interval = expected_interval - received_interval
+        if expected_interval == 0 or lost_interval <= 0:
+            return 0
+        return (lost_interval << 8) // expected_interval
+
+    def receiver_report(
+        self, ssrc: int, cname: str, now: Optional[float] = None
+    ) -> Optional[bytes]:
+        """Compound receiver report and source description, None before any data."""
+        if self.ssrc is None:
+            return None
+        now = time() if now is None else now
+
+        last_sender_report = delay = 0
+        if self.sender_report:
+            last_sender_report = self.sender_report.ntp_middle
+            delay = int((now - self.sender_report.received) * 65536)
+
+        lost = max(min(self.lost, 0x7FFFFF), -0x800000) & 0xFFFFFF
+        report = RTCP_HEADER.pack(RTCP_VERSION | 1, RTCP_RECEIVER_REPORT, 7, ssrc)
+        report += RTCP_REPORT_BLOCK.pack(
+            self.ssrc,
+            (self.fraction_lost() << 24) | lost,
+            self.extended_max_sequence & 0xFFFFFFFF,
+            int(self._jitter) & 0xFFFFFFFF,
+            last_sender_report,
+            delay & 0xFFFFFFFF,
+        )
+
+        item = cname.encode()[:255]
+        chunk = struct.pack("!IBB", ssrc, SDES_CNAME, len(item)) + item + b"\0"
+        chunk += bytes(-len(chunk) % 4)
+        report += RTCP_HEADER.pack(
+            RTCP_VERSION | 1, RTCP_SOURCE_DESCRIPTION, len(chunk) // 4, ssrc
+        )[:4]
+        return report + chunk
+
+
+def local_cname() -> str:
+    """Canonical name identifying this receiver."""
+    return f"axis@{socket.gethostname()}"
@@ -5,10 +5,19 @@
 # https://github.com/perexg/satip-axe/blob/master/tools/multicast-rtp
 
 import asyncio
-from collections import deque
 import logging
+import random
+import re
 import socket
-from typing import Any, Callable, Deque, Dict, List, Optional
+import struct
+import sys
+from time import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import attr
+
+from .digest import DigestAuth
+from .rtcp import RTCP_INTERVAL, RTPStatistics, local_cname, parse_rtcp
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -25,28 +34,290 @@ SIGNAL_PLAYING = "playing"
 
 TIME_OUT_LIMIT = 5
 
+MEDIA_APPLICATION = "application"
+MEDIA_VIDEO = "video"
+
+TRANSPORT_MULTICAST = "multicast"
+TRANSPORT_TCP = "tcp"
+TRANSPORT_UDP = "udp"
+
+HEADER_END = b"\r\n\r\n"
+RTSP_PREFIX = b"RTSP/"
+INTERLEAVED_MARKER = ord("$")
+INTERLEAVED_HEADER_LENGTH = 4
+RTP_HEADER_LENGTH = 12
+AUTH_PARAM = re.compile(r'(\w+)=(?:"([^"]*)"|([^,\s]*))')
+INTERLEAVED_CHANNELS = re.compile(r"interleaved=(\d+)-(\d+)")
+SERVER_PORTS = re.compile(r"server_port=(\d+)-(\d+)")
+MULTICAST_DESTINATION = re.compile(r"destination=([\d.]+)")
+MULTICAST_PORTS = re.compile(r";port=(\d+)-(\d+)")
+CLOCK_RATE = re.compile(r"a=rtpmap:\d+ [^/]+/(\d+)")
+BIND_ATTEMPTS = 10
+DATAGRAM_SIZE = 65536
+POOL_SIZE = 1  # Datagrams are consumed before the next one is read
+RECEIVE_BATCH = 32  # Datagrams read per socket readiness
+IP_MULTICAST_ALL = getattr(socket, "IP_MULTICAST_ALL", 49)  # Linux only
+
+
+@attr.s(slots=True)
+class RTSPResponse:
+    """RTSP response with header names in lower case."""
+
+    rtsp_version: Optional[int] = attr.ib(default=None)
+    status_code: Optional[int] = attr.ib(default=None)
+    status_text: Optional[str] = attr.ib(default=None)
+    headers: Dict[str, str] = attr.ib(factory=dict)
+    authenticate: List[str] = attr.ib(factory=list)
+    body: str = attr.ib(default="")
+
+
+@attr.s(slots=True)
+class SessionCache:
+    """Negotiated session data reused when reconnecting to the same URL."""
+
+    url: str = attr.ib()
+    basic: bool = attr.ib()
+    digest: bool = attr.ib()
+    realm: Optional[str] = attr.ib()
+    nonce: Optional[str] = attr.ib()
+    content_base: Optional[str] = attr.ib()
+    sdp: Optional[List[str]] = attr.ib()
+    control_url: Optional[str] = attr.ib()
+    clock_rate: int = attr.ib()
+    digest_auth: Optional[DigestAuth] = attr.ib(default=None)
+
+
+@attr.s(slots=True)
+class SilencePolicy:
+    """How long a playing session may go without receiving RTP or RTCP.
+
+    Silence limit is factor times the normal interval between packets,
+    kept within min and max silence. Max silence applies until
+    the normal interval is known.
+    """
+
+    factor: float = attr.ib(default=4)
+    min_silence: float = attr.ib(default=15)
+    max_silence: float = attr.ib(default=300)
+
+    def limit(self, interval: Optional[float]) -> float:
+        """Seconds of silence before acting given normal packet interval."""
+        if interval is None:
+            return self.max_silence
+        return max(self.min_silence, min(self.max_silence, self.factor * interval))
+
+
+def parse_response_head(head: str) -> RTSPResponse:
+    """Parse status line and headers in one pass.
+
+    Header names are stored in lower case to be looked up case-insensitively.
+    WWW-Authenticate can be repeated so all its values are kept.
+    Raise ValueError if version or status code is not a number.
+    """
+    response = RTSPResponse()
+    lines = head.splitlines()
+
+    if lines and lines[0].startswith("RTSP/"):
+        version, _, status = lines[0].partition(" ")
+        status_code, _, status_text = status.partition(" ")
+        response.rtsp_version = int(version[5:].partition(".")[0])
+        response.status_code = int(status_code)
+        response.status_text = status_text
+        lines = lines[1:]
+
+    for line in lines:
+        name, separator, value = line.partition(":")
+        if not separator:
+            continue
+        name = name.strip().lower()
+        value = value.strip()
+        if name == "www-authenticate":
+            response.authenticate.append(value)
+        response.headers[name] = value
+
+    return response
+
+
+def parse_response(response: str) -> RTSPResponse:
+    """Parse a complete RTSP response."""
+    head, _, body = response.partition("\r\n\r\n")
+    parsed_response = parse_response_head(head)
+    parsed_response.body = body
+    return parsed_response
+
+
+def parse_auth_params(challenge: str) -> Dict[str, str]:
+    """Parse parameters of an authentication challenge."""
+    return {
+        key.lower(): quoted if quoted else value
+        for key, quoted, value in AUTH_PARAM.findall(challenge)
+    }
+
+
+class RTSPResponseReader:
+    """Incrementally frame RTSP responses from a byte stream.
+
+    Handles responses split over several reads as well as several responses
+    in one read. Body length is decided by the Content-Length header.
+    RTP and RTCP packets interleaved on the connection are framed by their
+    "$" header and handed to interleaved_callback as a memoryview of the buffer,
+    the view is only valid for the duration of the callback.
+    """
+
+    def __init__(
+        self, interleaved_callback: Optional[Callable[[int, memoryview], None]] = None
+    ) -> None:
+        """Initialize empty buffer."""
+        self.buffer = bytearray()
+        self.interleaved_callback = interleaved_callback
+        self._searched = (
+            0  # Bytes of pending message already searched for end of header
+        )
+        self._pending: Optional[Tuple[RTSPResponse, int, int]] = None
+
+    def feed(self, data: bytes) -> Iterator[RTSPResponse]:
+        """Buffer data and yield complete responses.
+
+        Responses and interleaved packets are handled in the order they were received.
+        Consumed data is removed from the buffer once framing stops.
+        """
+        self.buffer += data
+        buffer = self.buffer
+        position = 0  # Start of current message
+        invalid = False  # Malformed status line or Content-Length
+
+        try:
+            with memoryview(buffer) as view:
+                while position < len(buffer):
+
+                    if self._pending is None and buffer[position] == INTERLEAVED_MARKER:
+                        if len(buffer) - position < INTERLEAVED_HEADER_LENGTH:
+                            break
+                        channel = buffer[position + 1]
+                        start = position + INTERLEAVED_HEADER_LENGTH
+                        end = start + int.from_bytes(
+                            buffer[position + 2 : start], "big"
+                        )
+                        if len(buffer) < end:
+                            break
+                        if self.interleaved_callback:
+                            with view[start:end] as packet:
+                                self.interleaved_callback(channel, packet)
+                        position = end
+                        continue
+
+                    if self._pending is None:
+                        header_end = buffer.find(HEADER_END, position + self._searched)
+
+                        if header_end == -1:
+                            remaining = len(buffer) - position
+                            self._searched = max(0, remaining - len(HEADER_END) + 1)
+                            break
+
+                        try:
+                            response = parse_response_head(
+                                buffer[position:header_end].decode()
+                            )
+                            content_length = int(
+                                response.headers.get("content-length", 0)
+                            )
+                            if content_length < 0:
+                                raise ValueError(content_length)
+                        except ValueError:
+                            invalid = True
+                            break
+
+                        body_start = header_end + len(HEADER_END) - position
+                        body_end = body_start + content_length
+                        self._pending = (response, body_start, body_end)
+
+                    response, body_start, body_end = self._pending
+                    if len(buffer) - position < body_end:
+                        break
+
+                    response.body = buffer[
+                        position + body_start : position + body_end
+                    ].decode()
+                    position += body_end
+                    self._searched = 0
+                    self._pending = None
+                    yield response
+
+        finally:
+            del buffer[:position]
+
+        if invalid or (
+            buffer
+            and self._pending is None
+            and buffer[0] != INTERLEAVED_MARKER
+            and not buffer.startswith(RTSP_PREFIX[: len(buffer)])
+        ):
+            yield self.flush()  # Not a valid response
+
+    def flush(self) -> RTSPResponse:
+        """Discard buffered data and return it as a response without status."""
+        data = self.buffer.decode(errors="replace")
+        try:
+            response = parse_response(data)
+            response.status_code = None
+        except ValueError:
+            response = RTSPResponse(body=data)
+        self.buffer.clear()
+        self._searched = 0
+        self._pending = None
+        return response
+
 
 class RTSPClient(asyncio.Protocol):
     """RTSP transport, session handling, message generation."""
 
     def __init__(
-        self, url: str, host: str, username: str, password: str, callback: Callable
+        self,
+        url: str,
+        host: str,
+        username: str,
+        password: str,
+        callback: Callable,
+        rtp_transport: str = TRANSPORT_UDP,
+        session_cache: Optional[SessionCache] = None,
+        media: str = MEDIA_APPLICATION,
+        packet_callback: Optional[Callable[[Any], None]] = None,
+        silence_policy: Optional[SilencePolicy] = None,
     ) -> None:
-        """RTSP."""
+        """RTSP.
+
+        RTP transport UDP receives RTP on a separate socket,
+        RTP transport TCP receives RTP interleaved on the RTSP connection,
+        RTP transport multicast joins the group device announces in SETUP
+        so device only sends the stream once to all receivers.
+        A session cache from an earlier session skips OPTIONS and DESCRIBE.
+        Media selects which stream of the session description to set up,
+        packet callback receives complete RTP packets instead of data signals.
+        Silence policy enables a watchdog that probes a playing session
+        with a keep-alive when data stops and fails it if data does not resume.
+        """
         self.loop = asyncio.get_running_loop()
         self.callback = callback
 
-        self.rtp = RTPClient(self.loop, callback)
+        self.rtp = RTPClient(self.loop, callback, rtp_transport)
+        self.rtp.client.packet_callback = packet_callback
 
         self.session = RTSPSession(url, host, username, password)
+        self.session.media = media
+        self.session.rtp_transport = rtp_transport
         self.session.rtp_port = self.rtp.port
         self.session.rtcp_port = self.rtp.rtcp_port
+        if session_cache:
+            self.session.restore(session_cache)
+        self.silence_policy = silence_policy
 
         self.method = RTSPMethods(self.session)
+        self.reader = RTSPResponseReader(self.interleaved_received)
 
         self.transport: Optional[asyncio.BaseTransport] = None
         self.keep_alive_handle: Optional[asyncio.TimerHandle] = None
         self.time_out_handle: Optional[asyncio.TimerHandle] = None
+        self.rtcp_handle: Optional[asyncio.TimerHandle] = None
 
     async def start(self) -> None:
         """Start RTSP session."""
@@ -75,6 +346,11 @@ class RTSPClient(asyncio.Protocol):
         if self.time_out_handle is not None:
             self.time_out_handle.cancel()
 
+        if self.rtcp_handle is not None:
+            self.rtcp_handle.cancel()
+
+        self.rtp.watchdog.stop()
+
     def connection_made(self, transport: asyncio.BaseTransport) -> None:
         """Connect to device is successful.
 
@@ -86,6 +362,17 @@ class RTSPClient(asyncio.Protocol):
         self.time_out_handle = self.loop.call_later(TIME_OUT_LIMIT, self.time_out)
 
     def data_received(self, data: bytes) -> None:
+        """Got data on RTSP session.
+
+        Data is buffered until complete responses are available.
+        """
+        for response in self.reader.feed(data):
+            self.response_received(response)
+
+            if self.session.state == STATE_STOPPED:
+                break
+
+    def response_received(self, response: RTSPResponse) -> None:
         """Got response on RTSP session.
 
         Manage time out handle since response came in a reasonable time.
@@ -93,7 +380,15 @@ class RTSPClient(asyncio.Protocol):
         If state is playing schedule keep-alive.
         """
         self.time_out_handle.cancel()  # type: ignore [union-attr]
-        self.session.update(data.decode())
+        self.session.handle_response(response)
+        self.rtp.statistics.clock_rate = self.session.clock_rate
+
+        if (
+            self.session.multicast_group
+            and not self.rtp.sock
+            and not self.join_multicast()
+        ):
+            return
 
         if self.session.state == STATE_STARTING:
             self.transport.write(self.method.message.encode())  # type: ignore [union-attr]
@@ -101,19 +396,117 @@ class RTSPClient(asyncio.Protocol):
 
         elif self.session.state == STATE_PLAYING:
             self.callback(SIGNAL_PLAYING)
+            self.rtp.watchdog.alive()
 
             if self.session.session_timeout != 0:
+                if self.keep_alive_handle is not None:
+                    self.keep_alive_handle.cancel()
                 interval = self.session.session_timeout - 5
                 self.keep_alive_handle = self.loop.call_later(interval, self.keep_alive)
 
+            if self.rtcp_handle is None:
+                self.rtcp_handle = self.loop.call_later(
+                    RTCP_INTERVAL, self.send_receiver_report
+                )
+
+            if self.silence_policy and not self.rtp.watchdog.running:
+                self.rtp.watchdog.start(
+                    self.silence_policy, self.probe, self.silence_expired
+                )
+
         else:
             self.stop()
 
+    def join_multicast(self) -> bool:
+        """Receive RTP and RTCP from multicast group announced by device."""
+        rtp_port, rtcp_port = self.session.multicast_ports  # type: ignore[misc]
+        source = self.transport.get_extra_info("peername")  # type: ignore[union-attr]
+        try:
+            self.rtp.join_multicast(
+                self.session.multicast_group,  # type: ignore[arg-type]
+                rtp_port,
+                rtcp_port,
+                source[0] if source else None,
+            )
+        except OSError as err:
+            _LOGGER.warning(
+                "Failed to join multicast group %s: %s",
+                self.session.multicast_group,
+                err,
+            )
+            self.stop()
+            self.callback(SIGNAL_FAILED)
+            return False
+
+        self.loop.create_task(self.rtp.start())
+        return True
+
+    def interleaved_received(self, channel: int, packet: memoryview) -> None:
+        """Got RTP or RTCP packet interleaved on RTSP connection.
+
+        Packet is a view of the receive buffer and is not copied,
+        it has to be consumed before returning.
+        """
+        rtp_channel, rtcp_channel = self.session.interleaved_channels
+
+        if channel == rtp_channel:
+            self.rtp.client.datagram_received(packet, None)
+
+        elif channel == rtcp_channel:
+            self.rtp.rtcp_received(packet)
+
+    def send_receiver_report(self) -> None:
+        """Report reception quality to device per RTCP interval.
+
+        Interleaved on the RTSP connection with TCP transport,
+        otherwise sent from the RTCP socket to the RTCP port of the device.
+        """
+        report = self.rtp.receiver_report()
+
+        if report and self.session.rtp_transport == TRANSPORT_TCP:
+            _, rtcp_channel = self.session.interleaved_channels
+            self.transport.write(  # type: ignore [union-attr]
+                bytes((INTERLEAVED_MARKER, rtcp_channel))
+                + len(report).to_bytes(2, "big")
+                + report
+            )
+
+        elif report and self.session.multicast_group and self.session.multicast_ports:
+            _, rtcp_port = self.session.multicast_ports
+            self.rtp.send_rtcp(report, (self.session.multicast_group, rtcp_port))
+
+        elif report and self.session.server_rtcp_port:
+            self.rtp.send_rtcp(
+                report, (self.session.host, self.session.server_rtcp_port)
+            )
+
+        self.rtcp_handle = self.loop.call_later(
+            RTCP_INTERVAL, self.send_receiver_report
+        )
+
     def keep_alive(self) -> None:
-        """Keep RTSP session alive per negotiated time interval."""
+        """Keep RTSP session alive per negotiated time interval.
+
+        A keep-alive already waiting for response gets its time out moved.
+        """
         self.transport.write(self.method.message.encode())  # type: ignore [union-attr]
+        if self.time_out_handle is not None:
+            self.time_out_handle.cancel()
         self.time_out_handle = self.loop.call_later(TIME_OUT_LIMIT, self.time_out)
 
+    def probe(self) -> None:
+        """Check session is alive with an early keep-alive when data has stopped."""
+        _LOGGER.debug("No data from %s, probing session", self.session.host)
+        if self.keep_alive_handle is not None:
+            self.keep_alive_handle.cancel()
+        self.keep_alive()
+
+    def silence_expired(self) -> None:
+        """Fail session to reconnect when data did not resume after probe."""
+        _LOGGER.warning("No data received from %s", self.session.host)
+        self.stop()
+        self.callback(SIGNAL_FAILED)
+
     def time_out(self) -> None:
         """If we don't get a response within time the RTSP request time out.
 
@@ -134,44 +527,124 @@ class RTPClient:
     When data is received send a signal on callback to whoever is interested.
     """
 
-    def __init__(self, loop: Any, callback: Optional[Callable] = None) -> None:
+    def __init__(
+        self,
+        loop: Any,
+        callback: Optional[Callable] = None,
+        rtp_transport: str = TRANSPORT_UDP,
+    ) -> None:
         """Configure and bind socket.
 
         We need to bind the port for RTSP before setting up the endpoint
         since it will block until a connection has been set up and
         the port is needed for setting up the RTSP session.
+        With TCP transport data is interleaved on the RTSP connection
+        so no socket is needed. With multicast transport sockets are bound
+        when device has announced multicast group and ports.
         """
         self.loop = loop
-        self.client = self.UDPClient(callback)
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.sock.bind(("", 0))
-        self.port = self.sock.getsockname()[1]
-        self.rtcp_port = self.port + 1
+        self.statistics = RTPStatistics()
+        self.ssrc = random.getrandbits(32)
+        self.watchdog = SilenceWatchdog(loop)
+        self.pool: Optional[BufferPool] = None
+        self.client = self.UDPClient(callback, self.statistics, self.watchdog)
+        self.rtcp_client = self.RTCPClient(self.rtcp_received)
+        self.sock: Optional[socket.socket] = None
+        self.rtcp_sock: Optional[socket.socket] = None
+        self.port: Optional[int] = None
+        self.rtcp_port: Optional[int] = None
+
+        if rtp_transport == TRANSPORT_UDP:
+            self.sock, self.rtcp_sock = bind_port_pair()
+            self.port = self.sock.getsockname()[1]
+            self.rtcp_port = self.rtcp_sock.getsockname()[1]
 
     async def start(self) -> None:
-        """Start RTP client."""
-        await self.loop.create_datagram_endpoint(lambda: self.client, sock=self.sock)
+        """Start RTP and RTCP client.
+
+        RTP is received into pooled buffers where event loop supports readers
+        on sockets, otherwise through a regular datagram endpoint.
+        Pool is only allocated once there is a socket to receive on.
+        """
+        if self.sock:
+            if self.pool is None:
+                self.pool = BufferPool()
+            reader = DatagramReader(self.loop, self.sock, self.client, self.pool)
+            if not reader.start():
+                await self.loop.create_datagram_endpoint(
+                    lambda: self.client, sock=self.sock
+                )
+        if self.rtcp_sock:
+            await self.loop.create_datagram_endpoint(
+                lambda: self.rtcp_client, sock=self.rtcp_sock
+            )
 
     def stop(self) -> None:
         """Close transport from receiving any more packages."""
-        if self.client.transport:
-            self.client.transport.close()
+        for client, sock in (
+            (self.client, self.sock),
+            (self.rtcp_client, self.rtcp_sock),
+        ):
+            if client.transport:
+                client.transport.close()
+            elif sock:
+                sock.close()
+
+    def join_multicast(
+        self, group: str, port: int, rtcp_port: int, source: Optional[str] = None
+    ) -> None:
+        """Bind RTP and RTCP sockets to ports of multicast group and join it.
 
-    @property
-    def data(self) -> str:
-        """Refer to most recently received data."""
+        Only datagrams sent from source address are received,
+        other devices may send to a group on the same ports.
+        """
+        self.sock = multicast_socket(group, port)
         try:
-            return self.client.data.popleft()
-        except IndexError:
-            return ""
+            self.rtcp_sock = multicast_socket(group, rtcp_port)
+        except OSError:
+            self.sock.close()
+            self.sock = None
+            raise
+        self.port = port
+        self.rtcp_port = rtcp_port
+        self.client.source = self.rtcp_client.source = source
+
+    def rtcp_received(self, packet: Any) -> None:
+        """Got RTCP packet from device, keep sender reports for clock mapping."""
+        self.watchdog.received()
+        for report in parse_rtcp(packet, time()):
+            self.statistics.sender_report_received(report)
+
+    def receiver_report(self) -> Optional[bytes]:
+        """Generate RTCP receiver report of stream statistics."""
+        return self.statistics.receiver_report(self.ssrc, local_cname())
+
+    def send_rtcp(self, report: bytes, address: Tuple[str, int]) -> None:
+        """Send RTCP packet to device."""
+        if self.rtcp_client.transport:
+            self.rtcp_client.transport.sendto(report, address)  # type: ignore[attr-defined]
+
+    @property
+    def data(self) -> Any:
+        """Refer to payload being signalled, only valid during data signal."""
+        return self.client.payload
 
     class UDPClient:
         """Datagram recepient for device data."""
 
-        def __init__(self, callback: Optional[Callable]) -> None:
+        def __init__(
+            self,
+            callback: Optional[Callable],
+            statistics: Optional[RTPStatistics],
+            watchdog: Optional["SilenceWatchdog"] = None,
+        ) -> None:
             """Signal events to subscriber using callback."""
             self.callback = callback
-            self.data: Deque[str] = deque()
+            self.statistics = statistics
+            self.watchdog = watchdog
+            self.packet_callback: Optional[Callable[[Any], None]] = None
+            self.source: Optional[str] = None
+            self.payload: Any = ""
             self.transport: Optional[asyncio.BaseTransport] = None
 
         def connection_made(self, transport: asyncio.BaseTransport) -> None:
@@ -186,12 +659,290 @@ class RTPClient:
             """Signal retry if RTSP session fails to get a response."""
             _LOGGER.debug("Stream recepient offline")
 
-        def datagram_received(self, data: str, addr: Any) -> None:
-            """Signals when new data is available."""
+        def datagram_received(self, data: Any, addr: Any) -> None:
+            """Signals when new data is available.
+
+            Data may be a view of a pooled receive buffer and is not copied,
+            it has to be consumed before returning.
+            With a packet callback the whole packet is passed on as is.
+            Datagrams from other than source address are dropped.
+            """
+            if self.source and addr and addr[0] != self.source:
+                return
+            if self.watchdog:
+                self.watchdog.received()
+            if self.statistics:
+                self.statistics.packet_received(data)
+            if self.packet_callback:
+                self.packet_callback(data)
+                return
+            with memoryview(data)[RTP_HEADER_LENGTH:] as payload:
+                self.payload_received(payload)
+                self.discard(payload)
+
+        def payload_received(self, payload: Any) -> None:
+            """Hold payload of RTP packet and signal new data is available."""
             if self.callback:
-                self.data.append(data[12:])
+                self.payload = payload
                 self.callback("data")
 
+        def discard(self, payload: Any) -> None:
+            """Drop reference to payload once it has been signalled."""
+            if self.payload is payload:
+                self.payload = ""
+
+    class RTCPClient:
+        """Datagram recepient for RTCP packets from device."""
+
+        def __init__(self, callback: Callable) -> None:
+            """Pass received RTCP packets to callback."""
+            self.callback = callback
+            self.source: Optional[str] = None
+            self.transport: Optional[asyncio.BaseTransport] = None
+
+        def connection_made(self, transport: asyncio.BaseTransport) -> None:
+            """Save reference to transport to send receiver reports."""
+            self.transport = transport
+
+        def connection_lost(self, exc: Optional[Exception]) -> None:
+            """RTCP socket closed."""
+            _LOGGER.debug("RTCP recepient offline")
+
+        def datagram_received(self, data: bytes, addr: Any) -> None:
+            """Got RTCP packet, dropped if not from source address."""
+            if self.source and addr and addr[0] != self.source:
+                return
+            self.callback(data)
+
+
+class SilenceWatchdog:
+    """Detect a playing session that stops receiving data.
+
+    Normal interval between packets is learned from arrivals, it follows
+    longer gaps immediately and shorter gaps slowly so bursts don't shrink it.
+    After silence for the policy limit probe is called,
+    if silence continues for another limit expire is called.
+    Responses to keep-alive and probe also show the session is alive,
+    a quiet stream that answers a probe learns the silence as its normal interval.
+    """
+
+    def __init__(self, loop: Any) -> None:
+        """Initialize stopped watchdog."""
+        self.loop = loop
+        self.policy = SilencePolicy()
+        self.probe: Optional[Callable[[], None]] = None
+        self.expire: Optional[Callable[[], None]] = None
+        self.handle: Optional[asyncio.TimerHandle] = None
+        self.last_received: Optional[float] = None
+        self.last_alive: Optional[float] = None
+        self.interval: Optional[float] = None
+        self.probed = False
+
+    @property
+    def running(self) -> bool:
+        """Watchdog is checking for silence."""
+        return self.handle is not None
+
+    @property
+    def limit(self) -> float:
+        """Seconds of silence allowed for current stream rate."""
+        return self.policy.limit(self.interval)
+
+    def received(self) -> None:
+        """Packet arrived, update normal interval."""
+        now = self.loop.time()
+        if self.last_received is not None:
+            gap = now - self.last_received
+            if self.interval is None or gap > self.interval:
+                self.interval = gap
+            else:
+                self.interval += (gap - self.interval) / 16
+        self.last_received = now
+        self.probed = False
+
+    def alive(self) -> None:
+        """Session answered keep-alive or probe, silence until now is normal."""
+        now = self.loop.time()
+        if self.probed and self.last_received is not None:
+            gap = now - self.last_received
+            if self.interval is None or gap > self.interval:
+                self.interval = gap
+        self.last_alive = now
+        self.probed = False
+
+    def start(
+        self,
+        policy: SilencePolicy,
+        probe: Callable[[], None],
+        expire: Callable[[], None],
+    ) -> None:
+        """Start checking for silence from now."""
+        self.policy = policy
+        self.probe = probe
+        self.expire = expire
+        if self.last_received is None:
+            self.last_received = self.loop.time()
+        self.handle = self.loop.call_later(self.limit, self.check)
+
+    def stop(self) -> None:
+        """Stop checking for silence."""
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+
+    def check(self) -> None:
+        """Probe or expire session if silence has lasted too long."""
+        limit = self.limit
+        last_heard = max(
+            self.last_received, self.last_alive or 0  # type: ignore[type-var]
+        )
+        silence = self.loop.time() - last_heard
+
+        if silence < limit:
+            self.handle = self.loop.call_later(limit - silence, self.check)
+
+        elif not self.probed:
+            self.probed = True
+            self.handle = self.loop.call_later(limit, self.check)
+            self.probe()  # type: ignore[misc]
+
+        else:
+            self.handle = None
+            self.expire()  # type: ignore[misc]
+
+
+class BufferPool:
+    """Preallocated receive buffers, returned to pool after use.
+
+    Buffers are allocated on demand if pool runs out and are then kept
+    only as long as pool is not full.
+    """
+
+    def __init__(self, count: int = POOL_SIZE, size: int = DATAGRAM_SIZE) -> None:
+        """Allocate count buffers of size in one block."""
+        self.count = count
+        self.size = size
+        view = memoryview(bytearray(count * size))
+        self.free = [view[index * size : (index + 1) * size] for index in range(count)]
+
+    def acquire(self) -> memoryview:
+        """Take a buffer from pool."""
+        if self.free:
+            return self.free.pop()
+        return memoryview(bytearray(self.size))
+
+    def release(self, buffer: memoryview) -> None:
+        """Return buffer to pool."""
+        if len(self.free) < self.count:
+            self.free.append(buffer)
+
+
+class DatagramReader:
+    """Receive datagrams straight into pooled buffers.
+
+    Replaces a datagram endpoint for receiving. Up to a batch of datagrams
+    is read each time socket is readable and protocol gets a view of
+    the part of buffer that was filled, buffer is reused once protocol returns.
+    Acts as transport of protocol so closing it stops reading.
+    """
+
+    def __init__(
+        self, loop: Any, sock: socket.socket, protocol: Any, pool: BufferPool
+    ) -> None:
+        """Initialize reader of socket."""
+        self.loop = loop
+        self.sock = sock
+        self.protocol = protocol
+        self.pool = pool
+
+    def start(self) -> bool:
+        """Start reading, False if event loop doesn't support socket readers."""
+        self.sock.setblocking(False)
+        try:
+            self.loop.add_reader(self.sock.fileno(), self.read_ready)
+        except NotImplementedError:
+            return False
+        self.protocol.connection_made(self)
+        return True
+
+    def read_ready(self) -> None:
+        """Read available datagrams."""
+        for _ in range(RECEIVE_BATCH):
+            buffer = self.pool.acquire()
+            try:
+                size, addr = self.sock.recvfrom_into(buffer)
+            except (BlockingIOError, InterruptedError):
+                self.pool.release(buffer)
+                return
+            except OSError as err:
+                self.pool.release(buffer)
+                _LOGGER.debug("RTP receive failed %s", err)
+                return
+
+            try:
+                with buffer[:size] as datagram:
+                    self.protocol.datagram_received(datagram, addr)
+            finally:
+                self.pool.release(buffer)
+
+    def close(self) -> None:
+        """Stop reading and close socket."""
+        if self.sock.fileno() != -1:
+            self.loop.remove_reader(self.sock.fileno())
+            self.sock.close()
+            self.protocol.connection_lost(None)
+
+
+def multicast_socket(group: str, port: int) -> socket.socket:
+    """Bind socket to group and port and join group on the default interface.
+
+    Address is reused so several receivers on the same host can listen to the group.
+    Binding to the group, and on Linux not receiving every joined group,
+    keeps out datagrams of other groups sent to the same port.
+    Membership of the group is dropped when socket is closed.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if sys.platform.startswith("linux"):
+            sock.setsockopt(socket.IPPROTO_IP, IP_MULTICAST_ALL, 0)
+        try:
+            sock.bind((group, port))
+        except OSError:  # Windows can't bind to a multicast address
+            sock.bind(("", port))
+        membership = struct.pack(
+            "4s4s", socket.inet_aton(group), socket.inet_aton("0.0.0.0")
+        )
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def bind_port_pair() -> Tuple[socket.socket, socket.socket]:
+    """Bind RTP socket and RTCP socket on the following port.
+
+    RTCP uses the next port when possible,
+    otherwise any free port is used.
+    """
+    for _ in range(BIND_ATTEMPTS):
+        rtp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        rtp_sock.bind(("", 0))
+        rtcp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            rtcp_sock.bind(("", rtp_sock.getsockname()[1] + 1))
+            return rtp_sock, rtcp_sock
+        except OSError:
+            rtp_sock.close()
+            rtcp_sock.close()
+
+    rtp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    rtp_sock.bind(("", 0))
+    rtcp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    rtcp_sock.bind(("", 0))
+    return rtp_sock, rtcp_sock
+
 
 class RTSPSession:
     """All RTSP session data.
@@ -210,8 +961,15 @@ class RTSPSession:
         self.username = username
         self.password = password
         self.user_agent = "HASS Axis"
-        self.rtp_port = None
-        self.rtcp_port = None
+        self.media = MEDIA_APPLICATION
+        self.rtp_transport = TRANSPORT_UDP
+        self.rtp_port: Optional[int] = None
+        self.rtcp_port: Optional[int] = None
+        self.interleaved_channels = (0, 1)
+        self.server_rtcp_port: Optional[int] = None
+        self.multicast_group: Optional[str] = None
+        self.multicast_ports: Optional[Tuple[int, int]] = None
+        self.clock_rate = 90000
         self.methods = [
             "OPTIONS",
             "DESCRIBE",
@@ -230,6 +988,7 @@ class RTSPSession:
         self.methods_ack: Optional[List[str]] = None
         self.basic = False
         self.digest = False
+        self.digest_auth = DigestAuth(username, password)
         self.realm: Optional[str] = None
         self.nonce: Optional[str] = None
         self.stale: Optional[bool] = None
@@ -243,6 +1002,7 @@ class RTSPSession:
         self.rtp_info: Optional[str] = None
         self.sdp: Optional[List[str]] = None
         self.control_url: Optional[str] = None
+        self.cached = False
 
     @property
     def method(self) -> str:
@@ -273,58 +1033,91 @@ class RTSPSession:
         return state
 
     def update(self, response: str) -> None:
-        """Update session information from device response.
+        """Update session information from device response."""
+        self.handle_response(parse_response(response))
+
+    def handle_response(self, response: RTSPResponse) -> None:
+        """Update session information from parsed device response.
 
         Increment sequence number when starting stream, not when playing.
         If device requires authentication resend previous message with auth.
         """
-        data = response.splitlines()
-        _LOGGER.debug("Received data %s from %s", data, self.host)
-        while data:
-            line = data.pop(0)
-            if "RTSP/1.0" in line:
-                self.rtsp_version = int(line.split(" ")[0][5])
-                self.status_code = int(line.split(" ")[1])
-                self.status_text = line.split(" ")[2]
-            elif "CSeq" in line:
-                self.sequence_ack = int(line.split(": ")[1])
-            elif "Date" in line:
-                self.date = line.split(": ")[1]
-            elif "Public" in line:
-                self.methods_ack = line.split(": ")[1].split(", ")
-            elif "WWW-Authenticate: Basic" in line:
+        _LOGGER.debug("Received response %s from %s", response, self.host)
+        headers = response.headers
+
+        if response.status_code is not None:
+            self.rtsp_version = response.rtsp_version
+            self.status_code = response.status_code
+            self.status_text = response.status_text
+
+        if "cseq" in headers:
+            self.sequence_ack = int(headers["cseq"])
+        if "date" in headers:
+            self.date = headers["date"]
+        if "public" in headers:
+            self.methods_ack = headers["public"].split(", ")
+
+        digest_challenges = []
+        for challenge in response.authenticate:
+            scheme, _, _ = challenge.partition(" ")
+            params = parse_auth_params(challenge)
+            if scheme.lower() == "basic":
                 self.basic = True
-                self.realm = line.split('"')[1]
-            elif "WWW-Authenticate: Digest" in line:
-                self.digest = True
-                self.realm = line.split('"')[1]
-                self.nonce = line.split('"')[3]
-                self.stale = line.split("stale=")[1] == "TRUE"
-            elif "Content-Type" in line:
-                self.content_type = line.split(": ")[1]
-            elif "Content-Base" in line:
-                self.content_base = line.split(": ")[1]
-            elif "Content-Length" in line:
-                self.content_length = int(line.split(": ")[1])
-            elif "Session" in line:
-                self.session_id = line.split(": ")[1].split(";")[0]
-                if "=" in line:
-                    self.session_timeout = int(line.split(": ")[1].split("=")[1])
-            elif "Transport" in line:
-                self.transport_ack = line.split(": ")[1]
-            elif "Range" in line:
-                self.range = line.split(": ")[1]
-            elif "RTP-Info" in line:
-                self.rtp_info = line.split(": ")[1]
-            elif not line:
-                if data:
-                    self.sdp = data
-                    break
+                self.realm = params.get("realm")
+            elif scheme.lower() == "digest":
+                digest_challenges.append(params)
+        if digest_challenges and self.digest_auth.challenge_received(digest_challenges):
+            self.digest = True
+            self.realm = self.digest_auth.realm
+            self.nonce = self.digest_auth.nonce
+            self.stale = any(
+                params.get("stale", "").upper() == "TRUE"
+                for params in digest_challenges
+            )
+
+        if "content-type" in headers:
+            self.content_type = headers["content-type"]
+        if "content-base" in headers:
+            self.content_base = headers["content-base"]
+        if "content-length" in headers:
+            self.content_length = int(headers["content-length"])
+        if "session" in headers:
+            session_id, *session_params = headers["session"].split(";")
+            self.session_id = session_id.strip()
+            for param in session_params:
+                key, _, value = param.partition("=")
+                if key.strip().lower() == "timeout":
+                    self.session_timeout = int(value)
+        if "transport" in headers:
+            self.transport_ack = headers["transport"]
+            channels = INTERLEAVED_CHANNELS.search(self.transport_ack)
+            if channels:
+                self.interleaved_channels = (int(channels[1]), int(channels[2]))
+            server_ports = SERVER_PORTS.search(self.transport_ack)
+            if server_ports:
+                self.server_rtcp_port = int(server_ports[2])
+            destination = MULTICAST_DESTINATION.search(self.transport_ack)
+            ports = MULTICAST_PORTS.search(self.transport_ack)
+            if "multicast" in self.transport_ack and destination and ports:
+                self.multicast_group = destination[1]
+                self.multicast_ports = (int(ports[1]), int(ports[2]))
+        if "range" in headers:
+            self.range = headers["range"]
+        if "rtp-info" in headers:
+            self.rtp_info = headers["rtp-info"]
+
+        if response.body:
+            self.sdp = response.body.splitlines()
+
         if self.sdp:
             stream_found = False
             for param in self.sdp:
-                if not stream_found and "m=application" in param:
+                if not stream_found and param.startswith(f"m={self.media} "):
                     stream_found = True
+                elif stream_found and param.startswith("a=rtpmap:"):
+                    clock_rate = CLOCK_RATE.match(param)
+                    if clock_rate:
+                        self.clock_rate = int(clock_rate[1])
                 elif stream_found and "a=control:rtsp" in param:
                     self.control_url = param.split(":", 1)[1]
                     break
@@ -340,26 +1133,60 @@ class RTSPSession:
             _LOGGER.debug(
                 "%s RTSP %s %s", self.host, self.status_code, self.status_text
             )
+            if self.cached and self.method == "SETUP":
+                self.full_handshake()
+
+    def cache(self) -> SessionCache:
+        """Store negotiated session data to speed up reconnecting."""
+        return SessionCache(
+            url=self.url,
+            basic=self.basic,
+            digest=self.digest,
+            realm=self.realm,
+            nonce=self.nonce,
+            content_base=self.content_base,
+            sdp=self.sdp,
+            control_url=self.control_url,
+            clock_rate=self.clock_rate,
+            digest_auth=self.digest_auth,
+        )
+
+    def restore(self, cache: SessionCache) -> None:
+        """Continue from SETUP authenticating up front using cached session data.
+
+        Cache is ignored if it was stored for another URL.
+        Digest state is kept so HA1 and nonce count carry over.
+        """
+        if cache.url != self.url or not cache.control_url:
+            return
+        if (
+            cache.digest_auth
+            and cache.digest_auth.username == self.username
+            and cache.digest_auth.password == self.password
+        ):
+            self.digest_auth = cache.digest_auth
+        self.basic = cache.basic
+        self.digest = cache.digest
+        self.realm = cache.realm
+        self.nonce = cache.nonce
+        self.content_base = cache.content_base
+        self.sdp = cache.sdp
+        self.control_url = cache.control_url
+        self.clock_rate = cache.clock_rate
+        self.cached = True
+        self.sequence = 2  # SETUP
+
+    def full_handshake(self) -> None:
+        """Device rejected cached session data, start over from OPTIONS."""
+        _LOGGER.debug("%s rejected cached session, doing full handshake", self.host)
+        self.cached = False
+        self.sdp = None
+        self.control_url = None
+        self.sequence = 0
 
     def generate_digest(self) -> str:
-        """RFC 2617."""
-        from hashlib import md5
-
-        ha1 = f"{self.username}:{self.realm}:{self.password}"
-        HA1 = md5(ha1.encode("UTF-8")).hexdigest()
-        ha2 = f"{self.method}:{self.url}"
-        HA2 = md5(ha2.encode("UTF-8")).hexdigest()
-        encrypt_response = f"{HA1}:{self.nonce}:{HA2}"
-        response = md5(encrypt_response.encode("UTF-8")).hexdigest()
-
-        digest_auth = "Digest "
-        digest_auth += f'username="{self.username}", '
-        digest_auth += f'realm="{self.realm}", '
-        digest_auth += 'algorithm="MD5", '
-        digest_auth += f'nonce="{self.nonce}", '
-        digest_auth += f'uri="{self.url}", '
-        digest_auth += f'response="{response}"'
-        return digest_auth
+        """RFC 7616."""
+        return self.digest_auth.authorization(self.method, self.url)
 
     def generate_basic(self) -> str:
         """RFC 2617."""
@@ -483,4 +1310,9 @@ class RTSPMethods:
     @property
     def transport(self) -> str:
         """Generate transport string."""
+        if self.session.rtp_transport == TRANSPORT_TCP:
+            rtp_channel, rtcp_channel = self.session.interleaved_channels
+            return f"Transport: RTP/AVP/TCP;unicast;interleaved={rtp_channel}-{rtcp_channel}\r\n"
+        if self.session.rtp_transport == TRANSPORT_MULTICAST:
+            return "Transport: RTP/AVP;multicast\r\n"
         return f"Transport: RTP/AVP;unicast;client_port={self.session.rtp_port}-{self.session.rtcp_port}\r\n"
@@ -71,6 +71,8 @@ class StreamProfiles(APIItems):
 class StreamProfile(APIItem):
     """Stream profile item."""
 
+    __slots__ = ()
+
     @property
     def name(self) -> str:
         """Name of stream profile."""
@@ -2,30 +2,115 @@
 
 import asyncio
 import logging
-from typing import Callable, List, Optional
+import random
+from time import monotonic
+from typing import Callable, Dict, List, Optional, Tuple
+
+import attr
 
 from .configuration import Configuration
-from .rtsp import SIGNAL_DATA, SIGNAL_FAILED, SIGNAL_PLAYING, STATE_STOPPED, RTSPClient
+from .event_stream import OPERATION_INITIALIZED, EventManager
+from .rtcp import RTPStatistics
+from .rtsp import (
+    MEDIA_APPLICATION,
+    MEDIA_VIDEO,
+    SIGNAL_DATA,
+    SIGNAL_FAILED,
+    SIGNAL_PLAYING,
+    STATE_STOPPED,
+    TRANSPORT_UDP,
+    RTSPClient,
+    SessionCache,
+    SilencePolicy,
+)
+from .video import Depacketizer
 
 _LOGGER = logging.getLogger(__name__)
 
 RTSP_URL = (
     "rtsp://{host}/axis-media/media.amp" "?video={video}&audio={audio}&event={event}"
 )
+VIDEO_CODEC = "&videocodec={codec}"
+
+RECONNECT_RATE = 10  # Reconnects per second across all streams
+RECONNECT_BURST = 10
+
+
+@attr.s(slots=True)
+class ReconnectPolicy:
+    """Delay before reconnecting.
+
+    First retry is fast, following retries back off exponentially up to max_delay.
+    Jitter randomly shortens the delay by up to that fraction to spread reconnects.
+    """
+
+    first_delay: float = attr.ib(default=1)
+    base_delay: float = attr.ib(default=2)
+    factor: float = attr.ib(default=2)
+    max_delay: float = attr.ib(default=300)
+    jitter: float = attr.ib(default=0.5)
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait before reconnect attempt, counting from 0."""
+        if attempt == 0:
+            return self.first_delay
+        delay = min(self.max_delay, self.base_delay * self.factor ** (attempt - 1))
+        return delay * (1 - self.jitter * random.random())
+
+
+class TokenBucket:
+    """Limit rate of reconnects shared by stream managers."""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        """Allow burst reconnects at once, refilled with rate per second."""
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = monotonic()
+
+    def reserve(self) -> float:
+        """Take a token and return seconds until it is available."""
+        now = monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
 
-RETRY_TIMER = 15
+
+RECONNECT_BUCKET = TokenBucket(RECONNECT_RATE, RECONNECT_BURST)
 
 
 class StreamManager:
-    """Setup, start, stop and retry stream."""
+    """Setup, start, stop and retry stream.
+
+    Only one media is set up per stream, video is set up instead of events
+    when a H.264 or JPEG depacketizer is set. Use a separate stream manager for each.
+    """
+
+    def __init__(
+        self,
+        config: Configuration,
+        reconnect_policy: Optional[ReconnectPolicy] = None,
+        reconnect_bucket: TokenBucket = RECONNECT_BUCKET,
+    ) -> None:
+        """Initialize stream manager.
 
-    def __init__(self, config: Configuration) -> None:
-        """Initialize stream manager."""
+        Reconnect bucket is by default shared by all stream managers in process.
+        """
         self.config = config
-        self.video = None  # Unsupported
+        self.video: Optional[Depacketizer] = None
         self.audio = None  # Unsupported
         self.event = None
+        self.rtp_transport = TRANSPORT_UDP  # Or TRANSPORT_TCP, TRANSPORT_MULTICAST
         self.stream: Optional[RTSPClient] = None
+        self.retry_handle: Optional[asyncio.TimerHandle] = None
+        self.session_cache: Optional[SessionCache] = None
+        self.silence_policy: Optional[SilencePolicy] = SilencePolicy()  # None disables
+
+        self.reconnect_policy = reconnect_policy or ReconnectPolicy()
+        self.reconnect_bucket = reconnect_bucket
+        self.reconnect_attempt = 0  # Consecutive attempts since last playing
+        self.reconnect_count = 0  # Total reconnects
 
         self.connection_status_callback: List[Callable] = []
 
@@ -38,13 +123,15 @@ class StreamManager:
             audio=self.audio_query,
             event=self.event_query,
         )
+        if self.video:
+            rtsp_url += VIDEO_CODEC.format(codec=self.video.codec)
         _LOGGER.debug(rtsp_url)
         return rtsp_url
 
     @property
     def video_query(self) -> int:
-        """Generate video query, not supported."""
-        return 0
+        """Generate video query."""
+        return 1 if self.video else 0
 
     @property
     def audio_query(self) -> int:
@@ -54,18 +141,22 @@ class StreamManager:
     @property
     def event_query(self) -> str:
         """Generate event query."""
-        return "on" if bool(self.event) else "off"
+        return "on" if self.event and not self.video else "off"
 
     def session_callback(self, signal: str) -> None:
         """Signalling from stream session.
 
         Data - new data available for processing.
-        Playing - Connection is healthy.
+        Playing - Connection is healthy, keep session data for reconnecting.
         Retry - if there is no connection to device.
         """
         if signal == SIGNAL_DATA and self.event:
             self.event(self.data)
 
+        elif signal == SIGNAL_PLAYING and self.stream:
+            self.session_cache = self.stream.session.cache()
+            self.reconnect_attempt = 0
+
         elif signal == SIGNAL_FAILED:
             self.retry()
 
@@ -78,6 +169,13 @@ class StreamManager:
         """Get stream data."""
         return self.stream.rtp.data  # type: ignore[union-attr]
 
+    @property
+    def statistics(self) -> Optional[RTPStatistics]:
+        """Packet loss, jitter and clock mapping of current stream."""
+        if not self.stream:
+            return None
+        return self.stream.rtp.statistics
+
     @property
     def state(self) -> str:
         """State of stream."""
@@ -94,17 +192,115 @@ class StreamManager:
                 self.config.username,
                 self.config.password,
                 self.session_callback,
+                self.rtp_transport,
+                self.session_cache,
+                media=MEDIA_VIDEO if self.video else MEDIA_APPLICATION,
+                packet_callback=self.video.packet_received if self.video else None,
+                silence_policy=self.silence_policy,
             )
             asyncio.create_task(self.stream.start())
 
     def stop(self) -> None:
-        """Stop stream."""
+        """Stop stream and any scheduled retry."""
+        if self.retry_handle is not None:
+            self.retry_handle.cancel()
+            self.retry_handle = None
         if self.stream and self.stream.session.state != STATE_STOPPED:
             self.stream.stop()
 
     def retry(self) -> None:
-        """No connection to device, retry connection after 15 seconds."""
+        """No connection to device, retry connection per reconnect policy.
+
+        Delay is extended if reconnects across stream managers exceed their rate.
+        """
         loop = asyncio.get_running_loop()
         self.stream = None
-        loop.call_later(RETRY_TIMER, self.start)
-        _LOGGER.debug("Reconnecting to %s", self.config.host)
+        delay = max(
+            self.reconnect_policy.delay(self.reconnect_attempt),
+            self.reconnect_bucket.reserve(),
+        )
+        self.reconnect_attempt += 1
+        self.reconnect_count += 1
+        self.retry_handle = loop.call_later(delay, self.start)
+        _LOGGER.debug("Reconnecting to %s in %.1f seconds", self.config.host, delay)
+
+
+def stream_key(config: Configuration, rtp_transport: str) -> Tuple[str, str, str]:
+    """Streams with the same host, user and RTP transport can be shared."""
+    return (config.host, config.username, rtp_transport)
+
+
+class SharedStream:
+    """Stream and events of a device shared by several subscribers.
+
+    Subscribers are called with action and event ID like EventManager signal,
+    events are available from event.
+    """
+
+    def __init__(self, config: Configuration, rtp_transport: str) -> None:
+        """Initialize shared stream."""
+        self.stream = StreamManager(config)
+        self.stream.rtp_transport = rtp_transport
+        self.event = EventManager(self.signal)
+        self.stream.event = self.event.update  # type: ignore[assignment]
+        self.subscribers: List[Callable[[str, str], None]] = []
+
+    def signal(self, action: str, event_id: str) -> None:
+        """Fan out event signal to all subscribers."""
+        for subscriber in list(self.subscribers):
+            subscriber(action, event_id)
+
+    def replay(self, subscriber: Callable[[str, str], None]) -> None:
+        """Signal already initialized events to a late subscriber."""
+        for event_id, event in list(self.event.items()):
+            if event.TOPIC:  # type: ignore[attr-defined]
+                subscriber(OPERATION_INITIALIZED, event_id)
+
+
+class StreamRegistry:
+    """Reference counted streams shared within a process.
+
+    One RTSP session is kept per host, user and RTP transport.
+    Session is started on first subscribe and stopped on last unsubscribe.
+    """
+
+    def __init__(self) -> None:
+        """Initialize empty registry."""
+        self.streams: Dict[Tuple[str, str, str], SharedStream] = {}
+
+    def subscribe(
+        self,
+        config: Configuration,
+        callback: Callable[[str, str], None],
+        rtp_transport: str = TRANSPORT_UDP,
+    ) -> SharedStream:
+        """Subscribe to events of device, starting stream if needed."""
+        key = stream_key(config, rtp_transport)
+        shared = self.streams.get(key)
+
+        if shared is None:
+            shared = self.streams[key] = SharedStream(config, rtp_transport)
+
+        shared.subscribers.append(callback)
+
+        if len(shared.subscribers) == 1:
+            shared.stream.start()
+        else:
+            shared.replay(callback)
+
+        return shared
+
+    def unsubscribe(
+        self, shared: SharedStream, callback: Callable[[str, str], None]
+    ) -> None:
+        """Unsubscribe from events of device, stopping stream if last subscriber."""
+        if callback not in shared.subscribers:
+            return
+
+        shared.subscribers.remove(callback)
+
+        if not shared.subscribers:
+            shared.stream.stop()
+            del self.streams[
+                stream_key(shared.stream.config, shared.stream.rtp_transport)
+            ]
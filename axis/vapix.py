@@ -185,7 +185,7 @@ class Vapix:
             self.ports = Ports(self.params, self.request)
 
         if not self.ptz and self.params.ptz:
-            self.ptz = PtzControl(self.request)
+            self.ptz = PtzControl(self.request, self.params)
 
     async def initialize_applications(self) -> None:
         """Load data for applications on device."""
@@ -0,0 +1,446 @@
+"""Reassemble video frames from RTP packets.
+
+H.264 RFC 6184, JPEG RFC 2435.
+"""
+
+from abc import ABC, abstractmethod
+import logging
+import struct
+from typing import Callable, Optional, Tuple, Union
+
+_LOGGER = logging.getLogger(__name__)
+
+BUFFER_SIZE = 4 * 1024 * 1024
+
+RTP_HEADER_LENGTH = 12
+RTP_SEQUENCE_TIMESTAMP = struct.Struct("!HI")
+RTP_MARKER = 0x80
+
+START_CODE = b"\x00\x00\x00\x01"
+
+NAL_TYPE = 0x1F
+NAL_SLICE = 1
+NAL_IDR_SLICE = 5
+NAL_STAP_A = 24
+NAL_FU_A = 28
+FU_START = 0x80
+FU_END = 0x40
+
+JPEG_CLOCK_RATE = 90000
+JPEG_MAIN_HEADER = struct.Struct("!IBBBB")  # Type specific and offset, type, Q, w, h
+JPEG_RESTART_HEADER_LENGTH = 4
+JPEG_TABLE_HEADER = struct.Struct("!BBH")  # MBZ, precision, length
+JPEG_SOI = b"\xff\xd8"
+JPEG_EOI = b"\xff\xd9"
+JPEG_LUMA_TABLE = (  # Zigzag order, RFC 2435 appendix A
+    16, 11, 12, 14, 12, 10, 16, 14, 13, 14, 18, 17, 16, 19, 24, 40,
+    26, 24, 22, 22, 24, 49, 35, 37, 29, 40, 58, 51, 61, 60, 57, 51,
+    56, 55, 64, 72, 92, 78, 64, 68, 87, 69, 55, 56, 80, 109, 81, 87,
+    95, 98, 103, 104, 103, 62, 77, 113, 121, 112, 100, 120, 92, 101, 103, 99,
+)  # fmt: skip
+JPEG_CHROMA_TABLE = (
+    17, 18, 18, 24, 21, 24, 47, 26, 26, 47, 99, 66, 56, 66,
+) + (99,) * 50  # fmt: skip
+JPEG_HUFFMAN_TABLES = bytes.fromhex(  # Standard tables, RFC 2435 appendix B
+    "ffc4001f00000105010101010101000000000000000001020304050607"
+    "08090a0b"
+    "ffc400b5100002010303020403050504040000017d0102030004110512"
+    "2131410613516107227114328191a1082342b1c11552d1f02433627282"
+    "090a161718191a25262728292a3435363738393a434445464748494a53"
+    "5455565758595a636465666768696a737475767778797a838485868788"
+    "898a92939495969798999aa2a3a4a5a6a7a8a9aab2b3b4b5b6b7b8b9ba"
+    "c2c3c4c5c6c7c8c9cad2d3d4d5d6d7d8d9dae1e2e3e4e5e6e7e8e9eaf1"
+    "f2f3f4f5f6f7f8f9fa"
+    "ffc4001f01000301010101010101010100000000000001020304050607"
+    "08090a0b"
+    "ffc400b5110002010204040304070504040001027700010203110405"
+    "2131061241510761711322328108144291a1b1c109233352f0156272d1"
+    "0a162434e125f11718191a262728292a35363738393a43444546474849"
+    "4a535455565758595a636465666768696a737475767778797a82838485"
+    "868788898a92939495969798999aa2a3a4a5a6a7a8a9aab2b3b4b5b6b7"
+    "b8b9bac2c3c4c5c6c7c8c9cad2d3d4d5d6d7d8d9dae2e3e4e5e6e7e8e9"
+    "eaf2f3f4f5f6f7f8f9fa"
+)
+JPEG_START_OF_SCAN = bytes.fromhex("ffda000c03010002110311003f00")
+
+Packet = Union[bytes, memoryview]
+FrameCallback = Callable[[memoryview, int, bool], None]
+
+
+class RingBuffer:
+    """Preallocated buffer frames are assembled in.
+
+    Frames are written one after the other and writing continues from the start
+    of the buffer when a frame does not fit at the end. A frame view stays valid
+    until the buffer wraps over it, copy frames that are kept for longer.
+    """
+
+    def __init__(self, size: int = BUFFER_SIZE) -> None:
+        """Allocate buffer once."""
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.start = 0  # Start of current frame
+        self.end = 0  # End of current frame
+
+    def begin(self) -> None:
+        """Start a new frame after the previous frame."""
+        self.start = self.end
+
+    def discard(self) -> None:
+        """Drop data written to current frame."""
+        self.end = self.start
+
+    def write(self, data: Packet) -> bool:
+        """Append data to current frame, False if frame would not fit in buffer."""
+        length = len(data)
+
+        if self.end + length > len(self.buffer):
+            written = self.end - self.start
+            if written + length > len(self.buffer):
+                return False
+            self.view[:written] = self.view[self.start : self.end]
+            self.start, self.end = 0, written
+
+        self.view[self.end : self.end + length] = data
+        self.end += length
+        return True
+
+    @property
+    def frame(self) -> memoryview:
+        """View of current frame."""
+        return self.view[self.start : self.end]
+
+
+def rtp_payload(packet: Packet) -> memoryview:
+    """View of RTP payload after header, CSRCs, extension and padding."""
+    view = memoryview(packet)
+    offset = RTP_HEADER_LENGTH + 4 * (view[0] & 0x0F)
+    if view[0] & 0x10:  # Extension
+        offset += 4 + 4 * int.from_bytes(view[offset + 2 : offset + 4], "big")
+    end = len(view) - view[-1] if view[0] & 0x20 else len(view)  # Padding
+    return view[offset:end]
+
+
+class Depacketizer(ABC):
+    """Reassemble frames from RTP packets of one stream.
+
+    Packets sharing an RTP timestamp are assembled in the ring buffer
+    and the frame is delivered on the marker bit to callback with
+    RTP timestamp and whether frame is a keyframe.
+    Frames with lost packets are dropped.
+    """
+
+    codec = ""
+
+    def __init__(
+        self, callback: Optional[FrameCallback], buffer_size: int = BUFFER_SIZE
+    ) -> None:
+        """Initialize depacketizer."""
+        self.callback = callback
+        self.ring = RingBuffer(buffer_size)
+        self.sequence: Optional[int] = None
+        self.timestamp: Optional[int] = None
+        self.keyframe = False
+        self.skip = True
+        self.frames = 0
+        self.dropped = 0
+
+    def packet_received(self, packet: Packet) -> None:
+        """Add RTP packet to current frame, deliver frame on marker bit."""
+        if len(packet) <= RTP_HEADER_LENGTH:
+            return
+        sequence, timestamp = RTP_SEQUENCE_TIMESTAMP.unpack_from(packet, 2)
+        lost = self.sequence is not None and sequence != (self.sequence + 1) & 0xFFFF
+        self.sequence = sequence
+
+        if timestamp != self.timestamp:
+            self.begin_frame(timestamp)
+
+        if lost:
+            self.drop_frame()
+
+        if not self.skip:
+            with rtp_payload(packet) as payload:
+                self.payload_received(payload)
+
+        if packet[1] & RTP_MARKER:
+            self.end_frame()
+
+    @abstractmethod
+    def payload_received(self, payload: memoryview) -> None:
+        """Add payload of packet to current frame."""
+
+    def write(self, data: Packet) -> None:
+        """Copy data into frame buffer."""
+        if not self.skip and not self.ring.write(data):
+            _LOGGER.debug("Frame larger than buffer")
+            self.drop_frame()
+
+    def begin_frame(self, timestamp: int) -> None:
+        """Start assembling a new frame."""
+        if not self.skip and self.ring.end != self.ring.start:
+            self.dropped += 1  # Previous frame never got its last packet
+        self.timestamp = timestamp
+        self.keyframe = False
+        self.skip = False
+        self.ring.begin()
+
+    def drop_frame(self) -> None:
+        """Skip rest of frame."""
+        if not self.skip:
+            self.dropped += 1
+        self.skip = True
+        self.ring.discard()
+
+    def end_frame(self) -> None:
+        """Deliver complete frame."""
+        timestamp = self.timestamp
+        if not self.skip and timestamp is not None and self.ring.end != self.ring.start:
+            self.frame_received(self.ring.frame, timestamp)
+        self.skip = True
+        self.timestamp = None
+
+    def frame_received(self, frame: memoryview, timestamp: int) -> None:
+        """Pass complete frame to callback."""
+        self.frames += 1
+        if self.callback:
+            self.callback(frame, timestamp, self.keyframe)
+
+
+class H264Depacketizer(Depacketizer):
+    """Reassemble H.264 access units from single NAL, STAP-A and FU-A packets.
+
+    Frames are delivered in Annex B byte stream format.
+    With keyframes_only other frames are skipped without being copied.
+    """
+
+    codec = "h264"
+
+    def __init__(
+        self,
+        callback: FrameCallback,
+        keyframes_only: bool = False,
+        buffer_size: int = BUFFER_SIZE,
+    ) -> None:
+        """Initialize depacketizer."""
+        super().__init__(callback, buffer_size)
+        self.keyframes_only = keyframes_only
+        self.fragment = False  # Inside a fragmented NAL unit
+
+    def payload_received(self, payload: memoryview) -> None:
+        """Unpack NAL units of payload."""
+        if not payload:
+            return
+        nal_type = payload[0] & NAL_TYPE
+
+        if nal_type < NAL_STAP_A:
+            self.nal_unit(payload[0], payload)
+
+        elif nal_type == NAL_STAP_A:
+            offset = 1
+            while offset + 2 < len(payload) and not self.skip:
+                size = int.from_bytes(payload[offset : offset + 2], "big")
+                offset += 2
+                self.nal_unit(payload[offset], payload[offset : offset + size])
+                offset += size
+
+        elif nal_type == NAL_FU_A and len(payload) > 2:
+            if payload[1] & FU_START:
+                header = (payload[0] & ~NAL_TYPE) | (payload[1] & NAL_TYPE)
+                self.nal_unit(header, bytes((header,)))
+                self.fragment = True
+            elif not self.fragment:
+                self.drop_frame()  # Start of NAL unit was not received
+                return
+            self.write(payload[2:])
+            if payload[1] & FU_END:
+                self.fragment = False
+
+        else:
+            _LOGGER.debug("Unsupported NAL unit type %s", nal_type)
+
+    def nal_unit(self, header: int, nal: Packet) -> None:
+        """Start NAL unit in frame."""
+        nal_type = header & NAL_TYPE
+        if nal_type == NAL_IDR_SLICE:
+            self.keyframe = True
+        elif nal_type == NAL_SLICE and self.keyframes_only:
+            self.skip = True
+            self.ring.discard()
+            return
+        self.write(START_CODE)
+        self.write(nal)
+
+    def begin_frame(self, timestamp: int) -> None:
+        """Start assembling a new access unit."""
+        super().begin_frame(timestamp)
+        self.fragment = False
+
+    def frame_received(self, frame: memoryview, timestamp: int) -> None:
+        """Pass access unit to callback unless only keyframes are wanted."""
+        if self.keyframe or not self.keyframes_only:
+            super().frame_received(frame, timestamp)
+
+
+def quantization_tables(quality: int) -> bytes:
+    """Luma and chroma tables scaled to quality factor 1-99."""
+    factor = max(1, min(99, quality))
+    scale = 5000 // factor if factor < 50 else 200 - factor * 2
+    return bytes(
+        max(1, min(255, (value * scale + 50) // 100))
+        for value in JPEG_LUMA_TABLE + JPEG_CHROMA_TABLE
+    )
+
+
+def jpeg_header(
+    jpeg_type: int, width: int, height: int, tables: Packet, restart_interval: int
+) -> bytes:
+    """JPEG headers preceding the scan data of an RTP/JPEG frame."""
+    header = bytearray(JPEG_SOI)
+    table_count = len(tables) // 64
+    for index in range(table_count):
+        header += b"\xff\xdb\x00\x43" + bytes((index,))
+        header += tables[index * 64 : (index + 1) * 64]
+    if restart_interval:
+        header += b"\xff\xdd\x00\x04" + restart_interval.to_bytes(2, "big")
+    sampling = 0x21 if jpeg_type & 0x3F == 0 else 0x22  # 4:2:2 or 4:2:0
+    chroma_table = 1 if table_count > 1 else 0
+    header += b"\xff\xc0\x00\x11\x08" + struct.pack("!HH", height, width)
+    header += bytes((3, 1, sampling, 0, 2, 0x11, chroma_table, 3, 0x11, chroma_table))
+    header += JPEG_HUFFMAN_TABLES
+    header += JPEG_START_OF_SCAN
+    return bytes(header)
+
+
+class JPEGDepacketizer(Depacketizer):
+    """Reassemble JPEG images from RTP/JPEG packets.
+
+    Headers are rebuilt from the RTP/JPEG headers of the first packet,
+    including quantization tables and restart interval, and reused
+    as long as they do not change. Every image is a keyframe.
+
+    Max fps skips frames arriving sooner than 1 / max_fps after the previous
+    delivered frame, skipped frames are never copied.
+    With latest_only frames are not passed to callback but kept until
+    take_latest, so a slow consumer only ever gets the newest image.
+    """
+
+    codec = "jpeg"
+
+    def __init__(
+        self,
+        callback: Optional[FrameCallback] = None,
+        max_fps: Optional[float] = None,
+        latest_only: bool = False,
+        buffer_size: int = BUFFER_SIZE,
+    ) -> None:
+        """Initialize depacketizer."""
+        super().__init__(callback, buffer_size)
+        self.max_fps = max_fps
+        self.latest_only = latest_only
+        self.latest = bytearray()
+        self.latest_timestamp: Optional[int] = None
+        self.pending = False
+        self.delivered_timestamp: Optional[int] = None
+        self.scan_length = 0
+        self.header_key: Optional[tuple] = None
+        self.header = b""
+
+    def payload_received(self, payload: memoryview) -> None:
+        """Add scan data of payload, headers first on first packet."""
+        if len(payload) < JPEG_MAIN_HEADER.size:
+            self.drop_frame()
+            return
+        (
+            type_specific_offset,
+            jpeg_type,
+            quality,
+            width,
+            height,
+        ) = JPEG_MAIN_HEADER.unpack_from(payload)
+        offset = type_specific_offset & 0xFFFFFF
+        position = JPEG_MAIN_HEADER.size
+
+        restart_interval = 0
+        if 64 <= jpeg_type < 128:
+            restart_interval = int.from_bytes(payload[position : position + 2], "big")
+            position += JPEG_RESTART_HEADER_LENGTH
+
+        if offset != self.scan_length:
+            self.drop_frame()  # Fragment of frame was lost
+            return
+
+        if offset == 0:
+            tables: Packet = b""
+            if quality >= 128:
+                _, precision, length = JPEG_TABLE_HEADER.unpack_from(payload, position)
+                position += JPEG_TABLE_HEADER.size
+                tables = payload[position : position + length]
+                position += length
+                if precision or length not in (64, 128) or len(tables) != length:
+                    _LOGGER.debug("Unsupported quantization tables")
+                    self.drop_frame()
+                    return
+            self.write(
+                self.frame_header(
+                    jpeg_type, quality, width, height, tables, restart_interval
+                )
+            )
+
+        data = payload[position:]
+        self.scan_length += len(data)
+        self.write(data)
+
+    def frame_header(
+        self,
+        jpeg_type: int,
+        quality: int,
+        width: int,
+        height: int,
+        tables: Packet,
+        restart_interval: int,
+    ) -> bytes:
+        """JPEG headers of frame, rebuilt only when they change."""
+        key = (jpeg_type, quality, width, height, bytes(tables), restart_interval)
+        if key != self.header_key:
+            if quality < 128:
+                tables = quantization_tables(quality)
+            self.header_key = key
+            self.header = jpeg_header(
+                jpeg_type, width * 8, height * 8, tables, restart_interval
+            )
+        return self.header
+
+    def begin_frame(self, timestamp: int) -> None:
+        """Start assembling a new image unless it comes too soon."""
+        super().begin_frame(timestamp)
+        self.keyframe = True
+        self.scan_length = 0
+        last = self.delivered_timestamp
+        if self.max_fps and last is not None:
+            self.skip = (timestamp - last) & 0xFFFFFFFF < JPEG_CLOCK_RATE / self.max_fps
+
+    def end_frame(self) -> None:
+        """Terminate image with an end of image marker if it lacks one."""
+        frame = self.ring.frame
+        if not self.skip and frame and frame[-2:] != JPEG_EOI:
+            self.write(JPEG_EOI)
+        super().end_frame()
+
+    def frame_received(self, frame: memoryview, timestamp: int) -> None:
+        """Keep latest image or pass it to callback."""
+        self.delivered_timestamp = timestamp
+        if not self.latest_only:
+            super().frame_received(frame, timestamp)
+            return
+        self.frames += 1
+        self.latest[:] = frame
+        self.latest_timestamp = timestamp
+        self.pending = True
+
+    def take_latest(self) -> Optional[Tuple[bytes, int]]:
+        """Return newest image and its RTP timestamp once, None if nothing new."""
+        if not self.pending or self.latest_timestamp is None:
+            return None
+        self.pending = False
+        return bytes(self.latest), self.latest_timestamp
@@ -42,6 +42,8 @@ class Size:
 class ViewArea(APIItem):
     """View area object."""
 
+    __slots__ = ()
+
     @property
     def source(self) -> int:
         """Image source that created view area."""
@@ -0,0 +1,80 @@
+"""Memory footprint of events.
+
+python -m benchmarks.memory
+
+Compares bytes per event of the slotted APIItem layout with interned strings
+against the previous layout, where every item had a __dict__ and an observers list
+and every event held its own copy of topic, source and type strings.
+Every event is parsed from a separate XML document as it is from the stream.
+"""
+
+from contextlib import nullcontext
+import tracemalloc
+from typing import Any, List, Type
+from unittest.mock import patch
+
+from axis.api import APIItem
+from axis.event_stream import EventManager, create_event
+
+from tests.event_fixtures import PIR_INIT
+
+EVENTS = 2000
+
+
+def unslotted(item_cls: Type[APIItem]) -> Type[APIItem]:
+    """Previous layout of item class, with a __dict__ and an observers list."""
+
+    class Unslotted(item_cls):  # type: ignore[valid-type, misc]
+        def __init__(self, *args: Any) -> None:
+            super().__init__(*args)
+            self._observers = []
+
+    return Unslotted
+
+
+def documents() -> List[bytes]:
+    """Metadata documents with one PIR event each."""
+    return [
+        PIR_INIT.replace(b'Name="sensor" Value="0"', b'Name="sensor" Value="%d"' % i)
+        for i in range(EVENTS)
+    ]
+
+
+def bytes_per_event(item_cls: Type[APIItem], intern: bool) -> float:
+    """Measure bytes per event parsed from its own document and stored as item_cls."""
+    raw_documents = documents()
+    interning = (
+        nullcontext()
+        if intern
+        else patch("axis.event_stream.intern_str", lambda value: value)
+    )
+
+    with interning:
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        events = [
+            item_cls(str(index), EventManager.parse_event_xml(document), None)
+            for index, document in enumerate(raw_documents)
+        ]
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del events
+    return allocated / EVENTS
+
+
+def main() -> None:
+    """Print bytes per event for previous and current layout."""
+    item_cls = type(create_event("", EventManager.parse_event_xml(PIR_INIT), None))
+
+    for name, cls, intern in (
+        ("Previous layout", unslotted(item_cls), False),
+        ("Slotted", item_cls, False),
+        ("Slotted and interned", item_cls, True),
+    ):
+        print(f"{name}: {bytes_per_event(cls, intern):.0f} bytes per event")
+
+
+if __name__ == "__main__":
+    main()
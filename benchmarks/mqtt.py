@@ -0,0 +1,113 @@
+"""Throughput of converting MQTT messages to events.
+
+python -m benchmarks.mqtt
+
+Compares messages per second of the previous per message conversion, with two
+str.replace calls on every topic, against the batched converter with the
+standard library JSON decoder and with orjson when it is installed.
+Messages are a mix of topics and sources as a broker relays them from many devices.
+"""
+
+import json
+from time import perf_counter
+from typing import Callable, List
+from unittest.mock import Mock, patch
+
+from axis.event_stream import OPERATION_CHANGED, EventManager
+from axis.mqtt import mqtt_json_to_events
+
+MESSAGES = 100000
+ROUNDS = 5
+
+TOPICS = [
+    ("onvif:Device/axis:Sensor/PIR", "sensor", "state"),
+    ("onvif:Device/Trigger/DigitalInput", "port", "active"),
+    ("onvif:VideoSource/axis:DayNightVision", "VideoSourceConfigurationToken", "day"),
+    ("axis:CameraApplicationPlatform/VMD/Camera1ProfileANY", "", "active"),
+    ("onvif:Device/axis:Light/Status", "id", "state"),
+]
+
+
+def previous_conversion(payloads: List[bytes]) -> List[dict]:
+    """Convert one message at a time as before."""
+    events = []
+    for payload in payloads:
+        message = json.loads(payload)
+        topic = message["topic"].replace("onvif", "tns1").replace("axis", "tnsaxis")
+
+        source = source_idx = ""
+        if message["message"]["source"]:
+            source, source_idx = next(iter(message["message"]["source"].items()))
+
+        data_type = data_value = ""
+        if message["message"]["data"]:
+            data_type, data_value = next(iter(message["message"]["data"].items()))
+
+        events.append(
+            {
+                "operation": OPERATION_CHANGED,
+                "topic": topic,
+                "source": source,
+                "source_idx": source_idx,
+                "type": data_type,
+                "value": data_value,
+            }
+        )
+    return events
+
+
+def stdlib_conversion(payloads: List[bytes]) -> List[dict]:
+    """Convert batch with standard library JSON decoder."""
+    with patch("axis.mqtt.json_loads", json.loads):
+        return mqtt_json_to_events(payloads)
+
+
+def payloads() -> List[bytes]:
+    """Messages with a spread of topics, sources and values."""
+    messages = []
+    for index in range(MESSAGES):
+        topic, source, data_type = TOPICS[index % len(TOPICS)]
+        message = {
+            "timestamp": 1590045190230 + index,
+            "topic": topic,
+            "message": {
+                "source": {source: str(index % 16)} if source else {},
+                "key": {},
+                "data": {data_type: str(index % 2)},
+            },
+        }
+        messages.append(json.dumps(message).encode())
+    return messages
+
+
+def messages_per_second(convert: Callable[[List[bytes]], List[dict]]) -> float:
+    """Best rate of converting messages and updating events over a few rounds."""
+    raw = payloads()
+    best = float("inf")
+    for _ in range(ROUNDS):
+        event_manager = EventManager(Mock())
+        start = perf_counter()
+        event_manager.update(convert(raw))
+        best = min(best, perf_counter() - start)
+    return MESSAGES / best
+
+
+def main() -> None:
+    """Print messages per second of previous and batched conversion."""
+    conversions = [
+        ("Previous conversion", previous_conversion),
+        ("Batched, json", stdlib_conversion),
+    ]
+    try:
+        import orjson  # noqa: F401
+    except ImportError:
+        print("orjson is not installed")
+    else:
+        conversions.append(("Batched, orjson", mqtt_json_to_events))
+
+    for name, convert in conversions:
+        print(f"{name}: {messages_per_second(convert):,.0f} messages per second")
+
+
+if __name__ == "__main__":
+    main()
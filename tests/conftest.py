@@ -105,3 +105,97 @@ async def rtsp_server() -> TcpServerProtocol:
     yield mock_server
 
     server_task.cancel()
+
+
+MQTT_PORT = 8883
+
+
+class MqttBrokerProtocol(asyncio.Protocol):
+    """MQTT broker stand-in serving one client at a time."""
+
+    def __init__(self) -> None:
+        """Initialize broker."""
+        self.transport = None
+        self.buffer = bytearray()
+        self.connects = []
+        self.subscriptions = []
+        self.acknowledged = []
+        self.pings = 0
+        self.disconnected = False
+        self.connack_code = 0
+        self.respond_to_ping = True
+        self.subscribed = asyncio.Event()
+        self.packet_received = asyncio.Event()
+
+    def connection_made(self, transport) -> None:
+        """Client connected."""
+        self.transport = transport
+
+    def data_received(self, data) -> None:
+        """Answer packets from client."""
+        from axis.mqtt_subscriber import parse_packets
+
+        self.buffer += data
+        packets, consumed = parse_packets(self.buffer)
+        for packet_type, _, body in packets:
+            self.handle_packet(packet_type, bytes(body))
+            body.release()
+        del self.buffer[:consumed]
+        self.packet_received.set()
+
+    def handle_packet(self, packet_type: int, body: bytes) -> None:
+        """Answer a packet from client."""
+        from axis import mqtt_subscriber as mqtt
+
+        if packet_type == mqtt.CONNECT:
+            self.connects.append(body)
+            self.transport.write(
+                mqtt.packet(mqtt.CONNACK, bytes((0, self.connack_code)))
+            )
+
+        elif packet_type == mqtt.SUBSCRIBE:
+            offset = 2
+            while offset < len(body):
+                length = int.from_bytes(body[offset : offset + 2], "big")
+                topic = body[offset + 2 : offset + 2 + length].decode()
+                self.subscriptions.append((topic, body[offset + 2 + length]))
+                offset += 3 + length
+            self.transport.write(mqtt.packet(mqtt.SUBACK, body[:2] + b"\x00"))
+            self.subscribed.set()
+
+        elif packet_type == mqtt.PUBACK:
+            self.acknowledged.append(int.from_bytes(body, "big"))
+
+        elif packet_type == mqtt.PINGREQ:
+            self.pings += 1
+            if self.respond_to_ping:
+                self.transport.write(mqtt.packet(mqtt.PINGRESP))
+
+        elif packet_type == mqtt.DISCONNECT:
+            self.disconnected = True
+
+    def publish(self, messages: list, qos: int = 0) -> None:
+        """Publish topic and payload pairs to client in one write."""
+        from axis import mqtt_subscriber as mqtt
+
+        data = b""
+        for packet_id, (topic, payload) in enumerate(messages, start=1):
+            body = mqtt.encode_string(topic)
+            if qos:
+                body += packet_id.to_bytes(2, "big")
+            data += mqtt.packet(mqtt.PUBLISH | qos << 1, body + payload)
+        self.packet_received.clear()
+        self.transport.write(data)
+
+
+@pytest.fixture
+async def mqtt_broker() -> MqttBrokerProtocol:
+    """Return the MQTT broker."""
+    loop = asyncio.get_running_loop()
+    broker = MqttBrokerProtocol()
+    server = await loop.create_server(lambda: broker, HOST, MQTT_PORT)
+
+    yield broker
+
+    server.close()
+    await server.wait_closed()
@@ -0,0 +1,44 @@
+"""Test API base classes.
+
+pytest --cov-report term-missing --cov=axis.api tests/test_api.py
+"""
+
+from unittest.mock import Mock
+
+from axis.api import APIItem
+import axis.vapix  # noqa: F401 Import all modules defining API items
+
+
+def all_subclasses(cls: type) -> set:
+    """Return all subclasses of class recursively."""
+    return set(cls.__subclasses__()).union(
+        *(all_subclasses(subclass) for subclass in cls.__subclasses__())
+    )
+
+
+def test_api_items_are_slotted():
+    """Verify API items don't carry a per-instance __dict__."""
+    subclasses = all_subclasses(APIItem)
+    assert subclasses
+
+    for item_cls in subclasses | {APIItem}:
+        item = item_cls("0", {}, None)
+        assert not hasattr(item, "__dict__"), item_cls
+
+
+def test_observers_are_allocated_lazily():
+    """Verify observer list is only allocated while there are observers."""
+    item = APIItem("0", {}, None)
+    assert item._observers is None
+    assert item.observers == ()
+    item.update({"key": "value"})
+
+    mock_callback = Mock()
+    item.register_callback(mock_callback)
+    assert item.observers == (mock_callback,)
+
+    item.update({"key": "new value"})
+    mock_callback.assert_called_once()
+
+    item.remove_callback(mock_callback)
+    assert item._observers is None
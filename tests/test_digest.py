@@ -0,0 +1,140 @@
+"""Test digest authentication.
+
+pytest --cov-report term-missing --cov=axis.digest tests/test_digest.py
+"""
+
+from unittest.mock import patch
+
+from axis.digest import DigestAuth
+from axis.rtsp import RTSPSession
+import pytest
+
+# RFC 7616 section 3.9.1
+CHALLENGE = {
+    "realm": "http-auth@example.org",
+    "qop": "auth, auth-int",
+    "nonce": "7ypf/xlj9XXwfDPEoM4URrv/xwf94BcCAzFZH4GiTo0v",
+    "opaque": "FQhe/qaU925kfnzjCev0ciny7QMkPqMAFRtzCUYo5tdS",
+}
+CNONCE = "f2/wE4q74E6zIJEtWaHKaf5wv/H5QzzpXusqGemxURZJ"
+
+
+@pytest.fixture
+def digest_auth() -> DigestAuth:
+    """Digest credentials of RFC example."""
+    return DigestAuth("Mufasa", "Circle of Life")
+
+
+@pytest.mark.parametrize(
+    "algorithm,response",
+    [
+        ("MD5", "8ca523f5e9506fed4657c9700eebdbec"),
+        ("SHA-256", "753927fa0e85d155564e2e272a28d1802ca10daf4496794697cf8db5856cb6c1"),
+    ],
+)
+def test_qop_auth(digest_auth, algorithm, response):
+    """Verify response to challenge with qop matches RFC example."""
+    assert digest_auth.challenge_received([{**CHALLENGE, "algorithm": algorithm}])
+    digest_auth.cnonce = CNONCE
+
+    assert digest_auth.authorization("GET", "/dir/index.html") == (
+        'Digest username="Mufasa", '
+        'realm="http-auth@example.org", '
+        f'algorithm="{algorithm}", '
+        'nonce="7ypf/xlj9XXwfDPEoM4URrv/xwf94BcCAzFZH4GiTo0v", '
+        'uri="/dir/index.html", '
+        f'response="{response}", '
+        'opaque="FQhe/qaU925kfnzjCev0ciny7QMkPqMAFRtzCUYo5tdS", '
+        f'qop=auth, nc=00000001, cnonce="{CNONCE}"'
+    )
+
+
+def test_strongest_algorithm_is_used(digest_auth):
+    """Verify SHA-256 is preferred and unknown algorithms are ignored."""
+    assert digest_auth.challenge_received(
+        [
+            {**CHALLENGE, "algorithm": "MD5"},
+            {**CHALLENGE, "algorithm": "SHA-256"},
+            {**CHALLENGE, "algorithm": "SHA-512-256"},
+        ]
+    )
+    assert digest_auth.algorithm == "SHA-256"
+
+    assert not digest_auth.challenge_received([{**CHALLENGE, "algorithm": "SHA-1"}])
+    assert digest_auth.algorithm == "SHA-256"
+
+
+def test_nonce_reuse(digest_auth):
+    """Verify nonce count increases until device sends a new nonce."""
+    digest_auth.challenge_received([CHALLENGE])
+    cnonce = digest_auth.cnonce
+
+    assert "nc=00000001" in digest_auth.authorization("OPTIONS", "rtsp://host")
+    assert "nc=00000002" in digest_auth.authorization("PLAY", "rtsp://host")
+
+    digest_auth.challenge_received([CHALLENGE])  # Same nonce
+    assert "nc=00000003" in digest_auth.authorization("PLAY", "rtsp://host")
+    assert digest_auth.cnonce == cnonce
+
+    digest_auth.challenge_received([{**CHALLENGE, "nonce": "new", "stale": "TRUE"}])
+    assert "nc=00000001" in digest_auth.authorization("PLAY", "rtsp://host")
+    assert digest_auth.cnonce != cnonce
+
+
+def test_ha1_cached_per_realm(digest_auth):
+    """Verify credentials are hashed once per realm."""
+    with patch.object(digest_auth, "hash", wraps=digest_auth.hash) as mock_hash:
+        digest_auth.challenge_received([CHALLENGE])
+        digest_auth.authorization("OPTIONS", "rtsp://host")
+        digest_auth.authorization("PLAY", "rtsp://host")
+        digest_auth.challenge_received([{**CHALLENGE, "nonce": "new"}])
+        digest_auth.authorization("PLAY", "rtsp://host")
+        assert mock_hash.call_count == 7  # HA1 once, HA2 and response per request
+
+        digest_auth.challenge_received([{**CHALLENGE, "realm": "other"}])
+        digest_auth.authorization("PLAY", "rtsp://host")
+        assert mock_hash.call_count == 10
+
+
+def test_session_variant(digest_auth):
+    """Verify session variant hashes HA1 with nonce and client nonce."""
+    digest_auth.challenge_received([{**CHALLENGE, "algorithm": "MD5-sess"}])
+    first = digest_auth.ha1
+    digest_auth.challenge_received(
+        [{**CHALLENGE, "algorithm": "MD5-sess", "nonce": "new"}]
+    )
+    assert digest_auth.ha1 != first
+    assert 'algorithm="MD5-sess"' in digest_auth.authorization("PLAY", "rtsp://host")
+
+
+def test_rfc_2069_without_qop(digest_auth):
+    """Verify challenges without qop get a response without nonce count."""
+    digest_auth.challenge_received([{"realm": "realm", "nonce": "nonce"}])
+    authorization = digest_auth.authorization("OPTIONS", "rtsp://host")
+    assert "qop" not in authorization
+    assert "opaque" not in authorization
+    assert digest_auth.nonce_count == 0
+
+
+def test_session_keeps_digest_state_when_reconnecting():
+    """Verify cached session continues with same nonce count and HA1."""
+    session = RTSPSession("rtsp://host/media", "host", "root", "pass")
+    session.update(
+        "RTSP/1.0 401 Unauthorized\r\n"
+        'WWW-Authenticate: Digest realm="AXIS", nonce="abc", qop="auth"\r\n'
+        'WWW-Authenticate: Digest realm="AXIS", nonce="abc", qop="auth", '
+        "algorithm=SHA-256\r\n\r\n"
+    )
+    assert session.digest
+    assert session.digest_auth.algorithm == "SHA-256"
+    session.control_url = "rtsp://host/media/stream=0"
+    session.generate_digest()
+
+    reconnect = RTSPSession("rtsp://host/media", "host", "root", "pass")
+    reconnect.restore(session.cache())
+    assert reconnect.digest_auth is session.digest_auth
+    assert "nc=00000002" in reconnect.generate_digest()
+
+    other_user = RTSPSession("rtsp://host/media", "host", "user", "pass")
+    other_user.restore(session.cache())
+    assert other_user.digest_auth is not session.digest_auth
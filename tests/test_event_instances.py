@@ -6,6 +6,7 @@ pytest --cov-report term-missing --cov=axis.event_instances tests/test_event_ins
 import pytest
 
 from axis.event_instances import EventInstances, URL, get_events
+from axis.event_stream import CLASS_MOTION, CLASS_PTZ, Pir, PtzMove, PtzPreset, Vmd4
 import respx
 
 from .conftest import HOST
@@ -36,6 +37,48 @@ async def test_full_list_of_event_instances(event_instances):
     assert len(event_instances) == 44
 
 
+@respx.mock
+@pytest.mark.asyncio
+async def test_event_instance_index(event_instances):
+    """Verify event instances are indexed when updated."""
+    assert not event_instances.index.classes
+    respx.post(f"http://{HOST}:80{URL}").respond(
+        text=EVENT_INSTANCES,
+        headers={"Content-Type": "application/soap+xml; charset=utf-8"},
+    )
+    await event_instances.update()
+    index = event_instances.index
+
+    assert [event.topic for event in index.with_class(CLASS_PTZ)] == [
+        "tns1:PTZController/tnsaxis:PTZPresets/Channel_1",
+        "tns1:PTZController/tnsaxis:PTZPresets/Channel_2",
+        "tns1:PTZController/tnsaxis:Move/Channel_1",
+        "tns1:PTZController/tnsaxis:Move/Channel_2",
+    ]
+    assert len(index.with_class(CLASS_MOTION)) == 5
+    assert index.with_class("unknown") == []
+
+    assert index.source_indexes[Pir] == {"0"}
+    assert index.source_indexes[PtzMove] == {"1", "2"}
+    assert index.source_indexes[PtzPreset] == {"-1", "1"}
+    assert index.source_indexes[Vmd4] == set()
+
+    assert [event.topic for event in index.with_prefix("tnsaxis:Storage/")] == [
+        "tnsaxis:Storage/Disruption",
+        "tnsaxis:Storage/Recording",
+    ]
+    assert len(index.with_prefix("tns1:Device/tnsaxis:IO")) == 2
+    assert index.with_prefix("tns1:Device/tnsaxis:I") == []
+
+    assert [event.topic for event in index.with_source("port")] == [
+        "tns1:Device/tnsaxis:IO/VirtualPort",
+        "tns1:Device/tnsaxis:IO/VirtualInput",
+    ]
+    assert len(index.with_source("RecordingToken")) == 4
+    assert len(index.stateful) + len(index.stateless) == len(event_instances)
+    assert all(event.stateful for event in index.stateful)
+
+
 @pytest.mark.parametrize(
     "response,expected",
     [
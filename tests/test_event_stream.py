@@ -3,14 +3,16 @@
 pytest --cov-report term-missing --cov=axis.event_stream tests/test_event_stream.py
 """
 
+from datetime import datetime, timezone
 import pytest
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 
-from axis.event_stream import EventManager
+from axis.event_stream import EventManager, LatencyHistogram
 
 from .event_fixtures import (
     FIRST_MESSAGE,
     AUDIO_INIT,
+    BATCH_INIT,
     DAYNIGHT_INIT,
     FENCE_GUARD_INIT,
     GLOBAL_SCENE_CHANGE,
@@ -63,6 +65,7 @@ def event_manager(axis_device) -> EventManager:
                 "source_idx": "0",
                 "type": "state",
                 "value": "0",
+                "timestamp": "2019-03-12T23:48:26.371215Z",
             },
         ),
         (
@@ -74,6 +77,7 @@ def event_manager(axis_device) -> EventManager:
                 "source_idx": "0",
                 "type": "state",
                 "value": "1",
+                "timestamp": "2019-03-12T23:48:28.425164Z",
             },
         ),
         (
@@ -85,6 +89,7 @@ def event_manager(axis_device) -> EventManager:
                 "topic": "tns1:RuleEngine/MotionRegionDetector/Motion",
                 "type": "State",
                 "value": "0",
+                "timestamp": "2021-01-06T17:46:45.115382Z",
             },
         ),
         (
@@ -96,6 +101,7 @@ def event_manager(axis_device) -> EventManager:
                 "topic": "tnsaxis:Storage/Alert",
                 "type": "overall_health",
                 "value": "-3",
+                "timestamp": "2020-06-02T20:35:42.477710Z",
             },
         ),
         (
@@ -105,6 +111,7 @@ def event_manager(axis_device) -> EventManager:
                 "topic": "tnsaxis:CameraApplicationPlatform/VMD/Camera1ProfileANY",
                 "type": "active",
                 "value": "0",
+                "timestamp": "2019-03-12T23:32:17.591254Z",
             },
         ),
         (
@@ -114,6 +121,7 @@ def event_manager(axis_device) -> EventManager:
                 "topic": "tnsaxis:CameraApplicationPlatform/VMD/Camera1ProfileANY",
                 "type": "active",
                 "value": "1",
+                "timestamp": "2019-03-13T00:03:30.256687Z",
             },
         ),
     ],
@@ -494,3 +502,206 @@ def test_initialize_event_already_exist(event_manager):
     event_manager.update(VMD4_ANY_INIT)
     assert len(event_manager.values()) == 1
     event_manager.signal.assert_called_once()
+
+
+def test_do_not_store_unsupported_events(event_manager):
+    """Verify unsupported events are not stored if configured not to."""
+    event_manager.store_unsupported = False
+    event_manager.update(GLOBAL_SCENE_CHANGE)
+    assert len(event_manager.values()) == 0
+
+    event_manager.update(PIR_INIT)
+    assert len(event_manager.values()) == 1
+
+
+def test_evict_least_recently_seen_event(event_manager):
+    """Verify max events evicts least recently seen event."""
+    event_manager.signal = Mock()
+    event_manager.max_events = 2
+
+    event_manager.update(PIR_INIT)
+    event_manager.update(VMD4_ANY_INIT)
+    event_manager.update(PIR_CHANGE)
+    event_manager.update(AUDIO_INIT)
+
+    assert len(event_manager.values()) == 2
+    assert (
+        "tnsaxis:CameraApplicationPlatform/VMD/Camera1ProfileANY_" not in event_manager
+    )
+    event_manager.signal.assert_called_with(
+        "Deleted", "tnsaxis:CameraApplicationPlatform/VMD/Camera1ProfileANY_"
+    )
+
+
+def test_evict_unsupported_events_first(event_manager):
+    """Verify max events evicts unsupported events before supported events."""
+    event_manager.signal = Mock()
+    event_manager.max_events = 1
+
+    event_manager.update(PIR_INIT)
+    event_manager.update(GLOBAL_SCENE_CHANGE)
+
+    assert list(event_manager) == ["tns1:Device/tnsaxis:Sensor/PIR_0"]
+    event_manager.signal.assert_called_once_with(
+        "Initialized", "tns1:Device/tnsaxis:Sensor/PIR_0"
+    )
+
+
+def test_evict_stale_events(event_manager):
+    """Verify events not seen within event TTL are evicted."""
+    event_manager.signal = Mock()
+    event_manager.event_ttl = 60
+
+    with patch("axis.event_stream.monotonic", return_value=0):
+        event_manager.update(PIR_INIT)
+    with patch("axis.event_stream.monotonic", return_value=30):
+        event_manager.update(VMD4_ANY_INIT)
+    with patch("axis.event_stream.monotonic", return_value=70):
+        event_manager.update(VMD4_ANY_CHANGE)
+
+    assert list(event_manager) == [
+        "tnsaxis:CameraApplicationPlatform/VMD/Camera1ProfileANY_"
+    ]
+    event_manager.signal.assert_called_with(
+        "Deleted", "tns1:Device/tnsaxis:Sensor/PIR_0"
+    )
+
+
+def test_evict_stale_events_while_idle(event_manager):
+    """Verify stale events can be evicted without a new update."""
+    event_manager.signal = Mock()
+    event_manager.event_ttl = 60
+
+    with patch("axis.event_stream.monotonic", return_value=0):
+        event_manager.update(PIR_INIT)
+    with patch("axis.event_stream.monotonic", return_value=70):
+        event_manager.evict()
+
+    assert len(event_manager.values()) == 0
+    event_manager.signal.assert_called_with(
+        "Deleted", "tns1:Device/tnsaxis:Sensor/PIR_0"
+    )
+
+
+def test_unbounded_events_are_not_tracked(event_manager):
+    """Verify recency is only tracked when events are bounded."""
+    event_manager.update(PIR_INIT)
+    event_manager.update(VMD4_ANY_INIT)
+    event_manager.update(PIR_CHANGE)
+
+    assert list(event_manager) == [
+        "tns1:Device/tnsaxis:Sensor/PIR_0",
+        "tnsaxis:CameraApplicationPlatform/VMD/Camera1ProfileANY_",
+    ]
+    assert event_manager["tns1:Device/tnsaxis:Sensor/PIR_0"].is_tripped
+    assert not event_manager._last_seen
+
+
+def test_same_event_changed_in_one_batch(event_manager):
+    """Verify every change of the same event in a batch reaches observers."""
+    event_manager.update(PIR_INIT)
+    pir = event_manager["tns1:Device/tnsaxis:Sensor/PIR_0"]
+    states = []
+    pir.register_callback(lambda: states.append(pir.state))
+
+    pulse_start = event_manager.parse_event_xml(PIR_CHANGE)
+    pulse_end = {**pulse_start, "value": "0"}
+    event_manager.update([pulse_start, pulse_end])
+
+    assert states == ["1", "0"]
+    assert not pir.is_tripped
+
+
+def test_parse_events_xml_with_multiple_notifications(event_manager):
+    """Verify all notifications in a metadata stream are parsed in order."""
+    events = event_manager.parse_events_xml(BATCH_INIT)
+    assert [event["topic"] for event in events] == [
+        "tns1:Device/tnsaxis:Sensor/PIR",
+        "tns1:AudioSource/tnsaxis:TriggerLevel",
+        "tnsaxis:CameraApplicationPlatform/VMD/Camera1ProfileANY",
+    ]
+    assert event_manager.parse_event_xml(BATCH_INIT) == events[0]
+    assert event_manager.parse_events_xml(FIRST_MESSAGE) == []
+
+
+def test_create_events_from_multiple_notifications(event_manager):
+    """Verify all notifications in a metadata stream create events."""
+    event_manager.signal = Mock()
+    event_manager.update(BATCH_INIT)
+
+    assert list(event_manager) == [
+        "tns1:Device/tnsaxis:Sensor/PIR_0",
+        "tns1:AudioSource/tnsaxis:TriggerLevel_1",
+        "tnsaxis:CameraApplicationPlatform/VMD/Camera1ProfileANY_",
+    ]
+    assert event_manager.signal.call_count == 3
+
+
+def test_event_timestamp(event_manager):
+    """Verify event timestamp is parsed from notification."""
+    event_manager.update(PIR_INIT)
+
+    event = next(iter(event_manager.values()))
+    assert event.timestamp == datetime(
+        2019, 3, 12, 23, 48, 26, 371215, tzinfo=timezone.utc
+    )
+
+
+def test_event_latency(event_manager):
+    """Verify delay from device timestamp to dispatch is recorded for changes."""
+    device_time = datetime(2019, 3, 12, 23, 48, 28, 425164, tzinfo=timezone.utc)
+    assert event_manager.latency.count == 0
+
+    with patch("axis.event_stream.time", return_value=device_time.timestamp() + 0.2):
+        event_manager.update(PIR_INIT)
+        assert event_manager.latency.count == 0
+
+        event_manager.update(PIR_CHANGE)
+
+    with patch("axis.event_stream.time", return_value=device_time.timestamp() + 0.5):
+        event_manager.update(PIR_CHANGE)
+
+    latency = event_manager.latency
+    assert latency.count == 2
+    assert latency.clock_offset == pytest.approx(-0.2)
+    assert latency.mean == pytest.approx(0.35)
+    assert latency.maximum == pytest.approx(0.5)
+    assert latency.percentile(50) == 0.25
+    assert latency.percentile(100) == 0.5
+
+
+def test_latency_histogram():
+    """Verify latency histogram."""
+    latency = LatencyHistogram(correct_clock_offset=True)
+    assert latency.mean is None
+    assert latency.clock_offset is None
+    assert latency.percentile(50) is None
+
+    for delay in (-1.5, 0.02, 0.3, 100):
+        latency.record(delay)
+
+    assert latency.count == 4
+    assert latency.clock_offset == 1.5
+    assert latency.minimum == 0
+    assert latency.maximum == 101.5
+    assert latency.raw_mean == pytest.approx(98.82 / 4)
+    assert latency.percentile(25) == 0.01
+    assert latency.percentile(50) == 2.5
+    assert latency.percentile(100) is None
+
+    latency.reset()
+    assert latency.count == 0
+    assert latency.clock_offset is None
+
+
+def test_latency_histogram_lasting_delay():
+    """Verify delay that lasts is reported as measured, not as clock offset."""
+    latency = LatencyHistogram()
+    for _ in range(200):
+        latency.record(3)
+
+    assert latency.mean == 3
+    assert latency.minimum == 3
+    assert latency.maximum == 3
+    assert latency.percentile(99) == 5
+    assert latency.clock_offset == -3  # Estimate is still reported
@@ -4,20 +4,29 @@ pytest --cov-report term-missing --cov=axis.mqtt tests/test_mqtt.py
 """
 
 import json
+from unittest.mock import Mock, patch
 import pytest
 
 import respx
 
+from axis.event_instances import URL as EVENT_INSTANCES_URL, EventInstances
+from axis.event_stream import CLASS_MOTION, EventManager
 from axis.mqtt import (
     ClientConfig,
     Server,
     Message,
     Ssl,
     MqttClient,
+    event_filter_topics,
+    mqtt_json_to_device_events,
     mqtt_json_to_event,
+    mqtt_json_to_events,
+    mqtt_topic_serial,
+    translate_topic,
 )
 
 from .conftest import HOST
+from .event_fixtures import EVENT_INSTANCES
 
 
 @pytest.fixture
@@ -26,6 +35,35 @@ def mqtt_client(axis_device) -> MqttClient:
     return MqttClient(axis_device.vapix.request)
 
 
+@pytest.fixture
+async def event_instances(axis_device) -> EventInstances:
+    """Returns event instances loaded from device."""
+    event_instances = EventInstances(axis_device.vapix.request)
+    with respx.mock:
+        respx.post(f"http://{HOST}:80{EVENT_INSTANCES_URL}").respond(
+            text=EVENT_INSTANCES,
+            headers={"Content-Type": "application/soap+xml; charset=utf-8"},
+        )
+        await event_instances.update()
+    return event_instances
+
+
+def event_publication_config(topics: list) -> dict:
+    """Response of getEventPublicationConfig publishing topics."""
+    return {
+        "apiVersion": "1.0",
+        "method": "getEventPublicationConfig",
+        "data": {
+            "eventPublicationConfig": {
+                "eventFilterList": [
+                    {"topicFilter": topic, "qos": 0, "retain": "none"}
+                    for topic in topics
+                ],
+            }
+        },
+    }
+
+
 @respx.mock
 @pytest.mark.asyncio
 async def test_client_config_simple(mqtt_client):
@@ -297,6 +335,63 @@ async def test_configure_event_publication_specific_topics(mqtt_client):
     }
 
 
+@pytest.mark.asyncio
+async def test_event_filter_topics(event_instances):
+    """Verify topic filters only cover subscribed classes and topics."""
+    assert event_filter_topics(event_instances, [CLASS_MOTION]) == [
+        "onvif:RuleEngine/axis:VMD3/vmd3_video_1",
+        "axis:CameraApplicationPlatform/VMD/Camera1Profile2",
+        "axis:CameraApplicationPlatform/VMD/Camera1ProfileANY",
+        "axis:CameraApplicationPlatform/VMD/Camera1Profile1",
+        "onvif:Device/axis:Sensor/PIR",
+    ]
+    assert event_filter_topics(
+        event_instances, ["tnsaxis:Storage", "tns1:Device/tnsaxis:Status/Temp"]
+    ) == ["axis:Storage/Disruption", "axis:Storage/Recording"]
+    assert event_filter_topics(event_instances, []) == []
+
+
+@pytest.mark.asyncio
+async def test_update_event_publication(mqtt_client, event_instances):
+    """Verify event publication is only configured when topics differ."""
+    topics = ["axis:Storage/Disruption", "axis:Storage/Recording"]
+    with respx.mock:
+        route = respx.post(f"http://{HOST}:80/axis-cgi/mqtt/event.cgi")
+        route.respond(json=event_publication_config(["//."]))
+
+        assert await mqtt_client.update_event_publication(
+            event_instances, ["tnsaxis:Storage"]
+        )
+        assert route.call_count == 2
+        assert json.loads(route.calls.last.request.content)["params"] == {
+            "eventFilterList": [{"topicFilter": topic} for topic in topics]
+        }
+
+        route.respond(json=event_publication_config(topics[::-1]))
+        assert not await mqtt_client.update_event_publication(
+            event_instances, ["tnsaxis:Storage"]
+        )
+        assert route.call_count == 3
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_update_event_publication_without_topics(
+    mqtt_client, event_instances, axis_device, caplog
+):
+    """Verify publication is kept when no event matches subscriptions."""
+    route = respx.post(f"http://{HOST}:80/axis-cgi/mqtt/event.cgi")
+
+    assert not await mqtt_client.update_event_publication(
+        event_instances, ["tnsaxis:Unknown"]
+    )
+    assert not await mqtt_client.update_event_publication(
+        EventInstances(axis_device.vapix.request), ["motion"]
+    )
+    assert not route.called
+    assert "No events match subscriptions ['tnsaxis:Unknown']" in caplog.text
+
+
 @pytest.mark.asyncio
 async def test_convert_json_to_event():
     """Verify conversion from json to event."""
@@ -310,6 +405,84 @@ async def test_convert_json_to_event():
     assert event["source_idx"] == "0"
     assert event["type"] == "state"
     assert event["value"] == "0"
+    assert event["serial"] == ""
+
+    event = mqtt_json_to_event(
+        b'{"serial": "ACCC8E012345", "topic": "onvif:Device/axis:Sensor/PIR", "message": {"source": {}, "key": {}, "data": {}}}'
+    )
+    assert event["serial"] == "ACCC8E012345"
+
+
+@pytest.mark.parametrize(
+    "topic,expected",
+    [
+        ("onvif:Device/axis:Sensor/PIR", "tns1:Device/tnsaxis:Sensor/PIR"),
+        ("axis:Storage/Disruption", "tnsaxis:Storage/Disruption"),
+        (
+            "axis:CameraApplicationPlatform/axisonvifbridge/Camera1Profile1",
+            "tnsaxis:CameraApplicationPlatform/axisonvifbridge/Camera1Profile1",
+        ),
+        ("onvif:Device/Trigger/axis", "tns1:Device/Trigger/axis"),
+        ("myaxis:Device/onvifx:Sensor", "myaxis:Device/onvifx:Sensor"),
+    ],
+)
+def test_translate_topic(topic, expected):
+    """Verify only namespace prefixes of topic segments are translated."""
+    assert translate_topic(topic) == expected
+
+
+def test_convert_json_batch_to_events():
+    """Verify batch conversion skips malformed messages and updates events."""
+    payloads = [
+        b'{"topic": "onvif:Device/axis:Sensor/PIR", "message": {"source": {"sensor": "0"}, "key": {}, "data": {"state": "1"}}}',
+        b"not json",
+        b'{"topic": "onvif:Device/axis:Sensor/PIR"}',
+        b'{"topic": "onvif:Device/axis:Sensor/PIR", "message": {"source": {"sensor": "1"}, "key": {}, "data": {"state": "0"}}}',
+        b'{"topic": "axis:Storage/Disruption", "message": {"source": {}, "key": {}, "data": {}}}',
+    ]
+    events = mqtt_json_to_events(payloads)
+
+    assert [(event["source_idx"], event["value"]) for event in events] == [
+        ("0", "1"),
+        ("1", "0"),
+        ("", ""),
+    ]
+    assert events[0]["topic"] is events[1]["topic"]  # Translation is cached
+
+    with patch("axis.mqtt.json_loads", json.loads):
+        assert mqtt_json_to_events(payloads) == events
+
+    event_manager = EventManager(Mock())
+    event_manager.update(events)
+    assert event_manager["tns1:Device/tnsaxis:Sensor/PIR_0"].is_tripped
+    assert not event_manager["tns1:Device/tnsaxis:Sensor/PIR_1"].is_tripped
+
+
+def test_convert_json_to_device_events():
+    """Verify events are grouped per device serial number."""
+    pir = b'{"topic": "onvif:Device/axis:Sensor/PIR", "message": {"source": {"sensor": "0"}, "key": {}, "data": {"state": "1"}}}'
+    messages = [
+        ("axis/ACCC8E012345/event/onvif:Device/axis:Sensor/PIR", pir),
+        ("axis/ACCC8E067890/event/onvif:Device/axis:Sensor/PIR", pir),
+        ("axis/ACCC8E012345/event/onvif:Device/axis:Sensor/PIR", b"not json"),
+        ("custom/topic", pir.replace(b"{", b'{"serial": "ACCC8E0ABCDE", ', 1)),
+        ("axis/ACCC8E012345/event/onvif:Device/axis:Sensor/PIR", pir),
+    ]
+    devices = mqtt_json_to_device_events(messages)
+
+    assert {serial: len(events) for serial, events in devices.items()} == {
+        "ACCC8E012345": 2,
+        "ACCC8E067890": 1,
+        "ACCC8E0ABCDE": 1,
+    }
+    assert devices["ACCC8E067890"][0]["serial"] == "ACCC8E067890"
+
+
+def test_mqtt_topic_serial():
+    """Verify serial number is taken from prefix of MQTT topic."""
+    assert mqtt_topic_serial("axis/ACCC8E012345/event/tns1:Device") == "ACCC8E012345"
+    assert mqtt_topic_serial("site/ACCC8E012345") == "ACCC8E012345"
+    assert mqtt_topic_serial("") == ""
 
 
 response_get_client_status = {
@@ -0,0 +1,235 @@
+"""Test MQTT subscriber.
+
+pytest --cov-report term-missing --cov=axis.mqtt_subscriber tests/test_mqtt_subscriber.py
+"""
+
+import asyncio
+from unittest.mock import Mock
+
+from axis.event_stream import EventManager
+from axis.mqtt_subscriber import (
+    CONNACK,
+    PUBLISH,
+    MqttSubscriber,
+    encode_length,
+    packet,
+    parse_packets,
+)
+from axis.rtsp import SIGNAL_FAILED, SIGNAL_PLAYING
+from axis.streammanager import ReconnectPolicy
+import pytest
+
+from .conftest import HOST, MQTT_PORT
+
+pytestmark = pytest.mark.asyncio
+
+PIR = (
+    b'{"timestamp": 1590045190230, "topic": "onvif:Device/axis:Sensor/PIR", '
+    b'"message": {"source": {"sensor": "0"}, "key": {}, "data": {"state": "1"}}}'
+)
+PORT = (
+    b'{"timestamp": 1590045190230, "topic": "onvif:Device/Trigger/DigitalInput", '
+    b'"message": {"source": {"port": "1"}, "key": {}, "data": {"active": "0"}}}'
+)
+TOPIC = "axis/ACCC8E012345/event/onvif:Device/axis:Sensor/PIR"
+OTHER_TOPIC = "axis/ACCC8E067890/event/onvif:Device/axis:Sensor/PIR"
+PIR_OFF = PIR.replace(b'"state": "1"', b'"state": "0"')
+
+
+async def wait_for(condition) -> None:
+    """Wait until condition is true."""
+    for _ in range(100):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("Condition not met")
+
+
+@pytest.fixture
+async def subscriber(mqtt_broker):
+    """Subscriber connected to broker."""
+    callback = Mock()
+    subscriber = MqttSubscriber(
+        HOST,
+        ["axis/+/event/#"],
+        callback,
+        port=MQTT_PORT,
+        username="user",
+        password="pass",
+        client_id="axis",
+        reconnect_policy=ReconnectPolicy(first_delay=0.01, jitter=0),
+    )
+    yield subscriber
+    subscriber.stop()
+
+
+def test_encode_length():
+    """Verify remaining length encoding."""
+    assert encode_length(0) == b"\x00"
+    assert encode_length(127) == b"\x7f"
+    assert encode_length(128) == b"\x80\x01"
+    assert encode_length(16383) == b"\xff\x7f"
+    assert encode_length(2097152) == b"\x80\x80\x80\x01"
+
+
+def test_parse_packets():
+    """Verify only complete packets are parsed."""
+    data = packet(CONNACK, b"\x00\x00") + packet(PUBLISH | 0x01, bytes(200))
+    buffer = bytearray(data[:-1])
+
+    packets, consumed = parse_packets(buffer)
+    assert [
+        (packet_type, flags, bytes(body)) for packet_type, flags, body in packets
+    ] == [(CONNACK, 0, b"\x00\x00")]
+    assert consumed == 4
+    for _, _, body in packets:
+        body.release()
+
+    buffer = bytearray(data)
+    packets, consumed = parse_packets(buffer)
+    assert [(packet_type, flags) for packet_type, flags, _ in packets] == [
+        (CONNACK, 0),
+        (PUBLISH, 1),
+    ]
+    assert len(packets[1][2]) == 200
+    assert consumed == len(data)
+
+    assert parse_packets(bytearray(b"\x30\x80")) == ([], 0)  # Incomplete length
+
+
+async def test_subscribe_and_receive_batch(mqtt_broker, subscriber):
+    """Verify connect, subscribe and events passed on in one batch."""
+    status = Mock()
+    subscriber.connection_status_callback.append(status)
+    await subscriber.start()
+    await asyncio.wait_for(mqtt_broker.subscribed.wait(), 1)
+
+    (connect,) = mqtt_broker.connects
+    assert connect[:7] == b"\x00\x04MQTT\x04"
+    assert connect[7] == 0xC2  # Username, password and clean session
+    assert connect[10:] == b"\x00\x04axis\x00\x04user\x00\x04pass"
+    assert mqtt_broker.subscriptions == [("axis/+/event/#", 0)]
+    await wait_for(lambda: subscriber.subscribed)
+    status.assert_called_once_with(SIGNAL_PLAYING)
+
+    mqtt_broker.publish([(TOPIC, PIR), ("axis/connected", b"online"), (TOPIC, PORT)])
+    await wait_for(lambda: subscriber.callback.called)
+
+    subscriber.callback.assert_called_once()
+    serial, events = subscriber.callback.call_args[0]
+    assert serial == "ACCC8E012345"
+    assert [(event["topic"], event["value"]) for event in events] == [
+        ("tns1:Device/tnsaxis:Sensor/PIR", "1"),
+        ("tns1:Device/Trigger/DigitalInput", "0"),
+    ]
+
+
+async def test_events_update_event_manager(mqtt_broker, subscriber):
+    """Verify batches create and update events."""
+    signal = Mock()
+    event_manager = EventManager(signal)
+    subscriber.callback = lambda serial, events: event_manager.update(events)
+    await subscriber.start()
+    await asyncio.wait_for(mqtt_broker.subscribed.wait(), 1)
+    await wait_for(lambda: subscriber.subscribed)
+
+    mqtt_broker.publish([(TOPIC, PIR), (TOPIC, PORT)], qos=1)
+    await wait_for(lambda: len(event_manager) == 2)
+
+    signal.assert_any_call("Initialized", "tns1:Device/tnsaxis:Sensor/PIR_0")
+    assert event_manager["tns1:Device/tnsaxis:Sensor/PIR_0"].is_tripped
+    await wait_for(lambda: mqtt_broker.acknowledged == [1, 2])
+
+
+async def test_batch_interval(mqtt_broker, subscriber):
+    """Verify messages from several reads are batched within interval."""
+    subscriber.batch_interval = 0.05
+    await subscriber.start()
+    await asyncio.wait_for(mqtt_broker.subscribed.wait(), 1)
+    await wait_for(lambda: subscriber.subscribed)
+
+    mqtt_broker.publish([(TOPIC, PIR)])
+    await asyncio.sleep(0.01)
+    mqtt_broker.publish([(TOPIC, PORT)])
+    await wait_for(lambda: subscriber.callback.called)
+
+    _, events = subscriber.callback.call_args[0]
+    assert len(events) == 2
+
+
+async def test_devices_on_one_connection(mqtt_broker, subscriber):
+    """Verify events of devices sharing a connection are kept apart."""
+    event_managers = {
+        "ACCC8E012345": EventManager(Mock()),
+        "ACCC8E067890": EventManager(Mock()),
+    }
+    subscriber.callback = lambda serial, events: event_managers[serial].update(events)
+    await subscriber.start()
+    await asyncio.wait_for(mqtt_broker.subscribed.wait(), 1)
+    await wait_for(lambda: subscriber.subscribed)
+
+    mqtt_broker.publish([(TOPIC, PIR), (OTHER_TOPIC, PIR_OFF)])
+    await wait_for(lambda: all(len(manager) for manager in event_managers.values()))
+
+    pir = "tns1:Device/tnsaxis:Sensor/PIR_0"
+    assert event_managers["ACCC8E012345"][pir].is_tripped
+    assert not event_managers["ACCC8E067890"][pir].is_tripped
+    assert len(event_managers["ACCC8E012345"]) == 1
+    assert len(event_managers["ACCC8E067890"]) == 1
+
+
+async def test_refused_connection_is_retried(mqtt_broker, subscriber):
+    """Verify refused connection is retried per reconnect policy."""
+    status = Mock()
+    subscriber.connection_status_callback.append(status)
+    mqtt_broker.connack_code = 5  # Not authorized
+    await subscriber.start()
+
+    await wait_for(lambda: len(mqtt_broker.connects) == 2)
+    status.assert_any_call(SIGNAL_FAILED)
+    assert subscriber.reconnect_attempt >= 1
+    assert not mqtt_broker.subscriptions
+
+
+async def test_broker_unavailable():
+    """Verify failure to connect is signalled and retried."""
+    subscriber = MqttSubscriber(HOST, ["#"], Mock(), port=MQTT_PORT)
+    status = Mock()
+    subscriber.connection_status_callback.append(status)
+    await subscriber.start()
+
+    status.assert_called_once_with(SIGNAL_FAILED)
+    assert subscriber.retry_handle
+    subscriber.stop()
+    assert subscriber.retry_handle.cancelled()
+
+
+async def test_ping(mqtt_broker, subscriber):
+    """Verify broker is pinged and connection closed when pings go unanswered."""
+    await subscriber.start()
+    await asyncio.wait_for(mqtt_broker.subscribed.wait(), 1)
+    await wait_for(lambda: subscriber.subscribed)
+
+    subscriber.ping_handle.cancel()
+    subscriber.ping()
+    await wait_for(lambda: mqtt_broker.pings == 1)
+    await wait_for(lambda: not subscriber.awaiting_ping)
+
+    mqtt_broker.respond_to_ping = False
+    subscriber.ping_handle.cancel()
+    subscriber.ping()
+    await wait_for(lambda: mqtt_broker.pings == 2)
+    subscriber.reconnect_policy.first_delay = 10
+    subscriber.ping()
+    await wait_for(lambda: subscriber.transport is None)
+    assert subscriber.retry_handle
+
+
+async def test_stop_disconnects(mqtt_broker, subscriber):
+    """Verify stop disconnects from broker."""
+    await subscriber.start()
+    await asyncio.wait_for(mqtt_broker.subscribed.wait(), 1)
+
+    subscriber.stop()
+    await wait_for(lambda: mqtt_broker.disconnected)
+    assert subscriber.transport is None
@@ -3,17 +3,29 @@
 pytest --cov-report term-missing --cov=axis.ptz tests/test_ptz.py
 """
 
+import asyncio
+from unittest.mock import AsyncMock, Mock
 import pytest
-from urllib.parse import urlencode
+from urllib.parse import parse_qs, urlencode
+
+import httpx
 
 import respx
 
+from axis.errors import RequestError
+from axis.event_stream import EventManager
+from axis.param_cgi import PTZ, Params
 from axis.ptz import (
     AUTO,
     MOVE_HOME,
+    MOVE_STOP,
     OFF,
     ON,
+    PtzCapabilities,
+    PtzCommandChannel,
     PtzControl,
+    PtzState,
+    PresetPosition,
     QUERY_LIMITS,
     QUERY_MODE,
     QUERY_POSITION,
@@ -22,9 +34,25 @@ from axis.ptz import (
     QUERY_PRESETPOSCAMDATA,
     QUERY_SPEED,
     limit,
+    parse_limits,
+    parse_preset_positions,
+    parse_presets,
+    parse_presets_of_cameras,
+    parse_speed,
 )
 
 from .conftest import HOST
+from .test_param_cgi import response_param_cgi_ptz
+from .event_fixtures import (
+    PTZ_MOVE_END,
+    PTZ_MOVE_INIT,
+    PTZ_MOVE_START,
+    PTZ_PRESET_AT_1_FALSE,
+    PTZ_PRESET_AT_2_FALSE,
+    PTZ_PRESET_AT_2_TRUE,
+    PTZ_PRESET_INIT_1,
+    PTZ_PRESET_INIT_2,
+)
 
 UNSUPPORTED_COMMAND = "unsupported"
 
@@ -917,3 +945,426 @@ gotoserverpresetno=[n]
 speed=[n]
 query={ speed | position | limits | presetposcam | presetposall }"""
     )
+
+
+class Camera:
+    """Control of a camera answering when released."""
+
+    def __init__(self) -> None:
+        """Initialize without commands."""
+        self.commands = []
+        self.released = asyncio.Event()
+
+    async def control(self, **command) -> None:
+        """Record command and wait until released."""
+        self.commands.append(command)
+        await self.released.wait()
+
+
+@pytest.mark.asyncio
+async def test_channel_coalesces_continuous_moves():
+    """Verify latest continuous moves are sent once request in flight is done."""
+    camera = Camera()
+    channel = PtzCommandChannel(camera.control, camera=2)
+
+    channel.send(continuouspantiltmove=(10, 10))
+    await asyncio.sleep(0)
+    for speed in range(20, 60, 10):
+        channel.send(continuouspantiltmove=(speed, 0))
+    channel.send(continuouszoommove=30)
+    channel.send(gotoserverpresetno=1)
+    channel.send(continuouszoommove=40)
+    await asyncio.sleep(0)
+    assert len(camera.commands) == 1  # One request in flight
+
+    camera.released.set()
+    await channel.join()
+    assert camera.commands == [
+        {"camera": 2, "continuouspantiltmove": (10, 10)},
+        {"camera": 2, "continuouspantiltmove": (50, 0), "continuouszoommove": 30},
+        {"camera": 2, "gotoserverpresetno": 1},
+        {"camera": 2, "continuouszoommove": 40},
+    ]
+    assert channel.requests == 4
+    assert channel.coalesced == 3
+
+
+@pytest.mark.asyncio
+async def test_channel_sends_stop_immediately():
+    """Verify stop is sent at once, replaces pending moves and is repeated."""
+    camera = Camera()
+    channel = PtzCommandChannel(camera.control)
+
+    channel.send(continuouspantiltmove=(10, 10))
+    await asyncio.sleep(0)
+    channel.send(continuouspantiltmove=(20, 20), continuouszoommove=10)
+    channel.send(continuouspantiltmove=(0, 0))
+    await asyncio.sleep(0)
+    assert camera.commands == [
+        {"camera": None, "continuouspantiltmove": (10, 10)},
+        {"camera": None, "continuouspantiltmove": (0, 0)},
+    ]
+
+    camera.released.set()
+    await channel.join()
+    assert camera.commands[2:] == [
+        {"camera": None, "continuouszoommove": 10, "continuouspantiltmove": (0, 0)}
+    ]
+
+    camera.commands.clear()
+    channel.send(move=MOVE_STOP)  # Nothing in flight, stop is only sent once
+    await channel.join()
+    assert camera.commands == [{"camera": None, "move": MOVE_STOP}]
+
+
+@pytest.mark.asyncio
+async def test_channel_logs_failed_commands(caplog):
+    """Verify failing command doesn't stop channel."""
+    control = AsyncMock(side_effect=[RequestError("timeout"), None])
+    channel = PtzCommandChannel(control)
+
+    channel.send(gotoserverpresetno=1)
+    await asyncio.sleep(0)
+    channel.send(gotoserverpresetno=2)
+    await channel.join()
+
+    assert control.call_count == 2
+    assert "PTZ command {'gotoserverpresetno': 1} failed" in caplog.text
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_channel_per_camera(ptz_control):
+    """Verify each camera has its own channel sending through PTZ control."""
+    route = respx.post(f"http://{HOST}:80/axis-cgi/com/ptz.cgi")
+    channel = ptz_control.channel(1)
+    assert ptz_control.channel(1) is channel
+    assert ptz_control.channel(2) is not channel
+
+    channel.send(continuouszoommove=200)
+    await channel.join()
+    assert (
+        route.calls.last.request.content
+        == urlencode({"camera": 1, "continuouszoommove": 100}).encode()
+    )
+
+
+POSITION = """pan=51.2891
+tilt=46.1914
+zoom=1
+iris=6427
+focus=8265
+brightness=4999
+autofocus=off
+autoiris=on"""
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_update_position(ptz_control):
+    """Verify position is parsed and cached per camera."""
+    route = respx.post(f"http://{HOST}:80/axis-cgi/com/ptz.cgi").respond(
+        text=POSITION, headers={"Content-Type": "text/plain"}
+    )
+    assert ptz_control.state(2) == PtzState()
+
+    state = await ptz_control.update_position(2)
+
+    assert route.calls.last.request.content == b"query=position&camera=2"
+    assert state is ptz_control.state(2)
+    assert state == PtzState(pan=51.2891, tilt=46.1914, zoom=1, focus=8265, iris=6427)
+    assert ptz_control.state(1) == PtzState()
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_state_from_events(ptz_control):
+    """Verify events update preset and position is only polled while moving."""
+    route = respx.post(f"http://{HOST}:80/axis-cgi/com/ptz.cgi").respond(
+        text=POSITION, headers={"Content-Type": "text/plain"}
+    )
+    ptz_control.poll_interval = 0.01
+    event_manager = EventManager(
+        lambda operation, event_id: ptz_control.observe(event_manager[event_id])
+    )
+    state = ptz_control.state(1)
+
+    event_manager.update(PTZ_PRESET_INIT_1)
+    event_manager.update(PTZ_PRESET_INIT_2)
+    event_manager.update(PTZ_MOVE_INIT)
+    assert state.preset == 1
+    assert not route.called
+
+    event_manager.update(PTZ_MOVE_START)
+    assert state.moving
+    assert state.preset is None
+    poll_task = ptz_control.poll_tasks[1]
+    await asyncio.sleep(0.05)
+    assert route.call_count >= 2
+    assert state.pan == 51.2891
+
+    event_manager.update(PTZ_MOVE_END)
+    event_manager.update(PTZ_PRESET_AT_2_TRUE)
+    assert state.preset == 2
+    await asyncio.wait_for(poll_task, 1)  # Position polled a last time
+    assert not ptz_control.poll_tasks
+    calls = route.call_count
+    await asyncio.sleep(0.02)
+    assert route.call_count == calls
+
+    event_manager.update(PTZ_PRESET_AT_1_FALSE)
+    assert state.preset == 2
+    event_manager.update(PTZ_PRESET_AT_2_FALSE)
+    assert state.preset is None
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_close(ptz_control):
+    """Verify close stops polling and observing, observing twice has no effect."""
+    respx.post(f"http://{HOST}:80/axis-cgi/com/ptz.cgi").respond(
+        text=POSITION, headers={"Content-Type": "text/plain"}
+    )
+    event_manager = EventManager(Mock())
+    event_manager.update(PTZ_MOVE_INIT)
+    (event,) = event_manager.values()
+
+    ptz_control.observe(event)
+    ptz_control.observe(event)
+    assert len(event.observers) == 1
+
+    event_manager.update(PTZ_MOVE_START)
+    poll_task = ptz_control.poll_tasks[1]
+
+    ptz_control.close()
+    with pytest.raises(asyncio.CancelledError):
+        await poll_task
+    assert not ptz_control.poll_tasks
+    assert not event.observers
+    assert not ptz_control.observed
+
+    event_manager.update(PTZ_MOVE_END)
+    assert ptz_control.state(1).moving
+
+
+LIMITS = """MinPan=-170
+MaxPan=170
+MinTilt=-20
+MaxTilt=90
+MinZoom=1
+MaxZoom=9999
+MinFocus=770
+MaxFocus=9999
+MinFieldAngle=22
+MaxFieldAngle=623"""
+
+PRESETPOSALL = """Preset Positions for camera 1
+presetposno1=Home
+presetposno3=Gate
+Preset Positions for camera 2
+presetposno1=Home
+Preset Positions for camera 3"""
+
+
+def test_parse_limits():
+    """Verify limits are typed and missing limits are None."""
+    limits = parse_limits(LIMITS)
+    assert (limits.min_pan, limits.max_pan) == (-170.0, 170.0)
+    assert (limits.min_tilt, limits.max_tilt) == (-20.0, 90.0)
+    assert (limits.min_zoom, limits.max_zoom) == (1, 9999)
+    assert limits.min_focus == 770
+    assert limits.max_field_angle == 623
+    assert limits.min_iris is None
+    assert limits.max_brightness is None
+
+
+def test_parse_presets():
+    """Verify preset names per camera."""
+    assert parse_presets_of_cameras(PRESETPOSALL) == {
+        1: {1: "Home", 3: "Gate"},
+        2: {1: "Home"},
+    }
+    assert parse_presets("presetposno2=Door") == {2: "Door"}
+    assert parse_presets("") == {}
+
+
+def test_parse_preset_positions():
+    """Verify preset position data."""
+    assert parse_preset_positions(
+        "Preset Positions for camera 1\n"
+        "presetposno1=Home\n"
+        "presetposno2=pan=10.5:tilt=-20.25:zoom=3000:name=Gate"
+    ) == {
+        1: PresetPosition("Home"),
+        2: PresetPosition("Gate", pan=10.5, tilt=-20.25, zoom=3000),
+    }
+
+
+def test_parse_speed():
+    """Verify speed."""
+    assert parse_speed("speed=100") == 100
+    assert parse_speed("") is None
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_cached_queries(ptz_control):
+    """Verify queries are parsed once per camera until invalidated."""
+    responses = {"limits": LIMITS, "presetposall": PRESETPOSALL, "speed": "speed=50"}
+    route = respx.post(f"http://{HOST}:80/axis-cgi/com/ptz.cgi").mock(
+        side_effect=lambda request: httpx.Response(
+            200,
+            text=responses.get(
+                parse_qs(request.content.decode()).get("query", [""])[0], ""
+            ),
+            headers={"Content-Type": "text/plain"},
+        )
+    )
+
+    def calls(query: str) -> list:
+        """Requests of query."""
+        return [
+            call
+            for call in route.calls
+            if f"query={query}".encode() in call.request.content
+        ]
+
+    assert (await ptz_control.limits()).max_tilt == 90
+    assert await ptz_control.limits() is await ptz_control.limits()
+    assert len(calls("limits")) == 1
+    assert route.calls.last.request.content == b"query=limits&camera=1"
+    await ptz_control.limits(2)
+    assert len(calls("limits")) == 2
+
+    assert (await ptz_control.presets_of_cameras())[2] == {1: "Home"}
+    await ptz_control.presets_of_cameras()
+    assert len(calls("presetposall")) == 1
+    ptz_control.invalidate_presets(2)
+    await ptz_control.presets_of_cameras()
+    assert len(calls("presetposall")) == 2
+    assert len(calls("limits")) == 2
+
+    assert await ptz_control.speed() == 50
+    await ptz_control.speed()
+    assert len(calls("speed")) == 1
+    await ptz_control.control(speed=80)
+    await ptz_control.speed()
+    assert len(calls("speed")) == 2
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_new_preset_invalidates_presets(ptz_control):
+    """Verify presets are fetched again when a preset is added."""
+    route = respx.post(f"http://{HOST}:80/axis-cgi/com/ptz.cgi").respond(
+        text="presetposno1=Home", headers={"Content-Type": "text/plain"}
+    )
+    event_manager = EventManager(
+        lambda operation, event_id: ptz_control.observe(event_manager[event_id])
+    )
+
+    assert await ptz_control.presets() == {1: "Home"}
+    await ptz_control.preset_positions()
+    assert route.call_count == 2
+
+    event_manager.update(PTZ_PRESET_INIT_1)
+    await ptz_control.presets()
+    await ptz_control.preset_positions()
+    assert route.call_count == 4
+
+
+@pytest.fixture
+async def validating_ptz_control(axis_device) -> PtzControl:
+    """Returns PTZ control validating commands with PTZ parameters."""
+    params = Params(axis_device.vapix.request)
+    with respx.mock:
+        respx.get(
+            f"http://{HOST}:80/axis-cgi/param.cgi?action=list&group=root.PTZ"
+        ).respond(text=response_param_cgi_ptz, headers={"Content-Type": "text/plain"})
+        await params.update_ptz()
+    return PtzControl(axis_device.vapix.request, params)
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_control_clamps_to_camera_limits(validating_ptz_control):
+    """Verify absolute positions are clamped to limits of camera."""
+    route = respx.post(f"http://{HOST}:80/axis-cgi/com/ptz.cgi")
+
+    await validating_ptz_control.control(pan=175, tilt=-90, zoom=5000, focus=10)
+
+    assert (
+        route.calls.last.request.content
+        == urlencode({"pan": 170, "tilt": -20, "zoom": 5000, "focus": 770}).encode()
+    )
+
+
+@respx.mock
+@pytest.mark.asyncio
+async def test_control_drops_unsupported_arguments(validating_ptz_control):
+    """Verify arguments camera can't handle are dropped or not sent at all."""
+    route = respx.post(f"http://{HOST}:80/axis-cgi/com/ptz.cgi")
+
+    await validating_ptz_control.control(
+        camera=1, continuouszoommove=50, continuousirismove=50, gotodevicepreset=2
+    )
+    assert (
+        route.calls.last.request.content
+        == urlencode({"camera": 1, "continuouszoommove": 50}).encode()
+    )
+
+    await validating_ptz_control.control(camera=1, continuousirismove=50)
+    await validating_ptz_control.control(areazoom=(1, 2, 3), imagewidth=640)
+    capabilities = validating_ptz_control.camera_capabilities(1)
+    capabilities.support["AreaZoom"] = False
+    await validating_ptz_control.control(areazoom=(1, 2, 3), imagewidth=640)
+    assert route.call_count == 2
+
+    capabilities.various["PanEnabled"] = False
+    await validating_ptz_control.control(continuouspantiltmove=(50, 50))
+    assert (
+        route.calls.last.request.content
+        == urlencode({"continuouspantiltmove": "0,50"}).encode()
+    )
+
+    capabilities.support["AutoIrCutFilter"] = False
+    assert not capabilities.supports("ircutfilter", AUTO)
+    assert capabilities.supports("ircutfilter", ON)
+
+
+def test_capabilities_without_parameters(ptz_control):
+    """Verify commands are not validated without PTZ parameters."""
+    assert ptz_control.camera_capabilities() is None
+    assert PtzCapabilities().validate({"pan": 500, "gotodevicepreset": 1}) == {
+        "pan": 500,
+        "gotodevicepreset": 1,
+    }
+
+
+def test_capabilities_with_fractional_limits():
+    """Verify limits with decimals, kept as text by parameters, are clamped to."""
+    capabilities = PtzCapabilities({"MinPan": "-170.5", "MaxPan": "170.5"}, {}, {})
+    assert capabilities.validate({"pan": 200.0}) == {"pan": 170.5}
+    assert capabilities.validate({"pan": -200}) == {"pan": -170.5}
+    assert capabilities.validate({"pan": 10}) == {"pan": 10}
+
+
+def test_capabilities_follow_parameter_updates(validating_ptz_control):
+    """Verify cached capabilities are dropped when parameters are updated."""
+    capabilities = validating_ptz_control.camera_capabilities(1)
+    assert validating_ptz_control.camera_capabilities(1) is capabilities
+    assert capabilities.limits["MaxPan"] == 170
+
+    params = validating_ptz_control.params
+    params.process_raw(
+        response_param_cgi_ptz.replace(
+            "root.PTZ.Limit.L1.MaxPan=170", "root.PTZ.Limit.L1.MaxPan=90"
+        )
+    )
+    assert validating_ptz_control.camera_capabilities(1).limits["MaxPan"] == 90
+
+    validating_ptz_control.camera_capabilities(2)
+    assert params[PTZ].observers == (validating_ptz_control.params_updated,)
+
+    validating_ptz_control.close()
+    assert not params[PTZ].observers
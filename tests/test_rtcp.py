@@ -0,0 +1,126 @@
+"""Test RTCP statistics and reports.
+
+pytest --cov-report term-missing --cov=axis.rtcp tests/test_rtcp.py
+"""
+
+import struct
+
+from axis.rtcp import (
+    NTP_EPOCH_OFFSET,
+    RTCP_RECEIVER_REPORT,
+    RTCP_SOURCE_DESCRIPTION,
+    RTPStatistics,
+    parse_rtcp,
+)
+import pytest
+
+SSRC = 0x315460DA
+
+
+def rtp_header(sequence: int, timestamp: int, ssrc: int = SSRC) -> bytes:
+    """RTP header of a metadata packet."""
+    return struct.pack("!BBHII", 0x80, 98, sequence, timestamp, ssrc)
+
+
+def sender_report(seconds: int, fraction: int, rtp_timestamp: int) -> bytes:
+    """Compound RTCP packet with a sender report and an empty SDES."""
+    report = struct.pack("!BBHI", 0x80, 200, 6, SSRC)
+    report += struct.pack("!IIIII", seconds, fraction, rtp_timestamp, 10, 1000)
+    return report + struct.pack("!BBH", 0x80, 202, 0)
+
+
+def test_parse_sender_report():
+    """Verify sender report is parsed from compound packet."""
+    packet = sender_report(NTP_EPOCH_OFFSET + 1000, 1 << 31, 90000)
+    (report,) = parse_rtcp(memoryview(packet), received=5)
+
+    assert report.ssrc == SSRC
+    assert report.wall_clock == 1000.5
+    assert report.rtp_timestamp == 90000
+    assert report.packet_count == 10
+    assert report.octet_count == 1000
+    assert report.ntp_middle == ((NTP_EPOCH_OFFSET + 1000) & 0xFFFF) << 16 | 0x8000
+    assert report.received == 5
+
+
+def test_parse_invalid_rtcp():
+    """Verify parsing stops on invalid packet."""
+    assert parse_rtcp(b"\x00" * 8, received=0) == []
+    assert parse_rtcp(sender_report(0, 0, 0)[:20], received=0) == []
+
+
+def test_packet_loss():
+    """Verify lost packets are counted over sequence number wrap around."""
+    statistics = RTPStatistics()
+    for sequence in (65533, 65534, 0, 2, 3):
+        statistics.packet_received(rtp_header(sequence, 0), arrival=0)
+
+    assert statistics.cycles == 1 << 16
+    assert statistics.expected == 7
+    assert statistics.received == 5
+    assert statistics.lost == 2
+    assert statistics.fraction_lost() == 2 * 256 // 7
+    assert statistics.fraction_lost() == 0
+
+
+def test_new_source_restarts_statistics():
+    """Verify a new SSRC starts over statistics."""
+    statistics = RTPStatistics()
+    statistics.packet_received(rtp_header(10, 0), arrival=0)
+    statistics.packet_received(rtp_header(20, 0), arrival=0)
+    statistics.packet_received(rtp_header(500, 0, ssrc=1), arrival=0)
+
+    assert statistics.ssrc == 1
+    assert statistics.expected == 1
+    assert statistics.lost == 0
+
+
+def test_jitter():
+    """Verify interarrival jitter."""
+    statistics = RTPStatistics(clock_rate=1000)
+    statistics.packet_received(rtp_header(0, 0), arrival=0)
+    statistics.packet_received(rtp_header(1, 1000), arrival=1.016)
+
+    assert statistics.jitter == pytest.approx(0.001)
+
+
+def test_wall_clock():
+    """Verify RTP timestamp is mapped to wall clock of device."""
+    statistics = RTPStatistics()
+    assert statistics.wall_clock(0) is None
+
+    (report,) = parse_rtcp(sender_report(NTP_EPOCH_OFFSET + 1000, 0, 100), 0)
+    statistics.sender_report_received(report)
+
+    assert statistics.wall_clock(100 + 45000) == 1000.5
+    assert statistics.wall_clock((100 - 90000) & 0xFFFFFFFF) == 999
+
+
+def test_receiver_report():
+    """Verify receiver report content."""
+    statistics = RTPStatistics()
+    assert statistics.receiver_report(1, "cname") is None
+
+    statistics.packet_received(rtp_header(1, 0), arrival=0)
+    statistics.packet_received(rtp_header(3, 0), arrival=0)
+    (report,) = parse_rtcp(sender_report(NTP_EPOCH_OFFSET, 1 << 31, 0), 10)
+    statistics.sender_report_received(report)
+
+    packet = statistics.receiver_report(1, "cname", now=11)
+
+    flags, packet_type, length, ssrc = struct.unpack_from("!BBHI", packet)
+    assert (flags, packet_type, length, ssrc) == (0x81, RTCP_RECEIVER_REPORT, 7, 1)
+    source, lost, highest, _, last_report, delay = struct.unpack_from(
+        "!IIIIII", packet, 8
+    )
+    assert source == SSRC
+    assert lost >> 24 == 256 // 3
+    assert lost & 0xFFFFFF == 1
+    assert highest == 3
+    assert last_report == report.ntp_middle
+    assert delay == 65536
+
+    flags, packet_type, length = struct.unpack_from("!BBH", packet, 32)
+    assert (flags, packet_type) == (0x81, RTCP_SOURCE_DESCRIPTION)
+    assert len(packet) == 32 + (length + 1) * 4
+    assert packet[42:47] == b"cname"
@@ -5,19 +5,33 @@ pytest --cov-report term-missing --cov=axis.rtsp tests/test_rtsp.py
 
 import asyncio
 import logging
-from unittest.mock import Mock, patch
+import socket
+from unittest.mock import Mock, call, patch
 
 from axis.rtsp import (
+    IP_MULTICAST_ALL,
+    BufferPool,
+    DatagramReader,
+    RTPClient,
     RTSPClient,
+    RTSPResponseReader,
+    SessionCache,
+    SilencePolicy,
+    SilenceWatchdog,
     SIGNAL_FAILED,
     SIGNAL_PLAYING,
     STATE_PLAYING,
     STATE_STARTING,
     STATE_STOPPED,
+    TRANSPORT_MULTICAST,
+    TRANSPORT_TCP,
+    multicast_socket,
+    parse_response,
 )
 import pytest
 
 from .conftest import HOST, RTSP_PORT
+from .event_fixtures import PIR_INIT
 
 
 pytestmark = pytest.mark.asyncio
@@ -56,7 +70,7 @@ async def test_successful_connect(rtsp_server, rtsp_client):
             + "Content-Base: rtsp://127.0.0.1/axis-media/media.amp/\r\n"
             + "Server: GStreamer RTSP server\r\n"
             + "Date: Sat, 12 Dec 2020 10:44:25 GMT\r\n"
-            + "Content-Length: 440\r\n\r\n"
+            + "Content-Length: 435\r\n\r\n"
             + "v=0\r\n"
             + "o=- 18302136002250915122 1 IN IP4 host\r\n"
             + "s=Session streamed with GStreamer\r\n"
@@ -242,7 +256,7 @@ async def test_successful_connect(rtsp_server, rtsp_client):
     assert rtsp_client.session.stale is False
     assert rtsp_client.session.content_type == "application/sdp"
     assert rtsp_client.session.content_base == "rtsp://127.0.0.1/axis-media/media.amp/"
-    assert rtsp_client.session.content_length == 440
+    assert rtsp_client.session.content_length == 435
     assert rtsp_client.session.session_id is None
     assert rtsp_client.session.session_timeout == 0
     assert rtsp_client.session.transport_ack is None
@@ -303,13 +317,15 @@ async def test_successful_connect(rtsp_server, rtsp_client):
     assert rtsp_client.session.stale is False
     assert rtsp_client.session.content_type == "application/sdp"
     assert rtsp_client.session.content_base == "rtsp://127.0.0.1/axis-media/media.amp/"
-    assert rtsp_client.session.content_length == 440
+    assert rtsp_client.session.content_length == 435
     assert rtsp_client.session.session_id == "ghLlkf_I9pCBP24t"
     assert rtsp_client.session.session_timeout == 60
     assert (
         rtsp_client.session.transport_ack
         == f'RTP/AVP;unicast;client_port={rtp_port}-{rtcp_port};server_port=50000-50001;ssrc=315460DA;mode="PLAY"'
     )
+    assert rtsp_client.session.server_rtcp_port == 50001
+    assert rtsp_client.session.clock_rate == 90000
     assert rtsp_client.session.range is None
     assert rtsp_client.session.rtp_info is None
     assert rtsp_client.session.sdp == [
@@ -368,7 +384,7 @@ async def test_successful_connect(rtsp_server, rtsp_client):
     assert rtsp_client.session.stale is False
     assert rtsp_client.session.content_type == "application/sdp"
     assert rtsp_client.session.content_base == "rtsp://127.0.0.1/axis-media/media.amp/"
-    assert rtsp_client.session.content_length == 440
+    assert rtsp_client.session.content_length == 435
     assert rtsp_client.session.session_id == "ghLlkf_I9pCBP24t"
     assert rtsp_client.session.session_timeout == 60
     assert (
@@ -426,7 +442,9 @@ async def test_successful_connect(rtsp_server, rtsp_client):
 
     # KEEP-ALIVE send OPTIONS signal to keep session alive
     assert rtsp_client.keep_alive_handle
+    assert rtsp_client.rtp.watchdog.running
     assert rtsp_client.time_out_handle.cancelled()
+    keep_alive_handle = rtsp_client.keep_alive_handle
     rtsp_client.keep_alive()
     assert not rtsp_client.time_out_handle.cancelled()
     await rtsp_server.next_request_received.wait()
@@ -437,7 +455,9 @@ async def test_successful_connect(rtsp_server, rtsp_client):
         + "User-Agent: HASS Axis\r\n"
         + "Session: ghLlkf_I9pCBP24t\r\n\r\n"
     )
-    with patch.object(rtsp_client, "callback") as mock_callback:
+    with patch.object(rtsp_client, "callback") as mock_callback, patch.object(
+        rtsp_client.rtp.watchdog, "alive"
+    ) as mock_alive:
         rtsp_server.send_response(
             "RTSP/1.0 200 OK\r\n"
             + "CSeq: 4\r\n"
@@ -454,12 +474,16 @@ async def test_successful_connect(rtsp_server, rtsp_client):
                 continue
             break
         mock_callback.assert_called_with(SIGNAL_PLAYING)
+        mock_alive.assert_called_once()  # Answered keep-alive counts as liveness
     assert rtsp_client.session.session_id == "ghLlkf_I9pCBP24t"
     assert rtsp_client.session.session_timeout == 30
+    assert keep_alive_handle.cancelled()
+    assert rtsp_client.keep_alive_handle is not keep_alive_handle
 
     rtsp_client.stop()
     assert rtsp_client.keep_alive_handle.cancelled()
     assert rtsp_client.time_out_handle.cancelled()
+    assert not rtsp_client.rtp.watchdog.running
     await rtsp_server.next_request_received.wait()
     assert rtsp_server.last_request == (
         "TEARDOWN "
@@ -482,6 +506,136 @@ def test_rtsp_client_time_out(rtsp_client, caplog):
         mock_rtsp_client_callback.assert_called_with(SIGNAL_FAILED)
 
 
+def test_silence_policy():
+    """Verify silence limit follows stream rate within bounds."""
+    policy = SilencePolicy(factor=4, min_silence=15, max_silence=300)
+    assert policy.limit(None) == 300
+    assert policy.limit(1) == 15
+    assert policy.limit(10) == 40
+    assert policy.limit(100) == 300
+
+
+def test_silence_watchdog():
+    """Verify watchdog probes on silence and expires if data does not resume."""
+    loop = Mock()
+    loop.time.return_value = 0
+    probe, expire = Mock(), Mock()
+    watchdog = SilenceWatchdog(loop)
+
+    # Learn normal interval, bursts only slowly shorten it
+    for now in (0, 5, 10, 10.5):
+        loop.time.return_value = now
+        watchdog.received()
+    assert watchdog.interval == 5 + (0.5 - 5) / 16
+
+    watchdog.start(SilencePolicy(min_silence=20), probe, expire)
+    assert watchdog.running
+    assert watchdog.limit == 20
+    loop.call_later.assert_called_with(20, watchdog.check)
+
+    # Data arrived in time, check again when limit is reached
+    loop.time.return_value = 25.5
+    watchdog.check()
+    loop.call_later.assert_called_with(5, watchdog.check)
+    probe.assert_not_called()
+
+    # Silence, probe session
+    loop.time.return_value = 30.5
+    watchdog.check()
+    probe.assert_called_once()
+    loop.call_later.assert_called_with(20, watchdog.check)
+
+    # Data resumed after probe, longer gap is learned at once
+    watchdog.received()
+    assert watchdog.limit == 80
+    loop.time.return_value = 50.5
+    watchdog.check()
+    loop.call_later.assert_called_with(60, watchdog.check)
+
+    loop.time.return_value = 110.5
+    watchdog.check()
+    assert probe.call_count == 2
+    expire.assert_not_called()
+
+    # Still silent after probe, expire
+    loop.time.return_value = 190.5
+    watchdog.check()
+    expire.assert_called_once()
+    assert not watchdog.running
+
+    watchdog.stop()
+
+
+def test_silence_watchdog_alive():
+    """Verify answered probes keep a quiet session and lengthen its interval."""
+    loop = Mock()
+    probe, expire = Mock(), Mock()
+    watchdog = SilenceWatchdog(loop)
+
+    # Burst of events teaches a short interval
+    for now in (0, 0.1, 0.2):
+        loop.time.return_value = now
+        watchdog.received()
+    watchdog.start(SilencePolicy(), probe, expire)
+    assert watchdog.limit == 15
+
+    # Keep-alive answered, silence counts from response
+    loop.time.return_value = 10
+    watchdog.alive()
+    loop.time.return_value = 20
+    watchdog.check()
+    loop.call_later.assert_called_with(5, watchdog.check)
+    probe.assert_not_called()
+
+    # Probe answered, silence since last packet is learned as interval
+    loop.time.return_value = 25
+    watchdog.check()
+    probe.assert_called_once()
+    loop.time.return_value = 25.5
+    watchdog.alive()
+    assert not watchdog.probed
+    assert watchdog.interval == 25.3
+    assert watchdog.limit == 4 * 25.3
+
+    loop.time.return_value = 40.5
+    watchdog.check()
+    probe.assert_called_once()
+    expire.assert_not_called()
+
+    watchdog.stop()
+
+
+def test_rtsp_client_probe_during_keep_alive(rtsp_client):
+    """Verify probe sent while keep-alive is outstanding replaces its time out."""
+    rtsp_client.transport = Mock()
+    rtsp_client.keep_alive()
+    keep_alive_time_out = rtsp_client.time_out_handle
+
+    rtsp_client.probe()
+    assert keep_alive_time_out.cancelled()
+    assert not rtsp_client.time_out_handle.cancelled()
+    assert rtsp_client.transport.write.call_count == 2
+    rtsp_client.time_out_handle.cancel()
+
+
+def test_rtsp_client_silence(rtsp_client, caplog):
+    """Verify probe sends an early keep-alive and silence fails session."""
+    rtsp_client.transport = Mock()
+    rtsp_client.keep_alive_handle = keep_alive_handle = Mock()
+    rtsp_client.probe()
+    keep_alive_handle.cancel.assert_called_once()
+    rtsp_client.transport.write.assert_called_once()
+
+    with patch.object(rtsp_client, "stop") as mock_stop, patch.object(
+        rtsp_client, "callback"
+    ) as mock_callback:
+        rtsp_client.silence_expired()
+        assert f"No data received from {HOST}" in caplog.text
+        mock_stop.assert_called()
+        mock_callback.assert_called_with(SIGNAL_FAILED)
+    rtsp_client.time_out_handle.cancel()
+
+
 def test_rtsp_client_connection_lost(rtsp_client, caplog):
     """Verify RTSP client connection lost method."""
     with caplog.at_level(logging.DEBUG):
@@ -511,15 +665,141 @@ def test_rtp_client(rtsp_client, caplog):
         rtp_client.client.connection_lost("exc")
     assert "Stream recepient offline" in caplog.text
 
+    payloads = []
     with patch.object(rtp_client.client, "callback") as mock_callback:
-        rtp_client.client.datagram_received("0123456789ABCDEF", "addr")
+        mock_callback.side_effect = lambda signal: payloads.append(
+            bytes(rtp_client.data)
+        )
+        rtp_client.client.datagram_received(
+            b"\x80\x62\x00\x01" + bytes(8) + b"CDEF", "addr"
+        )
         mock_callback.assert_called_with("data")
-        assert rtp_client.data == "CDEF"
+        assert payloads == [b"CDEF"]
+        assert rtp_client.data == ""  # Payload is only valid during signal
+        assert rtp_client.statistics.received == 1
+
+    # Packet callback gets whole packets instead of data signals
+    rtp_client.client.packet_callback = Mock()
+    with patch.object(rtp_client.client, "callback") as mock_callback:
+        packet = b"\x80\x62\x00\x02" + bytes(8) + b"GHIJ"
+        rtp_client.client.datagram_received(packet, "addr")
+        rtp_client.client.packet_callback.assert_called_with(packet)
+        mock_callback.assert_not_called()
 
     rtsp_client.stop()
     mock_transport.close.assert_called()
 
 
+def test_buffer_pool():
+    """Verify buffers are reused and pool does not grow past its size."""
+    pool = BufferPool(count=2, size=8)
+    first, second = pool.acquire(), pool.acquire()
+    extra = pool.acquire()  # Pool exhausted
+    assert len(extra) == 8
+    assert not pool.free
+
+    for buffer in (first, second, extra):
+        pool.release(buffer)
+    assert pool.free == [first, second]
+    assert pool.acquire() is second
+
+
+async def test_datagram_reader():
+    """Verify datagrams are read in batches into pooled buffers."""
+    loop = asyncio.get_running_loop()
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind((HOST, 0))
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    datagrams = []
+    protocol = Mock()
+    protocol.datagram_received.side_effect = lambda data, addr: datagrams.append(
+        (type(data), bytes(data))
+    )
+    pool = BufferPool(count=1, size=64)
+    reader = DatagramReader(loop, receiver, protocol, pool)
+    assert reader.start()
+    protocol.connection_made.assert_called_with(reader)
+
+    for data in (b"first", b"second", b"third"):
+        sender.sendto(data, receiver.getsockname())
+    for _ in range(100):
+        if len(datagrams) == 3:
+            break
+        await asyncio.sleep(0.01)
+
+    assert datagrams == [
+        (memoryview, b"first"),
+        (memoryview, b"second"),
+        (memoryview, b"third"),
+    ]
+    _, addr = protocol.datagram_received.call_args[0]
+    assert addr[1] == sender.getsockname()[1]
+    assert len(pool.free) == 1
+
+    reader.close()
+    assert receiver.fileno() == -1
+    protocol.connection_lost.assert_called_once_with(None)
+    reader.close()  # Closing twice is harmless
+    sender.close()
+
+
+async def test_buffer_pool_allocated_for_socket(rtsp_client):
+    """Verify receive buffer is only allocated for streams with a socket."""
+    assert rtsp_client.rtp.sock
+    assert len(rtsp_client.rtp.pool.free) == 1
+
+    tcp_client = RTPClient(asyncio.get_running_loop(), rtp_transport=TRANSPORT_TCP)
+    await tcp_client.start()
+    assert tcp_client.pool is None
+
+
+def test_datagram_reader_unsupported():
+    """Verify reader reports event loops without socket readers."""
+    loop = Mock()
+    loop.add_reader.side_effect = NotImplementedError
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    protocol = Mock()
+
+    assert not DatagramReader(loop, sock, protocol, BufferPool()).start()
+    protocol.connection_made.assert_not_called()
+    sock.close()
+
+
+def test_receiver_report(rtsp_client):
+    """Verify receiver reports are sent once there is data to report on."""
+    rtsp_client.transport = Mock()
+    rtsp_client.rtp.send_rtcp = Mock()
+    rtsp_client.session.server_rtcp_port = 50001
+
+    rtsp_client.send_receiver_report()
+    rtsp_client.rtp.send_rtcp.assert_not_called()
+    assert rtsp_client.rtcp_handle
+
+    rtsp_client.rtp.client.datagram_received(b"\x80\x62\x00\x01" + bytes(8), None)
+    rtsp_client.send_receiver_report()
+    report = rtsp_client.rtp.send_rtcp.call_args[0][0]
+    assert rtsp_client.rtp.send_rtcp.call_args[0][1] == (HOST, 50001)
+    assert report[1] == 201  # Receiver report
+
+    rtsp_client.session.rtp_transport = TRANSPORT_TCP
+    rtsp_client.send_receiver_report()
+    frame = rtsp_client.transport.write.call_args[0][0]
+    assert frame[:2] == b"$\x01"
+    assert int.from_bytes(frame[2:4], "big") == len(frame) - 4
+    assert frame[5] == 201
+
+
+def test_rtcp_sender_report(rtsp_client):
+    """Verify sender reports received on RTCP socket map RTP time to wall clock."""
+    report = b"\x80\xc8\x00\x06" + bytes(4)
+    report += (2208988800 + 1000).to_bytes(4, "big") + bytes(4)
+    report += (9000).to_bytes(4, "big") + bytes(8)
+    rtsp_client.rtp.rtcp_client.datagram_received(report, None)
+
+    assert rtsp_client.rtp.statistics.wall_clock(18000) == 1000.1
+
+
 def test_methods(rtsp_client):
     """Verify method attributes."""
     method = rtsp_client.method
@@ -614,7 +894,7 @@ def test_session_update_status_codes(rtsp_client):
 
     assert session.rtsp_version == 1
     assert session.status_code == 454
-    assert session.status_text == "Session"  # "Session Not Found"
+    assert session.status_text == "Session Not Found"
     assert session.state == STATE_STARTING
     assert session.sequence == 1
 
@@ -664,3 +944,328 @@ def test_session_generate_basic_auth(event_loop, rtsp_client):
     with patch("base64.b64encode") as mock_b64encode:
         basic_auth = session.generate_basic()
         mock_b64encode.assert_not_called()
+
+
+def test_response_reader_split_and_coalesced_reads():
+    """Verify responses are framed independent of how data is read."""
+    describe = (
+        b"RTSP/1.0 200 OK\r\n"
+        + b"CSeq: 1\r\n"
+        + b"Content-Length: 10\r\n\r\n"
+        + b"v=0\r\nt=0 0"
+    )
+    options = b"RTSP/1.0 200 OK\r\nCSeq: 2\r\n\r\n"
+
+    reader = RTSPResponseReader()
+    responses = []
+    for index in range(0, len(describe), 7):
+        responses += list(reader.feed(describe[index : index + 7]))
+    assert len(responses) == 1
+    assert responses[0].status_code == 200
+    assert responses[0].headers["cseq"] == "1"
+    assert responses[0].body == "v=0\r\nt=0 0"
+    assert not reader.buffer
+
+    responses = list(reader.feed(options + describe + options[:5]))
+    assert [response.headers["cseq"] for response in responses] == ["2", "1"]
+    assert reader.buffer == options[:5]
+
+    responses = list(reader.feed(options[5:]))
+    assert [response.headers["cseq"] for response in responses] == ["2"]
+
+
+def test_response_reader_invalid_data():
+    """Verify data that isn't an RTSP response is flushed."""
+    reader = RTSPResponseReader()
+    responses = list(reader.feed(b"Unsupported response"))
+    assert len(responses) == 1
+    assert responses[0].status_code is None
+    assert not reader.buffer
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"RTSP/1.0 abc OK\r\nCSeq: 0\r\n\r\n",
+        b"RTSP/x.0 200 OK\r\nCSeq: 0\r\n\r\n",
+        b"RTSP/1.0 200 OK\r\nCSeq: 0\r\nContent-Length: abc\r\n\r\n",
+        b"RTSP/1.0 200 OK\r\nCSeq: 0\r\nContent-Length: -5\r\n\r\n",
+    ],
+)
+def test_response_reader_malformed_response(data):
+    """Verify malformed status line or content length is flushed."""
+    reader = RTSPResponseReader()
+    responses = list(reader.feed(data))
+    assert len(responses) == 1
+    assert responses[0].status_code is None
+    assert not reader.buffer
+
+
+def test_parse_response_headers():
+    """Verify headers are matched case-insensitively on name only."""
+    response = parse_response(
+        "RTSP/1.0 401 Unauthorized\r\n"
+        + "cseq: 3\r\n"
+        + "Server: Session server\r\n"
+        + 'WWW-Authenticate: Basic realm="AXIS_ACCC8E012345"\r\n'
+        + 'WWW-AUTHENTICATE: Digest realm="AXIS_ACCC8E012345", nonce="abc"\r\n\r\n'
+    )
+    assert response.rtsp_version == 1
+    assert response.status_code == 401
+    assert response.status_text == "Unauthorized"
+    assert response.headers["cseq"] == "3"
+    assert "session" not in response.headers
+    assert response.authenticate == [
+        'Basic realm="AXIS_ACCC8E012345"',
+        'Digest realm="AXIS_ACCC8E012345", nonce="abc"',
+    ]
+
+
+def test_session_update_coalesced_challenges(rtsp_client):
+    """Verify both basic and digest challenges are registered."""
+    session = rtsp_client.session
+    session.update(
+        "RTSP/1.0 401 Unauthorized\r\n"
+        + "CSeq: 0\r\n"
+        + 'WWW-Authenticate: Basic realm="AXIS_ACCC8E012345"\r\n'
+        + 'WWW-Authenticate: Digest realm="AXIS_ACCC8E012345", nonce="abc"\r\n\r\n'
+    )
+    assert session.basic is True
+    assert session.digest is True
+    assert session.nonce == "abc"
+    assert session.stale is False
+    assert session.session_id is None
+
+
+def test_response_reader_interleaved_packets():
+    """Verify interleaved packets are framed between responses."""
+    packets = []
+    reader = RTSPResponseReader(
+        lambda channel, packet: packets.append((channel, bytes(packet)))
+    )
+    options = b"RTSP/1.0 200 OK\r\nCSeq: 4\r\n\r\n"
+    data = b"$\x00\x00\x03abc" + options + b"$\x01\x00\x02de" + b"$\x00\x00\x04fg"
+
+    responses = []
+    for response in reader.feed(data):
+        assert packets == [(0, b"abc")]  # Packets and responses are kept in order
+        responses.append(response)
+    assert len(responses) == 1
+    assert packets == [(0, b"abc"), (1, b"de")]
+    assert reader.buffer == b"$\x00\x00\x04fg"
+
+    assert list(reader.feed(b"hi")) == []
+    assert packets[-1] == (0, b"fghi")
+    assert not reader.buffer
+
+
+async def test_interleaved_transport(rtsp_server, axis_device):
+    """Verify RTP data interleaved on the RTSP connection is received."""
+    axis_device.enable_events(event_callback=Mock())
+    axis_device.stream.rtp_transport = TRANSPORT_TCP
+    with patch("axis.rtsp.RTSP_PORT", RTSP_PORT):
+        axis_device.stream.start()
+    rtsp_client = axis_device.stream.stream
+
+    assert rtsp_client.rtp.port is None
+    assert rtsp_client.rtp.sock is None
+    assert (
+        rtsp_client.method.transport
+        == "Transport: RTP/AVP/TCP;unicast;interleaved=0-1\r\n"
+    )
+
+    await rtsp_server.next_request_received.wait()
+    rtsp_client.session.sequence = 3  # PLAY
+
+    rtsp_client.rtp.rtcp_received = Mock()
+    rtp_packet = bytes(12) + PIR_INIT
+    rtsp_server.transport.write(
+        b"RTSP/1.0 200 OK\r\n"
+        + b"CSeq: 3\r\n"
+        + b"Transport: RTP/AVP/TCP;unicast;interleaved=2-3\r\n"
+        + b"Session: ghLlkf_I9pCBP24t;timeout=60\r\n\r\n"
+        + b"$\x02"
+        + len(rtp_packet).to_bytes(2, "big")
+        + rtp_packet
+        + b"$\x03\x00\x08"
+        + bytes(8)
+    )
+    for _ in range(100):
+        if len(axis_device.event):
+            break
+        await asyncio.sleep(0)
+
+    assert rtsp_client.session.state == STATE_PLAYING
+    assert rtsp_client.session.interleaved_channels == (2, 3)
+    assert "tns1:Device/tnsaxis:Sensor/PIR_0" in axis_device.event
+    rtsp_client.rtp.rtcp_received.assert_called_once()
+
+    axis_device.stream.stop()
+
+
+def udp_socket(group: str, port: int) -> socket.socket:
+    """Bind a unicast socket in place of joining a multicast group."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind((HOST, 0))
+    return sock
+
+
+MULTICAST_SETUP_RESPONSE = (
+    "RTSP/1.0 200 OK\r\n"
+    + "CSeq: 2\r\n"
+    + "Transport: RTP/AVP;multicast;destination=239.0.0.1;port=5000-5001;ttl=5\r\n"
+    + "Session: ghLlkf_I9pCBP24t;timeout=60\r\n\r\n"
+)
+
+
+async def test_multicast_transport(rtsp_server, axis_device):
+    """Verify multicast group announced in SETUP is joined."""
+    axis_device.enable_events(event_callback=Mock())
+    axis_device.stream.rtp_transport = TRANSPORT_MULTICAST
+    with patch("axis.rtsp.RTSP_PORT", RTSP_PORT):
+        axis_device.stream.start()
+    rtsp_client = axis_device.stream.stream
+
+    assert rtsp_client.rtp.sock is None
+    assert rtsp_client.method.transport == "Transport: RTP/AVP;multicast\r\n"
+
+    await rtsp_server.next_request_received.wait()
+    rtsp_client.session.sequence = 2  # SETUP
+
+    with patch("axis.rtsp.multicast_socket", side_effect=udp_socket) as mock_join:
+        rtsp_server.send_response(MULTICAST_SETUP_RESPONSE)
+        await rtsp_server.next_request_received.wait()
+
+    assert mock_join.call_args_list == [
+        call("239.0.0.1", 5000),
+        call("239.0.0.1", 5001),
+    ]
+    assert rtsp_client.session.multicast_group == "239.0.0.1"
+    assert rtsp_client.session.multicast_ports == (5000, 5001)
+    assert rtsp_client.rtp.port == 5000
+    assert rtsp_client.rtp.rtcp_port == 5001
+    assert rtsp_server.last_request.startswith("PLAY ")
+
+    # Only datagrams from device are received, other devices may use same ports
+    assert rtsp_client.rtp.client.source == HOST
+    assert rtsp_client.rtp.rtcp_client.source == HOST
+    packet = b"\x80\x62\x00\x01" + bytes(8)
+    rtsp_client.rtp.client.datagram_received(packet, ("10.0.0.2", 5000))
+    assert rtsp_client.rtp.statistics.received == 0
+    with patch.object(rtsp_client.rtp.rtcp_client, "callback") as mock_rtcp:
+        rtsp_client.rtp.rtcp_client.datagram_received(b"", ("10.0.0.2", 5001))
+        mock_rtcp.assert_not_called()
+
+    rtsp_client.rtp.send_rtcp = Mock()
+    rtsp_client.rtp.client.datagram_received(packet, (HOST, 5000))
+    assert rtsp_client.rtp.statistics.received == 1
+    rtsp_client.send_receiver_report()
+    assert rtsp_client.rtp.send_rtcp.call_args[0][1] == ("239.0.0.1", 5001)
+
+    axis_device.stream.stop()
+
+
+async def test_multicast_join_fails(rtsp_server, axis_device):
+    """Verify session fails if multicast group can't be joined."""
+    axis_device.enable_events(event_callback=Mock())
+    axis_device.stream.rtp_transport = TRANSPORT_MULTICAST
+    with patch("axis.rtsp.RTSP_PORT", RTSP_PORT):
+        axis_device.stream.start()
+    rtsp_client = axis_device.stream.stream
+
+    await rtsp_server.next_request_received.wait()
+    rtsp_client.session.sequence = 2  # SETUP
+
+    with patch("axis.rtsp.multicast_socket", side_effect=OSError), patch.object(
+        rtsp_client, "callback"
+    ) as mock_callback:
+        rtsp_client.response_received(parse_response(MULTICAST_SETUP_RESPONSE))
+
+    mock_callback.assert_called_once_with(SIGNAL_FAILED)
+    assert rtsp_client.session.state == STATE_STOPPED
+    assert rtsp_client.rtp.sock is None
+
+
+def test_multicast_socket():
+    """Verify socket reuses address and joins multicast group."""
+    with patch("axis.rtsp.socket.socket") as mock_socket:
+        sock = multicast_socket("239.0.0.1", 5000)
+
+    sock.bind.assert_called_once_with(("239.0.0.1", 5000))
+    sock.setsockopt.assert_any_call(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt.assert_called_with(
+        socket.IPPROTO_IP,
+        socket.IP_ADD_MEMBERSHIP,
+        socket.inet_aton("239.0.0.1") + socket.inet_aton("0.0.0.0"),
+    )
+
+    with patch("axis.rtsp.socket.socket") as mock_socket, patch(
+        "axis.rtsp.sys.platform", "linux"
+    ):
+        sock = multicast_socket("239.0.0.1", 5000)
+    sock.setsockopt.assert_any_call(socket.IPPROTO_IP, IP_MULTICAST_ALL, 0)
+
+    # Platforms that can't bind to a multicast address bind to the port only
+    sock.bind.side_effect = [OSError, None]
+    with patch("axis.rtsp.socket.socket", mock_socket):
+        multicast_socket("239.0.0.1", 5000)
+    sock.bind.assert_called_with(("", 5000))
+
+    mock_socket.return_value.bind.side_effect = OSError
+    with patch("axis.rtsp.socket.socket", mock_socket), pytest.raises(OSError):
+        multicast_socket("239.0.0.1", 5000)
+    sock.close.assert_called_once()
+
+
+async def test_cached_session(rtsp_server, axis_device):
+    """Verify cached session skips to SETUP and falls back if rejected."""
+    axis_device.enable_events(event_callback=Mock())
+    control_url = (
+        "rtsp://127.0.0.1/axis-media/media.amp/stream=0?video=0&audio=0&event=on"
+    )
+    axis_device.stream.session_cache = SessionCache(
+        url=axis_device.stream.stream_url,
+        basic=False,
+        digest=True,
+        realm="AXIS_ACCC8E012345",
+        nonce="0000eb57Y1462133062b37999f0cd530f02755fa37b8df1",
+        content_base="rtsp://127.0.0.1/axis-media/media.amp/",
+        sdp=["m=application 0 RTP/AVP 98", f"a=control:{control_url}"],
+        control_url=control_url,
+        clock_rate=1000,
+    )
+    with patch("axis.rtsp.RTSP_PORT", RTSP_PORT):
+        axis_device.stream.start()
+    rtsp_client = axis_device.stream.stream
+
+    await rtsp_server.next_request_received.wait()
+    assert rtsp_server.last_request.startswith(f"SETUP {control_url} RTSP/1.0\r\n")
+    assert "CSeq: 2\r\n" in rtsp_server.last_request
+    assert 'Authorization: Digest username="root"' in rtsp_server.last_request
+    assert rtsp_client.session.clock_rate == 1000
+
+    rtsp_server.send_response("RTSP/1.0 454 Session Not Found\r\n" + "CSeq: 2\r\n\r\n")
+    await rtsp_server.next_request_received.wait()
+    assert rtsp_server.last_request.startswith("OPTIONS ")
+    assert rtsp_client.session.cached is False
+    assert rtsp_client.session.control_url is None
+
+    axis_device.stream.stop()
+
+
+def test_session_cache_for_other_url(rtsp_client):
+    """Verify session cache for another URL is not used."""
+    session = rtsp_client.session
+    session.control_url = "rtsp://127.0.0.1/control"
+    cache = session.cache()
+
+    cache.url = "rtsp://127.0.0.1/other"
+    session.sequence = 0
+    session.restore(cache)
+    assert session.sequence == 0
+    assert not session.cached
+
+    cache.url = session.url
+    session.restore(cache)
+    assert session.sequence == 2
+    assert session.cached
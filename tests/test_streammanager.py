@@ -7,15 +7,23 @@ import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 
 from axis.rtsp import (
+    MEDIA_VIDEO,
     SIGNAL_DATA,
     SIGNAL_FAILED,
     SIGNAL_PLAYING,
     STATE_PLAYING,
     STATE_STOPPED,
 )
-from axis.streammanager import RETRY_TIMER, StreamManager
+from axis.streammanager import (
+    ReconnectPolicy,
+    StreamManager,
+    StreamRegistry,
+    TokenBucket,
+)
+from axis.video import H264Depacketizer, JPEGDepacketizer
 
 from .conftest import HOST
+from .event_fixtures import PIR_INIT, VMD4_ANY_INIT
 
 
 @pytest.fixture
@@ -43,6 +51,32 @@ async def test_stream_url(stream_manager):
     )
 
 
+@patch("axis.streammanager.RTSPClient")
+@pytest.mark.asyncio
+async def test_video_stream(rtsp_client, stream_manager):
+    """Verify video stream sets up H.264 video instead of events."""
+    rtsp_client.return_value.start = AsyncMock()
+    stream_manager.event = MagicMock()
+    stream_manager.video = H264Depacketizer(MagicMock())
+
+    assert stream_manager.video_query == 1
+    assert stream_manager.event_query == "off"
+    assert stream_manager.stream_url == (
+        f"rtsp://{HOST}/axis-media/media.amp"
+        "?video=1&audio=0&event=off&videocodec=h264"
+    )
+
+    stream_manager.start()
+    assert rtsp_client.call_args[1] == {
+        "media": MEDIA_VIDEO,
+        "packet_callback": stream_manager.video.packet_received,
+        "silence_policy": stream_manager.silence_policy,
+    }
+
+    stream_manager.video = JPEGDepacketizer(max_fps=1)
+    assert stream_manager.stream_url.endswith("&videocodec=jpeg")
+
+
 @patch("axis.streammanager.RTSPClient")
 @pytest.mark.asyncio
 async def test_initialize_stream(rtsp_client, stream_manager):
@@ -50,6 +84,7 @@ async def test_initialize_stream(rtsp_client, stream_manager):
     rtsp_client.return_value.start = AsyncMock()
     # Stream does not exist
     assert not stream_manager.stream  # Stream does not exist
+    assert stream_manager.statistics is None
     stream_manager.stop()  # Calling stop shouldn't do anything
     assert (
         stream_manager.state == STATE_STOPPED
@@ -58,6 +93,7 @@ async def test_initialize_stream(rtsp_client, stream_manager):
     # Stream is created
     stream_manager.start()  # Start creates stream object
     rtsp_client.assert_called()  # Stream object is based on RTSPClient
+    assert stream_manager.statistics == rtsp_client.return_value.rtp.statistics
     stream_manager.stream.start.assert_called()  # RTSPClient start is called as well
     stream_manager.stream.stop.assert_not_called()  # Stop has never been called
 
@@ -103,4 +139,126 @@ async def test_initialize_stream(rtsp_client, stream_manager):
     with patch("axis.streammanager.asyncio.get_running_loop", return_value=mock_loop):
         stream_manager.retry()
         assert stream_manager.stream is None
-        mock_loop.call_later.assert_called_with(RETRY_TIMER, stream_manager.start)
+        mock_loop.call_later.assert_called_with(
+            stream_manager.reconnect_policy.first_delay, stream_manager.start
+        )
+
+
+@patch("axis.streammanager.RTSPClient")
+@pytest.mark.asyncio
+async def test_stop_cancels_retry(rtsp_client, stream_manager):
+    """Verify stopping stream cancels scheduled retry."""
+    stream_manager.retry()
+    retry_handle = stream_manager.retry_handle
+    assert retry_handle
+
+    stream_manager.stop()
+    assert retry_handle.cancelled()
+    assert stream_manager.retry_handle is None
+
+
+@patch("axis.streammanager.RTSPClient")
+@pytest.mark.asyncio
+async def test_stream_registry(rtsp_client, axis_device):
+    """Verify subscribers share one stream per device."""
+    rtsp_client.return_value.start = AsyncMock()
+    rtsp_client.return_value.session.state = STATE_PLAYING
+    registry = StreamRegistry()
+    first, second = MagicMock(), MagicMock()
+
+    shared = registry.subscribe(axis_device.config, first)
+    assert registry.subscribe(axis_device.config, first) is shared
+    registry.unsubscribe(shared, first)
+    rtsp_client.assert_called_once()
+    assert "event=on" in rtsp_client.call_args[0][0]
+
+    shared.stream.event(PIR_INIT)
+    first.assert_called_once_with("Initialized", "tns1:Device/tnsaxis:Sensor/PIR_0")
+
+    # Late subscriber gets already initialized events
+    assert registry.subscribe(axis_device.config, second) is shared
+    second.assert_called_once_with("Initialized", "tns1:Device/tnsaxis:Sensor/PIR_0")
+
+    shared.stream.event(VMD4_ANY_INIT)
+    first.assert_called_with(
+        "Initialized", "tnsaxis:CameraApplicationPlatform/VMD/Camera1ProfileANY_"
+    )
+    second.assert_called_with(
+        "Initialized", "tnsaxis:CameraApplicationPlatform/VMD/Camera1ProfileANY_"
+    )
+
+    registry.unsubscribe(shared, first)
+    rtsp_client.return_value.stop.assert_not_called()
+    registry.unsubscribe(shared, first)  # Unknown subscriber is ignored
+
+    registry.unsubscribe(shared, second)
+    rtsp_client.return_value.stop.assert_called_once()
+    assert not registry.streams
+
+    # New subscription starts a new stream
+    assert registry.subscribe(axis_device.config, first) is not shared
+    assert rtsp_client.call_count == 2
+
+
+@patch("axis.streammanager.RTSPClient")
+@pytest.mark.asyncio
+async def test_session_cache(rtsp_client, stream_manager):
+    """Verify session data is kept when playing and used when reconnecting."""
+    rtsp_client.return_value.start = AsyncMock()
+    stream_manager.start()
+    assert rtsp_client.call_args[0][-1] is None
+
+    stream_manager.session_callback(SIGNAL_PLAYING)
+    cache = rtsp_client.return_value.session.cache.return_value
+    assert stream_manager.session_cache is cache
+
+    stream_manager.stream = None
+    stream_manager.start()
+    assert rtsp_client.call_args[0][-1] is cache
+
+
+def test_reconnect_policy():
+    """Verify fast first retry followed by capped exponential backoff."""
+    policy = ReconnectPolicy(first_delay=1, base_delay=2, max_delay=10, jitter=0)
+    assert [policy.delay(attempt) for attempt in range(5)] == [1, 2, 4, 8, 10]
+
+    policy.jitter = 0.5
+    with patch("axis.streammanager.random.random", return_value=1):
+        assert policy.delay(3) == 4
+    with patch("axis.streammanager.random.random", return_value=0):
+        assert policy.delay(3) == 8
+
+
+def test_token_bucket():
+    """Verify reconnects exceeding burst are spread out by rate."""
+    with patch("axis.streammanager.monotonic", return_value=0):
+        bucket = TokenBucket(rate=2, burst=2)
+        assert [bucket.reserve() for _ in range(4)] == [0, 0, 0.5, 1]
+
+    with patch("axis.streammanager.monotonic", return_value=10):
+        assert bucket.reserve() == 0
+
+
+@pytest.mark.asyncio
+async def test_reconnect_counters(stream_manager):
+    """Verify reconnect counters and delays of consecutive retries."""
+    stream_manager.reconnect_policy.jitter = 0
+    stream_manager.reconnect_bucket = TokenBucket(rate=1, burst=1)
+    mock_loop = MagicMock()
+
+    with patch("axis.streammanager.asyncio.get_running_loop", return_value=mock_loop):
+        stream_manager.retry()
+        stream_manager.retry()
+        stream_manager.retry()
+
+    delays = [call_args[0][0] for call_args in mock_loop.call_later.call_args_list]
+    assert delays[0] == 1
+    assert delays[1] >= 2
+    assert delays[2] >= 4
+    assert stream_manager.reconnect_attempt == 3
+    assert stream_manager.reconnect_count == 3
+
+    stream_manager.stream = MagicMock()
+    stream_manager.session_callback(SIGNAL_PLAYING)
+    assert stream_manager.reconnect_attempt == 0
+    assert stream_manager.reconnect_count == 3
@@ -0,0 +1,317 @@
+"""Test video depacketization.
+
+pytest --cov-report term-missing --cov=axis.video tests/test_video.py
+"""
+
+import struct
+from unittest.mock import MagicMock
+
+from axis.video import (
+    JPEG_EOI,
+    JPEG_SOI,
+    START_CODE,
+    Depacketizer,
+    H264Depacketizer,
+    JPEGDepacketizer,
+    RingBuffer,
+    quantization_tables,
+    rtp_payload,
+)
+import pytest
+
+SPS = b"\x67\x42\x00\x1f"
+PPS = b"\x68\xce\x3c\x80"
+IDR = b"\x65" + bytes(range(1, 40))
+SLICE = b"\x41" + bytes(range(40, 60))
+
+
+def rtp_packet(sequence: int, timestamp: int, payload: bytes, marker=False) -> bytes:
+    """RTP packet of H.264 payload type."""
+    return (
+        struct.pack(
+            "!BBHII", 0x80, 96 | (0x80 if marker else 0), sequence, timestamp, 1
+        )
+        + payload
+    )
+
+
+def stap_a(*nal_units: bytes) -> bytes:
+    """Aggregate NAL units in one STAP-A payload."""
+    payload = b"\x78"
+    for nal in nal_units:
+        payload += struct.pack("!H", len(nal)) + nal
+    return payload
+
+
+def fu_a(nal: bytes, size: int):
+    """Fragment NAL unit in FU-A payloads of size."""
+    indicator = (nal[0] & 0xE0) | 28
+    data = nal[1:]
+    fragments = [data[i : i + size] for i in range(0, len(data), size)]
+    for index, fragment in enumerate(fragments):
+        header = nal[0] & 0x1F
+        if index == 0:
+            header |= 0x80
+        if index == len(fragments) - 1:
+            header |= 0x40
+        yield bytes((indicator, header)) + fragment
+
+
+@pytest.fixture
+def frames():
+    """Copies of delivered frames."""
+    return []
+
+
+@pytest.fixture
+def depacketizer(frames) -> H264Depacketizer:
+    """Depacketizer keeping copies of frames."""
+    return H264Depacketizer(
+        lambda frame, timestamp, keyframe: frames.append(
+            (bytes(frame), timestamp, keyframe)
+        )
+    )
+
+
+def test_single_nal_units(depacketizer, frames):
+    """Verify single NAL unit packets make one frame per marker bit."""
+    depacketizer.packet_received(rtp_packet(0, 100, SPS))
+    depacketizer.packet_received(rtp_packet(1, 100, PPS))
+    depacketizer.packet_received(rtp_packet(2, 100, IDR, marker=True))
+    depacketizer.packet_received(rtp_packet(3, 200, SLICE, marker=True))
+
+    assert frames == [
+        (START_CODE + SPS + START_CODE + PPS + START_CODE + IDR, 100, True),
+        (START_CODE + SLICE, 200, False),
+    ]
+    assert depacketizer.frames == 2
+    assert depacketizer.dropped == 0
+
+
+def test_stap_a_and_fu_a(depacketizer, frames):
+    """Verify aggregated and fragmented NAL units are reassembled."""
+    depacketizer.packet_received(rtp_packet(0, 100, stap_a(SPS, PPS)))
+    fragments = list(fu_a(IDR, 10))
+    for sequence, fragment in enumerate(fragments, start=1):
+        depacketizer.packet_received(
+            rtp_packet(sequence, 100, fragment, marker=sequence == len(fragments))
+        )
+
+    assert frames == [
+        (START_CODE + SPS + START_CODE + PPS + START_CODE + IDR, 100, True)
+    ]
+
+
+def test_keyframes_only(frames):
+    """Verify only keyframes are delivered."""
+    depacketizer = H264Depacketizer(
+        lambda frame, timestamp, keyframe: frames.append(bytes(frame)),
+        keyframes_only=True,
+    )
+    depacketizer.packet_received(rtp_packet(0, 100, SLICE, marker=True))
+    depacketizer.packet_received(rtp_packet(1, 200, stap_a(SPS, PPS)))
+    depacketizer.packet_received(rtp_packet(2, 200, IDR, marker=True))
+    depacketizer.packet_received(rtp_packet(3, 300, SLICE, marker=True))
+
+    assert frames == [START_CODE + SPS + START_CODE + PPS + START_CODE + IDR]
+    assert depacketizer.dropped == 0
+
+
+def test_lost_packet_drops_frame(depacketizer, frames):
+    """Verify frame with lost packet is dropped and next frame is delivered."""
+    fragments = list(fu_a(IDR, 10))
+    depacketizer.packet_received(rtp_packet(0, 100, fragments[0]))
+    depacketizer.packet_received(rtp_packet(2, 100, fragments[2]))
+    depacketizer.packet_received(rtp_packet(3, 100, fragments[3], marker=True))
+    depacketizer.packet_received(rtp_packet(4, 200, SLICE, marker=True))
+
+    assert frames == [(START_CODE + SLICE, 200, False)]
+    assert depacketizer.dropped == 1
+
+
+def test_missing_fragment_start(depacketizer, frames):
+    """Verify fragments without a start are dropped."""
+    fragments = list(fu_a(IDR, 10))
+    depacketizer.packet_received(rtp_packet(0, 100, fragments[1], marker=True))
+
+    assert frames == []
+    assert depacketizer.dropped == 1
+
+
+def test_missing_marker(depacketizer, frames):
+    """Verify frame without last packet is counted as dropped."""
+    depacketizer.packet_received(rtp_packet(0, 100, IDR))
+    depacketizer.packet_received(rtp_packet(1, 200, SLICE, marker=True))
+
+    assert frames == [(START_CODE + SLICE, 200, False)]
+    assert depacketizer.dropped == 1
+
+
+def test_frame_larger_than_buffer(frames):
+    """Verify frames that do not fit in buffer are dropped."""
+    callback = MagicMock()
+    depacketizer = H264Depacketizer(callback, buffer_size=16)
+    depacketizer.packet_received(rtp_packet(0, 100, IDR, marker=True))
+
+    callback.assert_not_called()
+    assert depacketizer.dropped == 1
+
+
+def test_ring_buffer_wraps():
+    """Verify current frame is moved to start when it reaches end of buffer."""
+    ring = RingBuffer(8)
+    ring.begin()
+    assert ring.write(b"abcde")
+    ring.begin()
+    assert ring.write(b"fg")
+    assert ring.write(b"hi")
+    assert bytes(ring.frame) == b"fghi"
+    assert ring.start == 0
+    assert not ring.write(b"jklmn")
+
+
+def test_rtp_payload():
+    """Verify CSRC, header extension and padding are skipped."""
+    header = struct.pack("!BBHII", 0xB1, 96, 0, 0, 1)  # Padding, extension, 1 CSRC
+    packet = header + b"CSRC" + b"\x00\x00\x00\x01EXTN" + b"data" + b"\x00\x02"
+    assert bytes(rtp_payload(packet)) == b"data"
+
+
+SCAN = bytes(range(1, 200))
+
+
+def jpeg_packets(
+    sequence: int,
+    timestamp: int,
+    jpeg_type: int = 1,
+    quality: int = 50,
+    tables: bytes = b"",
+    size: int = 80,
+):
+    """RTP/JPEG packets of a 64x48 image with scan data split in size."""
+    for offset in range(0, len(SCAN), size):
+        payload = struct.pack("!IBBBB", offset, jpeg_type, quality, 8, 6)
+        if jpeg_type >= 64:
+            payload += struct.pack("!HH", 4, 0xFFFF)  # Restart interval 4
+        if offset == 0 and quality >= 128:
+            payload += struct.pack("!BBH", 0, 0, len(tables)) + tables
+        last = offset + size >= len(SCAN)
+        yield rtp_packet(
+            sequence, timestamp, payload + SCAN[offset : offset + size], last
+        )
+        sequence += 1
+
+
+def test_jpeg_frame(frames):
+    """Verify JPEG image is rebuilt with headers from quality factor."""
+    depacketizer = JPEGDepacketizer(
+        lambda frame, timestamp, keyframe: frames.append(
+            (bytes(frame), timestamp, keyframe)
+        )
+    )
+    for packet in jpeg_packets(0, 100):
+        depacketizer.packet_received(packet)
+
+    ((image, timestamp, keyframe),) = frames
+    assert (timestamp, keyframe) == (100, True)
+    assert image.startswith(JPEG_SOI)
+    assert image.endswith(SCAN + JPEG_EOI)
+    tables = quantization_tables(50)
+    assert b"\xff\xdb\x00\x43\x00" + tables[:64] in image
+    assert b"\xff\xdb\x00\x43\x01" + tables[64:] in image
+    assert b"\xff\xc0\x00\x11\x08\x00\x30\x00\x40" in image  # 64x48
+    assert b"\x01\x22\x00" in image  # 4:2:0 luma sampling
+    assert b"\xff\xdd" not in image
+
+    # Headers are reused while they do not change
+    header = depacketizer.header
+    for packet in jpeg_packets(3, 200):
+        depacketizer.packet_received(packet)
+    assert depacketizer.header is header
+    assert frames[1][0] == image
+
+
+def test_jpeg_tables_and_restart_markers(frames):
+    """Verify inline quantization tables and restart interval."""
+    tables = bytes(range(1, 129))
+    depacketizer = JPEGDepacketizer(
+        lambda frame, timestamp, keyframe: frames.append(bytes(frame))
+    )
+    for packet in jpeg_packets(0, 100, jpeg_type=64, quality=255, tables=tables):
+        depacketizer.packet_received(packet)
+
+    (image,) = frames
+    assert b"\xff\xdb\x00\x43\x00" + tables[:64] in image
+    assert b"\xff\xdb\x00\x43\x01" + tables[64:] in image
+    assert b"\xff\xdd\x00\x04\x00\x04" in image
+    assert b"\x01\x21\x00" in image  # 4:2:2 luma sampling
+    assert image.endswith(SCAN + JPEG_EOI)
+
+
+def test_jpeg_unsupported_tables():
+    """Verify images with 16 bit quantization tables are dropped."""
+    callback = MagicMock()
+    depacketizer = JPEGDepacketizer(callback)
+    packets = list(jpeg_packets(0, 100, quality=255, tables=bytes(64)))
+    packets[0] = packets[0][:21] + b"\x01" + packets[0][22:]  # Precision
+    for packet in packets:
+        depacketizer.packet_received(packet)
+
+    callback.assert_not_called()
+    assert depacketizer.dropped == 1
+
+
+def test_jpeg_lost_fragment():
+    """Verify image with a lost fragment is dropped."""
+    callback = MagicMock()
+    depacketizer = JPEGDepacketizer(callback)
+    first, _, last = jpeg_packets(0, 100)
+    depacketizer.packet_received(first)
+    depacketizer.sequence = 1  # Hide sequence gap to verify fragment offset
+    depacketizer.packet_received(last)
+
+    callback.assert_not_called()
+    assert depacketizer.dropped == 1
+
+
+def test_jpeg_max_fps(frames):
+    """Verify images arriving faster than max fps are skipped."""
+    depacketizer = JPEGDepacketizer(
+        lambda frame, timestamp, keyframe: frames.append(timestamp), max_fps=2
+    )
+    sequence = 0
+    for timestamp in range(0, 90000 * 2, 9000):  # 10 fps for two seconds
+        for packet in jpeg_packets(sequence, timestamp, size=len(SCAN)):
+            depacketizer.packet_received(packet)
+        sequence += 1
+
+    assert frames == [0, 45000, 90000, 135000]
+    assert depacketizer.dropped == 0
+
+
+def test_jpeg_latest_only():
+    """Verify only newest image is kept for a slow consumer."""
+    depacketizer = JPEGDepacketizer(latest_only=True)
+    assert depacketizer.take_latest() is None
+
+    sequence = 0
+    for timestamp in (100, 200, 300):
+        for packet in jpeg_packets(sequence, timestamp, size=len(SCAN)):
+            depacketizer.packet_received(packet)
+        sequence += 1
+
+    image, timestamp = depacketizer.take_latest()
+    assert timestamp == 300
+    assert image.startswith(JPEG_SOI) and image.endswith(JPEG_EOI)
+    assert depacketizer.take_latest() is None
+    assert depacketizer.frames == 3
+
+
+def test_depacketizer_without_payload_handling():
+    """Verify depacketizer must handle payloads to be instantiated."""
+
+    class IncompleteDepacketizer(Depacketizer):
+        """Depacketizer missing payload handling."""
+
+    with pytest.raises(TypeError, match="payload_received"):
+        IncompleteDepacketizer(MagicMock())